@@ -11,18 +11,17 @@
 # - Mostrar icono cuadrado de app
 
 # Importaciones
+# Solo lo necesario para pintar la ventana; Firebase, pandas, reportlab, los
+# generadores de informes y tkcalendar se cargan después (ver ``arranque``).
+import multiprocessing
+# En el ejecutable, los procesos del lote de informes arrancan con el mismo .exe.
+multiprocessing.freeze_support()
+from arranque import MedidorArranque, ModuloPerezoso, precargar
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
-import firebase_admin
-from firebase_admin import credentials, firestore
-import pandas as pd
 from datetime import datetime
-from informe_generator import generar_pdf
-from informe_generator_general import generar_pdf_general
-from informe_generator_comercial import generar_informe_comercial_desde_ui
-from herramientas import abrir_herramientas
 import sys, os
+import threading
 import traceback
 #from tkinter.simpledialog import askstring
 from PIL import Image, ImageTk
@@ -30,6 +29,15 @@ from tkinter import simpledialog
 from pathlib import Path
 from pdf_utils import cleanup_old_pdfs
 from ui_utils import apply_global_icon
+from muestras_cache import MuestrasCache
+from eepp_cache import obtener_resolver_eepp
+from plantillas_cache import obtener_cache_plantillas
+from firebase_utils import obtener_db
+from muestras_filtros import FiltroMuestras, construir_query_firestore, rango_dia_utc
+from tabla_virtual import TablaVirtual
+from busqueda_segundo_plano import BusquedaEnSegundoPlano
+from borrado_muestras import borrar_muestras
+from cola_informes import ColaInformes, FALLIDO, TERMINADO
 
 # === Funciones auxiliares ===
 def resource_path(rel_path: str) -> str:
@@ -48,26 +56,22 @@ def resource_path(rel_path: str) -> str:
 def recurso_path(rel_path: str) -> str:
     return resource_path(rel_path)
 
-
-cred = credentials.Certificate(resource_path("HarvestSync.json"))
-
-
-# === Inicializar Firebase ===
-cred = credentials.Certificate(resource_path("HarvestSync.json"))
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+pd = ModuloPerezoso("pandas")
+medidor_arranque = MedidorArranque.desde_entorno()
 
 # === Cargar usuarios ===
 def cargar_usuarios():
     usuarios = {}
-    docs = db.collection("UsuariosAutorizados").stream()
+    docs = obtener_db().collection("UsuariosAutorizados").stream()
     for doc in docs:
         data = doc.to_dict()
         usuarios[doc.id] = data.get("Nombre", doc.id)
     return usuarios
 
-usuarios_dict = cargar_usuarios()
+# Se rellena en segundo plano durante el arranque (ver ``_precargar_usuarios``).
+usuarios_dict = {}
+_usuarios_cargados = threading.Event()
+ESPERA_USUARIOS_S = 15
 
 # === Tkinter Modern UI ===
 root = tk.Tk()
@@ -89,11 +93,13 @@ style.configure("Treeview.Heading", font=("Segoe UI", 10, "bold"))
 logo_icon = apply_global_icon(root)
 
 
-# Limpieza de PDFs temporales al iniciar la aplicación
-cleanup_old_pdfs(max_age_hours=24)
-
-
 def _on_close() -> None:
+    detener_modo_en_vivo()
+    if lote_actual is not None:
+        lote_actual.set()
+    if cache_plantillas is not None:
+        cache_plantillas.detener()
+    cola_informes.cerrar()
     cleanup_old_pdfs(max_age_hours=24)
     root.destroy()
 
@@ -148,12 +154,19 @@ for idx, campo in enumerate(campos):
     filtros[campo] = entry
 
 ttk.Label(frame_filtros, text="Desde").grid(row=0, column=len(campos), padx=5)
-fecha_desde = DateEntry(frame_filtros, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern="dd/mm/yyyy")
-fecha_desde.grid(row=1, column=len(campos), padx=5)
 
 ttk.Label(frame_filtros, text="Hasta").grid(row=0, column=len(campos)+1, padx=5)
-fecha_hasta = DateEntry(frame_filtros, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern="dd/mm/yyyy")
-fecha_hasta.grid(row=1, column=len(campos)+1, padx=5)
+# Los selectores de fecha (tkcalendar) se crean tras el primer pintado.
+fecha_desde = None
+fecha_hasta = None
+
+def _crear_selectores_fecha():
+    global fecha_desde, fecha_hasta
+    from tkcalendar import DateEntry
+    fecha_desde = DateEntry(frame_filtros, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern="dd/mm/yyyy")
+    fecha_desde.grid(row=1, column=len(campos), padx=5)
+    fecha_hasta = DateEntry(frame_filtros, width=12, background='darkblue', foreground='white', borderwidth=2, date_pattern="dd/mm/yyyy")
+    fecha_hasta.grid(row=1, column=len(campos)+1, padx=5)
 
 # === Acciones ===
 frame_botones = ttk.LabelFrame(root, text="Acciones disponibles")
@@ -166,105 +179,449 @@ ttk.Button(frame_botones, text="🗑 Eliminar seleccionados", command=lambda: el
 ttk.Button(frame_botones, text="📊 Informe general", command=lambda: generar_informe_general()).grid(row=0, column=3, padx=10, pady=6)
 ttk.Button(frame_botones, text="🧮 Última Muestra", command=lambda: generar_informe_unico_por_boleta()).grid(row=0, column=4, padx=10, pady=6)
 ttk.Button(frame_botones, text="🌳 Aforo por boleta", command=lambda: calcular_aforo()).grid(row=0, column=5, padx=10, pady=6)
-ttk.Button(frame_botones, text="🛠️ Herramientas", command=lambda: abrir_herramientas(root, db)).grid(row=0, column=6, padx=10, pady=6)
+ttk.Button(frame_botones, text="🛠️ Herramientas", command=lambda: abrir_panel_herramientas()).grid(row=0, column=6, padx=10, pady=6)
+boton_panel_informes = ttk.Button(frame_botones, text="📋 Informes", command=lambda: abrir_panel_informes())
+boton_panel_informes.grid(row=1, column=6, padx=10, pady=(0, 6))
 
 var_seleccionar_todo = tk.BooleanVar()
 ttk.Checkbutton(frame_botones, text="Seleccionar todas", variable=var_seleccionar_todo, command=lambda: toggle_seleccion()).grid(row=0, column=7, padx=10)
 
+boton_cancelar = ttk.Button(frame_botones, text="✖ Cancelar búsqueda", command=lambda: cancelar_busqueda())
+boton_cancelar.grid(row=1, column=0, padx=10, pady=(0, 6))
+boton_cancelar.state(["disabled"])
+etiqueta_progreso = ttk.Label(frame_botones, text="")
+etiqueta_progreso.grid(row=1, column=1, columnspan=5, sticky="w", padx=10, pady=(0, 6))
+boton_cancelar_lote = ttk.Button(frame_botones, text="✖ Cancelar lote", command=lambda: cancelar_lote())
+boton_cancelar_lote.grid(row=2, column=0, padx=10, pady=(0, 6))
+boton_cancelar_lote.state(["disabled"])
+etiqueta_lote = ttk.Label(frame_botones, text="")
+etiqueta_lote.grid(row=2, column=1, columnspan=5, sticky="w", padx=10, pady=(0, 6))
+var_en_vivo = tk.BooleanVar()
+ttk.Checkbutton(frame_botones, text="🔴 En vivo", variable=var_en_vivo, command=lambda: toggle_en_vivo()).grid(row=1, column=7, padx=10, pady=(0, 6))
+
 # === Tabla ===
 columnas_tabla = ["IdMuestra", "Boleta", "Nombre", "Tipo", "Nombre Usuario", "CULTIVO"]
-tabla = ttk.Treeview(root, columns=columnas_tabla, show="headings", selectmode="extended")
-for col in columnas_tabla:
-    tabla.heading(col, text=col)
-    tabla.column(col, width=160)
+tabla = TablaVirtual(root, columnas_tabla, clave="IdMuestra", ancho_columna=160)
 tabla.pack(expand=True, fill="both", padx=10, pady=10)
 
 # === Variables externas ===
-resultados_df = pd.DataFrame()
+resultados_df = None
+cache_muestras = MuestrasCache()
+indice_muestras = None
+busqueda_actual = None
+escucha_en_vivo = None
+lote_actual = None
+panel_informes = None
+cache_plantillas = None
+_ultimo_filtro = None
+_paginas_busqueda = []
+_filtro_local_after_id = None
+_variedad_en_curso = None
+RETARDO_FILTRO_MS = 250
+# Campo de la pantalla -> columna indexada sobre la que se filtra al escribir
+CAMPOS_FILTRO_LOCAL = {
+    "Boleta": "Boleta",
+    "Nombre": "Nombre",
+    "Usuario": "Nombre Usuario",
+    "CULTIVO": "CULTIVO",
+    "Variedad": "Variedad",
+}
 
 # === Funciones completas ===
-def cargar_muestras(usuarios):
-    muestras = []
-    docs = db.collection("Muestras").stream()
-    for doc in docs:
-        data = doc.to_dict()
-        data["IdMuestra"] = doc.id
-        uid = data.get("Usuario", "")
-        data["Nombre Usuario"] = usuarios.get(uid, uid)
-        data["FechaHora"] = data.get("FechaHora", None)
-        muestras.append(data)
-    return pd.DataFrame(muestras)
+def _leer_filtro():
+    desde = hasta = None
+    if fecha_desde is not None and fecha_hasta is not None:
+        desde, hasta = rango_dia_utc(fecha_desde.get_date(), fecha_hasta.get_date())
+    return FiltroMuestras(
+        boleta=filtros["Boleta"].get(),
+        cultivo=filtros["CULTIVO"].get(),
+        tipo=filtros["Tipo"].get(),
+        desde=desde,
+        hasta=hasta,
+    )
+
+_sincronizacion_cache_en_curso = threading.Event()
+
+def _lanzar_sincronizacion_cache():
+    """Sincroniza la caché en segundo plano y, si trae cambios, refresca la búsqueda actual."""
+    if _sincronizacion_cache_en_curso.is_set():
+        return
+    _sincronizacion_cache_en_curso.set()
+    threading.Thread(target=_sincronizar_cache_muestras, daemon=True).start()
 
-def filtrar():
-    df = cargar_muestras(usuarios_dict)
-    for campo in ["Boleta", "Nombre", "Tipo", "CULTIVO"]:
-        valor = filtros[campo].get()
-        if valor:
-            df = df[df[campo].astype(str).str.contains(valor, case=False, na=False)]
-    valor_usuario = filtros["Usuario"].get()
-    if valor_usuario:
-        df = df[df["Nombre Usuario"].astype(str).str.contains(valor_usuario, case=False, na=False)]
+def _sincronizar_cache_muestras():
+    try:
+        resultado = cache_muestras.sincronizar(obtener_db())
+    except Exception as e:
+        # Sin conexión se sigue trabajando con lo que haya en la caché local.
+        print(f"⚠️ No se pudo sincronizar la caché de muestras: {e}")
+        return
+    finally:
+        _sincronizacion_cache_en_curso.clear()
+    filtro = _ultimo_filtro
+    if filtro is None or not resultado.cambios:
+        return
+    registros = [_completar_registro(data, usuarios_dict) for data in cache_muestras.iterar(filtro)]
+    root.after(0, lambda: _refrescar_desde_cache(filtro, registros))
+
+def _refrescar_desde_cache(filtro, registros):
+    global indice_muestras
+    if filtro is not _ultimo_filtro:
+        return
+    if busqueda_actual is not None:
+        # Se espera a que termine la búsqueda de este mismo filtro.
+        root.after(RETARDO_FILTRO_MS, lambda: _refrescar_desde_cache(filtro, registros))
+        return
+    if indice_muestras is None:
+        return
+    from indice_muestras import IndiceMuestras
+    indice_muestras = IndiceMuestras(_a_dataframe(registros))
+    aplicar_filtro_local(conservar_vista=True)
+
+def _muestras_desde_firestore(filtro):
+    for doc in construir_query_firestore(obtener_db(), filtro).stream():
+        data = doc.to_dict() or {}
+        if filtro.coincide(data):
+            yield dict(data, IdMuestra=doc.id)
+
+def _leer_muestras(usuarios, filtro, cancelado):
+    """Genera las muestras del filtro; comprueba ``cancelado`` entre documentos."""
+    # Si se busca nada más arrancar, se esperan los nombres de usuario de la precarga.
+    _usuarios_cargados.wait(ESPERA_USUARIOS_S)
+    cache_vacia = cache_muestras.obtener_cursor() is None
+    # La sincronización (incluida la pasada completa periódica) nunca retrasa la
+    # primera fila: corre en segundo plano y, si trae cambios, refresca el resultado.
+    _lanzar_sincronizacion_cache()
+    if cache_vacia:
+        # Caché vacía: se responde con la consulta filtrada en Firestore.
+        muestras = _muestras_desde_firestore(filtro)
+    else:
+        muestras = cache_muestras.iterar(filtro)
+    for data in muestras:
+        if cancelado.is_set():
+            return
+        yield _completar_registro(data, usuarios)
+
+def _completar_registro(data, usuarios):
+    uid = data.get("Usuario", "")
+    data["Nombre Usuario"] = usuarios.get(uid, uid)
+    data["FechaHora"] = data.get("FechaHora", None)
+    return data
+
+def _a_dataframe(registros):
+    df = pd.DataFrame(registros)
     if "FechaHora" in df.columns:
         df["FechaHora"] = pd.to_datetime(df["FechaHora"], errors='coerce', utc=True)
-        desde = pd.to_datetime(fecha_desde.get_date().strftime("%d/%m/%Y"), utc=True, dayfirst=True)
-        hasta = pd.to_datetime(fecha_hasta.get_date().strftime("%d/%m/%Y 23:59:59"), utc=True, dayfirst=True)
-        df = df[(df["FechaHora"] >= desde) & (df["FechaHora"] <= hasta)]
-    variedad_filtro = filtros["Variedad"].get().strip().lower()
-    if variedad_filtro:
-        variedad_resultados = []
-        for _, row in df.iterrows():
-            boleta = str(row.get("Boleta", "")).strip()
-            variedad = ""
-            if boleta:
-                try:
-                    doc_eepp = db.collection("EEPP").document(boleta).get()
-                    if doc_eepp.exists:
-                        variedad = doc_eepp.to_dict().get("Variedad", "")
-                except: pass
-            if variedad_filtro in variedad.lower():
-                row["Variedad"] = variedad
-                variedad_resultados.append(row)
-        df = pd.DataFrame(variedad_resultados)
-    actualizar_tabla(df)
-
-def actualizar_tabla(df):
-    for row in tabla.get_children():
-        tabla.delete(row)
-    for _, row in df.iterrows():
-        tabla.insert("", "end", values=[row.get(col, "") for col in columnas_tabla])
+    return df
+
+def filtrar():
+    """Lanza la búsqueda en segundo plano; cancela la que siguiera en curso."""
+    global busqueda_actual, indice_muestras, _paginas_busqueda, _ultimo_filtro
+    cancelar_busqueda()
+    detener_modo_en_vivo()
+    filtro = _leer_filtro()
+    _ultimo_filtro = filtro
+    indice_muestras = None
+    _paginas_busqueda = []
+    actualizar_tabla(None)
+    etiqueta_progreso.config(text="Buscando…")
+    boton_cancelar.state(["!disabled"])
+    busqueda_actual = BusquedaEnSegundoPlano(
+        lambda cancelado: _leer_muestras(usuarios_dict, filtro, cancelado),
+        planificar=lambda funcion: root.after(0, funcion),
+        al_pagina=_recibir_pagina_busqueda,
+        al_terminar=_terminar_busqueda,
+        al_error=_error_busqueda,
+    ).iniciar()
+
+def cancelar_lote():
+    if lote_actual is None:
+        return
+    lote_actual.set()
+    boton_cancelar_lote.state(["disabled"])
+    etiqueta_lote.config(text="Cancelando el lote de informes…")
+
+def cancelar_busqueda():
+    global busqueda_actual
+    if busqueda_actual is None:
+        return
+    busqueda_actual.cancelar()
+    busqueda_actual = None
+    boton_cancelar.state(["disabled"])
+    leidos = 0 if resultados_df is None else len(resultados_df)
+    etiqueta_progreso.config(text=f"Búsqueda cancelada ({leidos} documentos leídos)")
+
+def _recibir_pagina_busqueda(registros, leidos):
+    _paginas_busqueda.append(_a_dataframe(registros))
+    tabla.cargar(pd.concat(_paginas_busqueda, ignore_index=True), conservar_seleccion=True)
+    global resultados_df
+    resultados_df = tabla.datos
+    etiqueta_progreso.config(text=f"Leyendo… {leidos} documentos leídos")
+
+def _terminar_busqueda(leidos):
+    global busqueda_actual, indice_muestras, _paginas_busqueda
+    busqueda_actual = None
+    boton_cancelar.state(["disabled"])
+    df = pd.concat(_paginas_busqueda, ignore_index=True) if _paginas_busqueda else pd.DataFrame()
+    _paginas_busqueda = []
+    from indice_muestras import IndiceMuestras
+    indice_muestras = IndiceMuestras(df)
+    aplicar_filtro_local()
+    etiqueta_progreso.config(text=f"{leidos} documentos leídos")
+    if var_en_vivo.get():
+        iniciar_modo_en_vivo()
+
+def _error_busqueda(error):
+    global busqueda_actual
+    busqueda_actual = None
+    boton_cancelar.state(["disabled"])
+    etiqueta_progreso.config(text="Error en la búsqueda")
+    messagebox.showerror("Error", f"No se pudieron cargar las muestras:\n{error}")
+
+def _terminos_filtro_local():
+    return {campo_indice: filtros[campo].get() for campo, campo_indice in CAMPOS_FILTRO_LOCAL.items()}
+
+def _boletas_indice(indice):
+    return indice.datos["Boleta"].astype(str).str.strip()
+
+def _asegurar_variedad_indexada():
+    """Resuelve en segundo plano la Variedad EEPP de las boletas si el índice no la tiene."""
+    global _variedad_en_curso
+    indice = indice_muestras
+    if indice.tiene_campo("Variedad") or "Boleta" not in indice.datos.columns or _variedad_en_curso is indice:
+        return
+    _variedad_en_curso = indice
+    boletas = _boletas_indice(indice).unique()
+
+    def _worker():
+        try:
+            variedades = obtener_resolver_eepp(obtener_db()).variedades(boletas)
+        except Exception as e:
+            print(f"⚠️ No se pudieron resolver variedades EEPP: {e}")
+            variedades = None
+        root.after(0, lambda: _indexar_variedad(indice, variedades))
+
+    threading.Thread(target=_worker, daemon=True).start()
+
+def _indexar_variedad(indice, variedades):
+    global _variedad_en_curso
+    if _variedad_en_curso is indice:
+        _variedad_en_curso = None
+    if variedades is None or indice is not indice_muestras:
+        return
+    # Se mapea sobre las filas actuales: el índice puede haber cambiado mientras tanto.
+    indice.agregar_campo("Variedad", _boletas_indice(indice).map(variedades).fillna(""))
+    aplicar_filtro_local(conservar_vista=True)
+
+def aplicar_filtro_local(conservar_vista=False):
+    """Estrecha en memoria el último resultado de Buscar con los campos de texto."""
+    if indice_muestras is None:
+        return
+    terminos = _terminos_filtro_local()
+    if terminos.get("Variedad", "").strip():
+        # Hasta que llegue la Variedad EEPP el índice ignora ese término; al
+        # indexarla se vuelve a filtrar.
+        _asegurar_variedad_indexada()
+    actualizar_tabla(indice_muestras.filtrar(terminos), conservar_vista=conservar_vista)
+
+def _programar_filtro_local(_event=None):
+    global _filtro_local_after_id
+    if _filtro_local_after_id is not None:
+        root.after_cancel(_filtro_local_after_id)
+    _filtro_local_after_id = root.after(RETARDO_FILTRO_MS, _ejecutar_filtro_programado)
+
+def _ejecutar_filtro_programado():
+    global _filtro_local_after_id
+    _filtro_local_after_id = None
+    aplicar_filtro_local()
+
+def actualizar_tabla(df, conservar_vista=False):
+    tabla.cargar(df, conservar_seleccion=conservar_vista, conservar_posicion=conservar_vista)
     global resultados_df
     resultados_df = df
 
+# === Modo en vivo ===
+def iniciar_modo_en_vivo():
+    """Engancha un listener a la ventana de la última búsqueda completada."""
+    global escucha_en_vivo
+    detener_modo_en_vivo()
+    if _ultimo_filtro is None or indice_muestras is None or busqueda_actual is not None:
+        return
+    from muestras_en_vivo import EscuchaMuestras
+    escucha = EscuchaMuestras(obtener_db(), _ultimo_filtro, lambda cambios: _recibir_cambios_en_vivo(escucha, cambios))
+    try:
+        escucha_en_vivo = escucha.iniciar()
+    except Exception as e:
+        var_en_vivo.set(False)
+        messagebox.showerror("Error", f"No se pudo activar el modo en vivo:\n{e}")
+        return
+    etiqueta_progreso.config(text=f"{len(indice_muestras)} muestras · en vivo")
+
+def detener_modo_en_vivo():
+    global escucha_en_vivo
+    if escucha_en_vivo is not None:
+        try:
+            escucha_en_vivo.detener()
+        except Exception as e:
+            print(f"⚠️ No se pudo detener el listener en vivo: {e}")
+        escucha_en_vivo = None
+
+def toggle_en_vivo():
+    if var_en_vivo.get():
+        iniciar_modo_en_vivo()
+    else:
+        detener_modo_en_vivo()
+        if indice_muestras is not None:
+            etiqueta_progreso.config(text=f"{len(indice_muestras)} muestras")
+
+def _recibir_cambios_en_vivo(escucha, cambios):
+    # Hilo del SDK de Firestore: la caché se actualiza aquí y la UI en el hilo de Tk.
+    try:
+        cache_muestras.upsert_documentos(cambios.documentos + cambios.descartados)
+        cache_muestras.eliminar(cambios.eliminadas)
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar la caché con los cambios en vivo: {e}")
+    registros = [_completar_registro(data, usuarios_dict) for data in cambios.registros()]
+    indice = indice_muestras
+    if registros and indice is not None and indice.tiene_campo("Variedad"):
+        _completar_variedad(registros)
+    fuera = cambios.fuera_de_vista()
+    root.after(0, lambda: _aplicar_cambios_en_vivo(escucha, registros, fuera))
+
+def _completar_variedad(registros):
+    """Variedad EEPP de las filas que llegan en vivo (fuera del hilo de Tk)."""
+    try:
+        variedades = obtener_resolver_eepp(obtener_db()).variedades(r.get("Boleta", "") for r in registros)
+    except Exception as e:
+        print(f"⚠️ No se pudieron resolver variedades EEPP: {e}")
+        return
+    for data in registros:
+        data["Variedad"] = variedades.get(str(data.get("Boleta", "") or "").strip(), "")
+
+def _aplicar_cambios_en_vivo(escucha, registros, eliminadas):
+    if escucha is not escucha_en_vivo or indice_muestras is None:
+        return
+    indice_muestras.actualizar(_a_dataframe(registros), eliminadas)
+    aplicar_filtro_local(conservar_vista=True)
+    etiqueta_progreso.config(text=f"{len(indice_muestras)} muestras · en vivo ({datetime.now():%H:%M:%S})")
+
 def toggle_seleccion():
-    seleccionar = var_seleccionar_todo.get()
-    for item in tabla.get_children():
-        tabla.selection_add(item) if seleccionar else tabla.selection_remove(item)
+    if var_seleccionar_todo.get():
+        tabla.seleccionar_todo()
+    else:
+        tabla.limpiar_seleccion()
 
 def generar_informe_seleccionado():
-    seleccion = tabla.selection()
-    if not seleccion:
+    seleccion = tabla.registros_seleccionados()
+    if seleccion is None or seleccion.empty:
         messagebox.showwarning("Sin selección", "Debes seleccionar una muestra.")
         return
     if len(seleccion) > 1:
-        messagebox.showinfo("Informe individual", "Solo puedes generar un informe detallado a la vez.")
+        generar_lote_informes(seleccion)
         return
-    item = tabla.item(seleccion[0])
-    valores = item["values"]
-    id_muestra = valores[0]
-    cultivo = valores[5]
-    uid_usuario = resultados_df[resultados_df["IdMuestra"] == id_muestra]["Usuario"].values[0]
-    try:
-        generar_pdf(id_muestra, cultivo, uid_usuario)
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo generar el informe:\n{str(e)}")
+    muestra = seleccion.iloc[0]
+    id_muestra = muestra["IdMuestra"]
+    cultivo = muestra.get("CULTIVO", "")
+    uid_usuario = muestra.get("Usuario", "")
+    from informe_generator import generar_pdf
+    encolar_informe(f"Muestra {muestra.get('Nombre') or id_muestra}", generar_pdf, id_muestra, cultivo, uid_usuario, abrir=False)
+
+def _pedir_salida_lote(total):
+    """Pregunta el formato y el destino del lote; devuelve ``(modo, ruta)`` o ``None``."""
+    from tkinter import filedialog
+    top = tk.Toplevel(root)
+    top.title("Informes por lotes")
+    if logo_icon:
+        top.iconphoto(False, logo_icon)
+    ttk.Label(top, text=f"Generar {total} informes individuales como:").pack(padx=20, pady=(15, 5), anchor="w")
+    modo = tk.StringVar(value="carpeta")
+    for valor, texto in (("carpeta", "Un PDF por muestra en una carpeta"), ("zip", "Un archivo ZIP"), ("pdf", "Un solo PDF con marcadores")):
+        ttk.Radiobutton(top, text=texto, value=valor, variable=modo).pack(padx=30, anchor="w")
+    elegido = {"modo": None}
+
+    def aceptar():
+        elegido["modo"] = modo.get()
+        top.destroy()
+
+    frame = ttk.Frame(top)
+    frame.pack(pady=10)
+    ttk.Button(frame, text="Continuar", command=aceptar).grid(row=0, column=0, padx=5)
+    ttk.Button(frame, text="Cancelar", command=top.destroy).grid(row=0, column=1, padx=5)
+    top.grab_set()
+    root.wait_window(top)
+
+    nombre_base = f"Informes_{datetime.now():%Y%m%d_%H%M}"
+    if elegido["modo"] == "carpeta":
+        ruta = filedialog.askdirectory(title="Carpeta de destino")
+    elif elegido["modo"] == "zip":
+        ruta = filedialog.asksaveasfilename(title="Guardar ZIP", defaultextension=".zip", initialfile=f"{nombre_base}.zip", filetypes=[("ZIP", "*.zip")])
+    elif elegido["modo"] == "pdf":
+        ruta = filedialog.asksaveasfilename(title="Guardar PDF", defaultextension=".pdf", initialfile=f"{nombre_base}.pdf", filetypes=[("PDF", "*.pdf")])
+    else:
+        return None
+    return (elegido["modo"], ruta) if ruta else None
+
+def generar_lote_informes(seleccion):
+    global lote_actual
+    if lote_actual is not None:
+        messagebox.showinfo("Informes por lotes", "Ya hay un lote de informes en marcha.")
+        return
+    from lote_informes import TrabajoInforme, generar_lote
+    trabajos = [
+        TrabajoInforme(
+            id_muestra=str(fila.get("IdMuestra", "")),
+            cultivo=fila.get("CULTIVO", "") or "",
+            uid_usuario=fila.get("Usuario", "") or "",
+            titulo=" · ".join(str(fila.get(c)) for c in ("Boleta", "Nombre") if fila.get(c)) or str(fila.get("IdMuestra", "")),
+        )
+        for fila in seleccion.to_dict(orient="records")
+    ]
+    salida = _pedir_salida_lote(len(trabajos))
+    if salida is None:
+        return
+    modo, ruta = salida
+    cancelado = threading.Event()
+    lote_actual = cancelado
+    boton_cancelar_lote.state(["!disabled"])
+    etiqueta_lote.config(text=f"Generando informes 0/{len(trabajos)}…")
+
+    def _progreso(hechos, total):
+        root.after(0, lambda: etiqueta_lote.config(text=f"Generando informes {hechos}/{total}…"))
+
+    def _worker():
+        try:
+            resultado = generar_lote(trabajos, ruta, modo=modo, progreso=_progreso, cancelado=cancelado)
+        except Exception as e:
+            root.after(0, lambda: _terminar_lote(None, e))
+            return
+        root.after(0, lambda: _terminar_lote(resultado, None))
+
+    threading.Thread(target=_worker, daemon=True).start()
+
+def _terminar_lote(resultado, error):
+    global lote_actual
+    lote_actual = None
+    boton_cancelar_lote.state(["disabled"])
+    if error is not None:
+        etiqueta_lote.config(text="")
+        messagebox.showerror("Error", f"No se pudo generar el lote de informes:\n{error}")
+        return
+    etiqueta_lote.config(text=f"{len(resultado.generados)} informes generados")
+    if resultado.fallidos or resultado.cancelado:
+        messagebox.showwarning("Informes por lotes", resultado.resumen())
+    else:
+        messagebox.showinfo("Informes por lotes", resultado.resumen())
+    if resultado.salida is not None and not resultado.cancelado:
+        from pdf_utils import open_pdf
+        open_pdf(str(resultado.salida))
 
 def eliminar_muestras():
-    seleccionados = tabla.selection()
+    seleccionados = tabla.claves_seleccionadas()
     if not seleccionados:
         messagebox.showwarning("Aviso", "No se ha seleccionado ninguna muestra.")
         return
     try:
-        docs = db.collection("Borrado").document("Eliminación").get()
+        docs = obtener_db().collection("Borrado").document("Eliminación").get()
         if not docs.exists:
             messagebox.showerror("Error", "No se encontró el código de verificación en Firebase.")
             return
@@ -280,44 +637,58 @@ def eliminar_muestras():
         confirmacion = messagebox.askyesno("Confirmar eliminación", f"¿Deseas eliminar {len(seleccionados)} muestras?")
         if not confirmacion:
             return
-        for item_id in seleccionados:
-            muestra_id = tabla.item(item_id, 'values')[0]
-            try:
-                db.collection("Muestras").document(muestra_id).delete()
-                tabla.delete(item_id)
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar la muestra {muestra_id}.")
+        incluir_fotos = messagebox.askyesno("Fotos asociadas", "¿Eliminar también las fotos asociadas a estas muestras?")
     except Exception as e:
         messagebox.showerror("Error", "Ocurrió un error accediendo a Firestore.")
+        return
+
+    etiqueta_progreso.config(text=f"Eliminando 0/{len(seleccionados)} muestras…")
+
+    def _progreso(hechas, total):
+        root.after(0, lambda: etiqueta_progreso.config(text=f"Eliminando {hechas}/{total} muestras…"))
+
+    def _worker():
+        try:
+            resultado = borrar_muestras(obtener_db(), seleccionados, incluir_fotos=incluir_fotos, progreso=_progreso)
+        except Exception as e:
+            root.after(0, lambda: messagebox.showerror("Error", f"No se pudieron eliminar las muestras:\n{e}"))
+            return
+        root.after(0, lambda: _terminar_eliminacion(resultado))
+
+    threading.Thread(target=_worker, daemon=True).start()
+
+def _terminar_eliminacion(resultado):
+    global indice_muestras, resultados_df
+    if resultado.eliminadas:
+        cache_muestras.eliminar(resultado.eliminadas)
+        tabla.eliminar_claves(resultado.eliminadas)
+        resultados_df = tabla.datos
+        if indice_muestras is not None:
+            from indice_muestras import IndiceMuestras
+            base = indice_muestras.datos
+            indice_muestras = IndiceMuestras(base[~base["IdMuestra"].isin(resultado.eliminadas)])
+    etiqueta_progreso.config(text=f"{len(resultado.eliminadas)} muestras eliminadas")
+    if resultado.fallidas:
+        messagebox.showwarning("Eliminación incompleta", resultado.resumen())
+    else:
+        messagebox.showinfo("Eliminación completada", resultado.resumen())
 
 def generar_informe_general():
-    seleccionados = tabla.selection()
-    if not seleccionados:
+    seleccionados = tabla.registros_seleccionados()
+    if seleccionados is None or seleccionados.empty:
         messagebox.showwarning("Aviso", "Debes seleccionar una o más muestras.")
         return
-    datos = []
-    for item_id in seleccionados:
-        valores = tabla.item(item_id)["values"]
-        muestra = resultados_df[resultados_df["IdMuestra"] == valores[0]].iloc[0].to_dict()
-        datos.append(muestra)
-    try:
-        generar_pdf_general(datos)
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo generar el informe:\n{str(e)}")
+    datos = seleccionados.to_dict(orient="records")
+    from informe_generator_general import generar_pdf_general
+    encolar_informe(f"General ({len(datos)} muestras)", generar_pdf_general, datos, abrir=False)
 
 def ejecutar_informe_comercial():
-    seleccionados = tabla.selection()
-    if not seleccionados:
+    seleccionados = tabla.registros_seleccionados()
+    if seleccionados is None or seleccionados.empty:
         messagebox.showwarning("Sin selección", "Debes seleccionar una o más muestras.")
         return
-    boletas_unicas = set()
-    muestras_seleccionadas = []
-    for item_id in seleccionados:
-        valores = tabla.item(item_id)["values"]
-        boleta = valores[1]
-        boletas_unicas.add(boleta)
-        id_muestra = valores[0]
-        muestras_seleccionadas.append(id_muestra)
+    boletas_unicas = set(seleccionados["Boleta"].astype(str))
+    muestras_seleccionadas = seleccionados["IdMuestra"].tolist()
     popup = tk.Toplevel(root)
     popup.iconphoto(False, logo_icon)
 
@@ -330,32 +701,33 @@ def ejecutar_informe_comercial():
         entrada.grid(row=row, column=1, padx=10, pady=5)
         entradas_kg[boleta] = entrada
         row += 1
+    def _trabajo():
+        df_filtrado = []
+        for id_muestra in muestras_seleccionadas:
+            doc = obtener_db().collection("Muestras").document(id_muestra).get()
+            if doc.exists:
+                data = doc.to_dict()
+                data["IdMuestra"] = id_muestra
+                data["Boleta"] = data.get("Boleta", "")
+                data["CULTIVO"] = data.get("CULTIVO", "")
+                data["Tipo"] = data.get("Tipo", "")
+                data["Nombre"] = data.get("Nombre", "")
+                df_filtrado.append(data)
+        lista_datos = df_filtrado
+        nombre_referencia = lista_datos[0].get("Nombre") if lista_datos else None
+        from informe_generator_comercial import generar_informe_comercial_desde_ui
+        return generar_informe_comercial_desde_ui(lista_datos, nombre=nombre_referencia, abrir=False)
+
     def generar():
-        try:
-            df_filtrado = []
-            for id_muestra in muestras_seleccionadas:
-                doc = db.collection("Muestras").document(id_muestra).get()
-                if doc.exists:
-                    data = doc.to_dict()
-                    data["IdMuestra"] = id_muestra
-                    data["Boleta"] = data.get("Boleta", "")
-                    data["CULTIVO"] = data.get("CULTIVO", "")
-                    data["Tipo"] = data.get("Tipo", "")
-                    data["Nombre"] = data.get("Nombre", "")
-                    df_filtrado.append(data)
-            lista_datos = df_filtrado
-            nombre_referencia = lista_datos[0].get("Nombre") if lista_datos else None
-            generar_informe_comercial_desde_ui(lista_datos, nombre=nombre_referencia)
-            popup.destroy()
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el informe:\n{str(e)}")
+        encolar_informe(f"Comercial ({len(boletas_unicas)} boletas)", _trabajo)
+        popup.destroy()
     tk.Button(popup, text="Generar informe", command=generar).grid(row=row, column=0, columnspan=2, pady=10)
 def generar_informe_unico_por_boleta():
     cultivo = filtros["CULTIVO"].get().strip()
     if not cultivo:
         messagebox.showwarning("Filtro requerido", "Debes filtrar un cultivo para usar esta función.")
         return
-    if resultados_df.empty:
+    if resultados_df is None or resultados_df.empty:
         messagebox.showinfo("Sin datos", "No hay resultados para generar el informe.")
         return
 
@@ -374,7 +746,8 @@ def generar_informe_unico_por_boleta():
         df_unico = df_ordenado.drop_duplicates(subset="Boleta", keep="first")
 
         lista_datos = df_unico.to_dict(orient="records")
-        generar_pdf_general(lista_datos)
+        from informe_generator_general import generar_pdf_general
+        encolar_informe(f"Última muestra · {cultivo} ({len(lista_datos)} boletas)", generar_pdf_general, lista_datos, abrir=False)
     except Exception as e:
         messagebox.showerror("Error", f"No se pudo generar el informe:\n{str(e)}")
 def calcular_aforo():
@@ -382,7 +755,7 @@ def calcular_aforo():
     if not cultivo:
         messagebox.showwarning("Filtro requerido", "Debes filtrar un cultivo para usar esta función.")
         return
-    if resultados_df.empty:
+    if resultados_df is None or resultados_df.empty:
         messagebox.showinfo("Sin datos", "No hay muestras para analizar.")
         return
 
@@ -397,48 +770,20 @@ def calcular_aforo():
         return
 
     try:
-        df_filtrado["FechaHora"] = pd.to_datetime(df_filtrado["FechaHora"], errors='coerce', utc=True)
-        df_ordenado = df_filtrado.sort_values("FechaHora", ascending=False)
-        df_unico = df_ordenado.drop_duplicates(subset="Boleta", keep="first")
+        import aforo
+        boletas = df_filtrado["Boleta"].astype(str).str.strip().unique()
+        eepp = aforo.tabla_eepp(obtener_resolver_eepp(obtener_db()).resolver(boletas))
+        resultado = aforo.calcular_aforo(df_filtrado, eepp)
 
-        resultados = []
-        for _, row in df_unico.iterrows():
-            boleta = str(row.get("Boleta", "")).strip()
-            aforo_valor = str(row.get("Aforo (Kg/árbol)", "")).strip()
-            try:
-                aforo = float(aforo_valor.replace(",", "."))
-                if aforo < 0:
-                    aforo = 0
-            except:
-                aforo = 0
-
-            try:
-                doc_eepp = db.collection("EEPP").document(boleta).get()
-                if not doc_eepp.exists:
-                    continue
-                datos = doc_eepp.to_dict()
-                arboles_valor = str(datos.get("Arbol", "")).strip()
-                try:
-                    arboles = float(arboles_valor.replace(",", "."))
-                    if arboles <= 0:
-                        continue
-                except:
-                    continue
-
-                total_kg = round(aforo * arboles, 2)
-                resultados.append((boleta, aforo, arboles, total_kg))
-            except:
-                continue
-
-        if not resultados:
+        if resultado.empty:
             messagebox.showinfo("Sin resultados", "No se encontraron datos válidos de aforo.")
             return
 
-        mostrar_resultados_aforo(resultados)
+        mostrar_resultados_aforo(resultado)
 
     except Exception as e:
         messagebox.showerror("Error", f"Ocurrió un error:\n{str(e)}")
-def mostrar_resultados_aforo(resultados):
+def mostrar_resultados_aforo(resultado):
     ventana = tk.Toplevel(root)
     ventana.title("Resultado Aforo por Boleta")
     if logo_icon:
@@ -446,16 +791,187 @@ def mostrar_resultados_aforo(resultados):
 
     ttk.Label(ventana, text="Resumen de Aforo (Kg estimados por boleta):", font=("Segoe UI", 11, "bold")).pack(pady=(10,5))
 
-    tabla = ttk.Treeview(ventana, columns=["Boleta", "Kg/Árbol", "Árboles", "Total Kg"], show="headings")
-    for col in ["Boleta", "Kg/Árbol", "Árboles", "Total Kg"]:
+    tabla = ttk.Treeview(ventana, columns=list(resultado.columns), show="headings")
+    for col in resultado.columns:
         tabla.heading(col, text=col)
         tabla.column(col, anchor="center", width=120)
     tabla.pack(expand=True, fill="both", padx=10, pady=10)
 
-    for boleta, aforo, arboles, total in resultados:
-        tabla.insert("", "end", values=[boleta, aforo, arboles, total])
+    for fila in resultado.itertuples(index=False):
+        tabla.insert("", "end", values=list(fila))
+
+    ttk.Label(ventana, text=f"Boletas: {len(resultado)} · Total Kg: {resultado['Total Kg'].sum():,.2f}").pack()
+
+    def exportar():
+        from tkinter import filedialog
+        import aforo
+        ruta = filedialog.asksaveasfilename(
+            parent=ventana,
+            title="Exportar aforo",
+            defaultextension=".csv",
+            initialfile="aforo.csv",
+            filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx")],
+        )
+        if not ruta:
+            return
+        try:
+            aforo.exportar_aforo(resultado, ruta)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo exportar el aforo:\n{str(e)}", parent=ventana)
+            return
+        messagebox.showinfo("Aforo exportado", f"Guardado en:\n{ruta}", parent=ventana)
+
+    frame_acciones = ttk.Frame(ventana)
+    frame_acciones.pack(pady=(0, 10))
+    ttk.Button(frame_acciones, text="💾 Exportar CSV/Excel", command=exportar).grid(row=0, column=0, padx=5)
+    ttk.Button(frame_acciones, text="Cerrar", command=ventana.destroy).grid(row=0, column=1, padx=5)
+
+# === Cola de informes ===
+def _trabajo_actualizado(trabajo):
+    pendientes = cola_informes.pendientes()
+    boton_panel_informes.config(text=f"📋 Informes ({pendientes})" if pendientes else "📋 Informes")
+    _refrescar_panel_informes()
+    if trabajo.estado == TERMINADO and trabajo.ruta:
+        etiqueta_progreso.config(text=f"Informe listo: {trabajo.titulo}")
+        from pdf_utils import open_pdf
+        open_pdf(trabajo.ruta)
+    elif trabajo.estado == FALLIDO:
+        messagebox.showerror("Error", f"No se pudo generar el informe '{trabajo.titulo}':\n{trabajo.error}")
+
+cola_informes = ColaInformes(al_cambio=lambda trabajo: root.after(0, _trabajo_actualizado, trabajo))
+
+def encolar_informe(titulo, funcion, *args, **kwargs):
+    cola_informes.encolar(titulo, funcion, *args, **kwargs)
+    etiqueta_progreso.config(text=f"Informe en cola: {titulo}")
+
+def _refrescar_panel_informes():
+    if panel_informes is None or not panel_informes.winfo_exists():
+        return
+    arbol = panel_informes.arbol
+    seleccion = arbol.selection()
+    arbol.delete(*arbol.get_children())
+    for trabajo in reversed(cola_informes.trabajos()):
+        duracion = trabajo.duracion()
+        detalle = trabajo.error or trabajo.ruta or ""
+        arbol.insert(
+            "", "end", iid=str(trabajo.id),
+            values=(trabajo.titulo, trabajo.estado, "" if duracion is None else f"{duracion:.1f} s", detalle),
+        )
+    arbol.selection_set([iid for iid in seleccion if arbol.exists(iid)])
+
+def abrir_panel_informes():
+    global panel_informes
+    if panel_informes is not None and panel_informes.winfo_exists():
+        panel_informes.lift()
+        return
+    panel_informes = tk.Toplevel(root)
+    panel_informes.title("Informes en segundo plano")
+    panel_informes.geometry("760x320")
+    if logo_icon:
+        panel_informes.iconphoto(False, logo_icon)
+
+    columnas = ("Informe", "Estado", "Duración", "Detalle")
+    arbol = ttk.Treeview(panel_informes, columns=columnas, show="headings", height=10)
+    for col, ancho in zip(columnas, (260, 90, 80, 300)):
+        arbol.heading(col, text=col)
+        arbol.column(col, width=ancho, anchor="w")
+    arbol.pack(expand=True, fill="both", padx=10, pady=(10, 5))
+    panel_informes.arbol = arbol
+
+    def _seleccionados():
+        return [int(iid) for iid in arbol.selection()]
 
-    ttk.Button(ventana, text="Cerrar", command=ventana.destroy).pack(pady=(0, 10))
+    def cancelar():
+        for id_trabajo in _seleccionados():
+            cola_informes.cancelar(id_trabajo)
+
+    def abrir_pdf():
+        from pdf_utils import open_pdf
+        rutas = {t.id: t.ruta for t in cola_informes.trabajos() if t.estado == TERMINADO and t.ruta}
+        for id_trabajo in _seleccionados():
+            if id_trabajo in rutas:
+                open_pdf(rutas[id_trabajo])
+
+    def limpiar():
+        cola_informes.limpiar_terminados()
+        _refrescar_panel_informes()
+
+    frame_acciones = ttk.Frame(panel_informes)
+    frame_acciones.pack(pady=(0, 10))
+    ttk.Button(frame_acciones, text="✖ Cancelar", command=cancelar).grid(row=0, column=0, padx=5)
+    ttk.Button(frame_acciones, text="📄 Abrir PDF", command=abrir_pdf).grid(row=0, column=1, padx=5)
+    ttk.Button(frame_acciones, text="🧹 Limpiar terminados", command=limpiar).grid(row=0, column=2, padx=5)
+    ttk.Button(frame_acciones, text="Cerrar", command=panel_informes.destroy).grid(row=0, column=3, padx=5)
+    arbol.bind("<Double-1>", lambda _e: abrir_pdf())
+
+    def _refresco_periodico():
+        if panel_informes is not None and panel_informes.winfo_exists():
+            if cola_informes.pendientes():
+                _refrescar_panel_informes()
+            panel_informes.after(1000, _refresco_periodico)
+
+    _refrescar_panel_informes()
+    _refresco_periodico()
+
+def abrir_panel_herramientas():
+    from herramientas import abrir_herramientas
+    abrir_herramientas(root, obtener_db())
+
+# Filtrado al escribir sobre el último resultado cargado
+for _campo in CAMPOS_FILTRO_LOCAL:
+    filtros[_campo].bind("<KeyRelease>", _programar_filtro_local)
+
+# === Arranque en segundo plano ===
+def _precargar_usuarios():
+    try:
+        usuarios_dict.update(cargar_usuarios())
+    finally:
+        _usuarios_cargados.set()
+
+def _escuchar_plantillas():
+    global cache_plantillas
+    cache_plantillas = obtener_cache_plantillas(obtener_db()).escuchar()
+
+def _precargar_informes():
+    import importlib
+    for modulo in ("indice_muestras", "informe_generator", "informe_generator_general", "informe_generator_comercial"):
+        importlib.import_module(modulo)
+
+def _fin_precarga():
+    medidor_arranque.marcar("arranque completo")
+    if medidor_arranque.salir_al_terminar:
+        root.after(0, _on_close)
+
+_arranque_lanzado = False
+
+def _al_mostrar_ventana(event):
+    """Primer ``<Map>`` de la ventana principal: ya está en pantalla."""
+    global _arranque_lanzado
+    # Los hijos heredan el binding de la ventana: solo cuenta la propia raíz.
+    if event.widget is not root or _arranque_lanzado:
+        return
+    _arranque_lanzado = True
+    medidor_arranque.marcar("ventana principal visible")
+    # Tk repinta en tareas idle: la precarga empieza con la ventana ya dibujada.
+    root.after_idle(_tras_primer_pintado)
+
+def _tras_primer_pintado():
+    root.update_idletasks()
+    _crear_selectores_fecha()
+    precargar(
+        [
+            ("firebase", obtener_db),
+            ("usuarios", _precargar_usuarios),
+            ("plantillas", _escuchar_plantillas),
+            ("pandas", pd.cargar),
+            ("informes", _precargar_informes),
+            ("limpieza PDFs", lambda: cleanup_old_pdfs(max_age_hours=24)),
+        ],
+        al_terminar=_fin_precarga,
+        medidor=medidor_arranque,
+    )
+
+root.bind("<Map>", _al_mostrar_ventana, add="+")
 
 # Ejecutar app
 root.mainloop()
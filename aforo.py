@@ -0,0 +1,87 @@
+"""Cálculo vectorizado del aforo (kg estimados) por boleta.
+
+Se toma la última muestra de cada boleta, se cruza con una tabla de EEPP (número
+de árboles) y se multiplica columna a columna. El parseo numérico se hace una vez
+por columna con ``pd.to_numeric``, admitiendo coma decimal, en lugar de fila a
+fila. Las reglas son las del cálculo original: un aforo ausente, ilegible o
+negativo cuenta como 0, y las boletas sin EEPP o sin árboles positivos se omiten.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import pandas as pd
+
+COLUMNA_AFORO = "Aforo (Kg/árbol)"
+CAMPO_ARBOLES_EEPP = "Arbol"
+COLUMNAS_RESULTADO = ["Boleta", "Kg/Árbol", "Árboles", "Total Kg"]
+
+
+def a_numero(serie: pd.Series) -> pd.Series:
+    """Convierte textos como ``" 12,5 "`` en float; lo ilegible queda como NaN."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(texto, errors="coerce").astype(float)
+
+
+def ultima_muestra_por_boleta(df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por boleta (la de ``FechaHora`` más reciente), de la más nueva a la más antigua."""
+    fechas = pd.to_datetime(df["FechaHora"], errors="coerce", utc=True)
+    ordenado = df.assign(FechaHora=fechas).sort_values("FechaHora", ascending=False, kind="mergesort")
+    return ordenado.drop_duplicates(subset="Boleta", keep="first")
+
+
+def tabla_eepp(datos: Mapping[str, Mapping[str, Any] | None], campos: Iterable[str] = (CAMPO_ARBOLES_EEPP,)) -> pd.DataFrame:
+    """DataFrame indexado por boleta a partir de ``EEPPResolver.resolver``; omite las inexistentes."""
+    campos = list(campos)
+    filas = {boleta: {campo: doc.get(campo) for campo in campos} for boleta, doc in datos.items() if doc}
+    tabla = pd.DataFrame.from_dict(filas, orient="index", columns=campos)
+    tabla.index = tabla.index.astype(str)
+    tabla.index.name = "Boleta"
+    return tabla
+
+
+def calcular_aforo(df_muestras: pd.DataFrame, eepp: pd.DataFrame) -> pd.DataFrame:
+    """Aforo por boleta con las columnas de ``COLUMNAS_RESULTADO``."""
+    if df_muestras.empty:
+        return pd.DataFrame(columns=COLUMNAS_RESULTADO)
+    ultimas = ultima_muestra_por_boleta(df_muestras)
+    boletas = ultimas["Boleta"].astype(str).str.strip()
+
+    if COLUMNA_AFORO in ultimas.columns:
+        aforo = a_numero(ultimas[COLUMNA_AFORO]).fillna(0.0).clip(lower=0.0)
+    else:
+        aforo = pd.Series(0.0, index=ultimas.index)
+
+    arboles_eepp = a_numero(eepp[CAMPO_ARBOLES_EEPP]) if CAMPO_ARBOLES_EEPP in eepp.columns else pd.Series(dtype=float)
+    arboles = boletas.map(arboles_eepp)
+
+    resultado = pd.DataFrame(
+        {
+            "Boleta": boletas.to_numpy(),
+            "Kg/Árbol": aforo.to_numpy(),
+            "Árboles": arboles.to_numpy(),
+        }
+    )
+    resultado = resultado[resultado["Árboles"] > 0].reset_index(drop=True)
+    resultado["Total Kg"] = (resultado["Kg/Árbol"] * resultado["Árboles"]).round(2)
+    return resultado
+
+
+def exportar_aforo(resultado: pd.DataFrame, ruta: str | Path) -> Path:
+    """Guarda el aforo en CSV o Excel según la extensión de ``ruta``.
+
+    El CSV usa ``;`` y coma decimal para abrirse directamente en Excel en español.
+    Para ``.xlsx`` hace falta ``openpyxl``.
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in (".xlsx", ".xls"):
+        try:
+            resultado.to_excel(ruta, index=False, sheet_name="Aforo")
+        except ImportError as e:
+            raise RuntimeError("Para exportar a Excel instala 'openpyxl' o guarda como CSV.") from e
+    else:
+        resultado.to_csv(ruta, index=False, sep=";", decimal=",", encoding="utf-8-sig")
+    return ruta
@@ -0,0 +1,100 @@
+"""Arranque perezoso de la aplicación y medición de tiempos de inicio.
+
+La ventana principal se pinta antes de cargar nada pesado (Firebase, pandas,
+reportlab, los generadores de informes); esos módulos se precargan después en un
+hilo de fondo. ``ModuloPerezoso`` permite seguir escribiendo ``pd.DataFrame(...)``
+aunque ``pandas`` todavía no se haya importado: el primer acceso a un atributo
+lo importa (o espera a que termine la precarga en curso).
+
+Para medir el arranque: ``HARVESTSYNC_MEDIR_ARRANQUE=1`` o ``--medir-arranque``.
+Se imprimen en ``stderr`` los milisegundos de cada etapa desde el inicio del
+proceso; con la opción de línea de comandos la aplicación se cierra sola al
+terminar la precarga, para poder repetir la medición desde un script.
+"""
+from __future__ import annotations
+
+import importlib
+import os
+import sys
+import threading
+import time
+import traceback
+from types import ModuleType
+from typing import Any, Callable, Iterable
+
+MEDIR_ARRANQUE_ENV = "HARVESTSYNC_MEDIR_ARRANQUE"
+OPCION_MEDIR_ARRANQUE = "--medir-arranque"
+
+INICIO_PROCESO = time.perf_counter()
+
+
+class ModuloPerezoso:
+    """Sustituto de un módulo que lo importa en el primer acceso a un atributo."""
+
+    def __init__(self, nombre: str) -> None:
+        self._nombre = nombre
+        self._modulo: ModuleType | None = None
+        self._lock = threading.Lock()
+
+    def cargar(self) -> ModuleType:
+        if self._modulo is None:
+            with self._lock:
+                if self._modulo is None:
+                    self._modulo = importlib.import_module(self._nombre)
+        return self._modulo
+
+    def __getattr__(self, atributo: str) -> Any:
+        return getattr(self.cargar(), atributo)
+
+
+class MedidorArranque:
+    """Registra hitos del arranque en milisegundos desde ``INICIO_PROCESO``."""
+
+    def __init__(self, activo: bool, salir_al_terminar: bool = False) -> None:
+        self.activo = activo
+        self.salir_al_terminar = salir_al_terminar
+        self.hitos: dict[str, float] = {}
+
+    @classmethod
+    def desde_entorno(cls, argv: list[str] | None = None) -> "MedidorArranque":
+        argv = sys.argv if argv is None else argv
+        por_opcion = OPCION_MEDIR_ARRANQUE in argv
+        por_entorno = os.environ.get(MEDIR_ARRANQUE_ENV, "").strip() not in ("", "0")
+        return cls(por_opcion or por_entorno, salir_al_terminar=por_opcion)
+
+    def marcar(self, hito: str) -> None:
+        if not self.activo:
+            return
+        ms = (time.perf_counter() - INICIO_PROCESO) * 1000
+        self.hitos[hito] = ms
+        print(f"[arranque] {hito}: {ms:.0f} ms", file=sys.stderr, flush=True)
+
+
+def precargar(
+    tareas: Iterable[tuple[str, Callable[[], Any]]],
+    al_terminar: Callable[[], None] | None = None,
+    medidor: MedidorArranque | None = None,
+) -> threading.Thread:
+    """Ejecuta ``tareas`` (nombre, función) en orden en un hilo daemon.
+
+    Un fallo en una tarea se imprime y no impide las siguientes; las funciones
+    que dependan de ella volverán a intentarlo (y a fallar con su propio
+    mensaje) cuando el usuario las use.
+    """
+    tareas = list(tareas)
+
+    def _ejecutar() -> None:
+        for nombre, tarea in tareas:
+            try:
+                tarea()
+            except Exception:
+                print(f"⚠️ Falló la precarga de {nombre}:", file=sys.stderr)
+                traceback.print_exc()
+            if medidor is not None:
+                medidor.marcar(f"precarga {nombre}")
+        if al_terminar is not None:
+            al_terminar()
+
+    hilo = threading.Thread(target=_ejecutar, daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,207 @@
+"""Borrado masivo de muestras con ``WriteBatch`` en paralelo.
+
+Las muestras (y, opcionalmente, sus documentos de ``Fotos``) se reparten en
+lotes de como mucho 500 operaciones, el límite de un ``WriteBatch``. Los lotes se
+confirman en paralelo con reintentos y espera exponencial; un lote que agota los
+reintentos deja sus muestras como fallidas sin detener el resto. Todas las
+referencias de una misma muestra van en el mismo lote siempre que quepan, de
+modo que la muestra y sus fotos se borran o se conservan juntas.
+
+Una muestra con más de 500 referencias no cabe en un ``WriteBatch`` y su borrado
+no puede ser atómico: sus lotes se confirman uno tras otro, con el documento de
+la muestra en el último, y si uno falla no se sigue. La muestra nunca desaparece
+dejando fotos huérfanas, pero sí puede quedar con parte de sus fotos borradas.
+
+Solo se borran documentos de Firestore; los ficheros de Storage a los que
+apuntan las fotos no se tocan.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Sequence
+
+COLECCION_MUESTRAS = "Muestras"
+COLECCION_FOTOS = "Fotos"
+CAMPO_FOTO_MUESTRA = "idMuestra"
+TAMANO_LOTE_BORRADO = 500
+TAMANO_LOTE_IN = 30
+HILOS_BORRADO = 4
+REINTENTOS_COMMIT = 3
+ESPERA_BASE_S = 0.5
+
+
+@dataclass
+class LoteBorrado:
+    """Referencias de un ``WriteBatch`` y las muestras que dependen de él."""
+
+    muestras: list[str]
+    referencias: list[Any]
+
+
+@dataclass
+class ResultadoBorrado:
+    eliminadas: list[str] = field(default_factory=list)
+    fotos_eliminadas: int = 0
+    fallidas: dict[str, str] = field(default_factory=dict)
+    segundos: float = 0.0
+
+    def resumen(self) -> str:
+        lineas = [f"Muestras eliminadas: {len(self.eliminadas)}"]
+        if self.fotos_eliminadas:
+            lineas.append(f"Fotos eliminadas: {self.fotos_eliminadas}")
+        if self.fallidas:
+            lineas.append(f"Muestras no eliminadas: {len(self.fallidas)}")
+            for id_muestra, error in list(self.fallidas.items())[:10]:
+                lineas.append(f"  • {id_muestra}: {error}")
+            if len(self.fallidas) > 10:
+                lineas.append(f"  … y {len(self.fallidas) - 10} más")
+        lineas.append(f"Tiempo: {self.segundos:.1f} s")
+        return "\n".join(lineas)
+
+
+def _trocear(valores: Sequence[Any], tamano: int) -> Iterable[Sequence[Any]]:
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio : inicio + tamano]
+
+
+def buscar_fotos(db: Any, ids_muestra: Sequence[str], hilos: int = HILOS_BORRADO) -> dict[str, list[Any]]:
+    """Referencias de ``Fotos`` por muestra, consultando con ``in`` de 30 en 30."""
+    fotos: dict[str, list[Any]] = {id_muestra: [] for id_muestra in ids_muestra}
+
+    def _consultar(trozo: Sequence[str]) -> list[tuple[str, Any]]:
+        query = db.collection(COLECCION_FOTOS).where(CAMPO_FOTO_MUESTRA, "in", list(trozo))
+        return [((doc.to_dict() or {}).get(CAMPO_FOTO_MUESTRA), doc.reference) for doc in query.stream()]
+
+    with ThreadPoolExecutor(max_workers=max(hilos, 1)) as pool:
+        for encontrados in pool.map(_consultar, list(_trocear(list(ids_muestra), TAMANO_LOTE_IN))):
+            for id_muestra, referencia in encontrados:
+                fotos.setdefault(str(id_muestra), []).append(referencia)
+    return fotos
+
+
+def agrupar_en_lotes(
+    grupos: Iterable[tuple[str, list[Any]]],
+    limite: int = TAMANO_LOTE_BORRADO,
+) -> list[LoteBorrado]:
+    """Empaqueta ``(id_muestra, referencias)`` en lotes sin partir muestras si caben.
+
+    Una muestra con más referencias que ``limite`` ocupa varios lotes propios,
+    con el documento de la muestra (la última referencia) en el último.
+    """
+    lotes: list[LoteBorrado] = []
+    actual = LoteBorrado([], [])
+    for id_muestra, referencias in grupos:
+        if len(referencias) > limite:
+            if actual.referencias:
+                lotes.append(actual)
+                actual = LoteBorrado([], [])
+            for trozo in _trocear(referencias, limite):
+                lotes.append(LoteBorrado([id_muestra], list(trozo)))
+            continue
+        if len(actual.referencias) + len(referencias) > limite:
+            lotes.append(actual)
+            actual = LoteBorrado([], [])
+        actual.muestras.append(id_muestra)
+        actual.referencias.extend(referencias)
+    if actual.referencias:
+        lotes.append(actual)
+    return lotes
+
+
+def encadenar_lotes(lotes: Sequence[LoteBorrado]) -> list[list[LoteBorrado]]:
+    """Agrupa los lotes consecutivos de una misma muestra partida para confirmarlos en orden."""
+    cadenas: list[list[LoteBorrado]] = []
+    for lote in lotes:
+        if cadenas and len(lote.muestras) == 1 and cadenas[-1][-1].muestras == lote.muestras:
+            cadenas[-1].append(lote)
+        else:
+            cadenas.append([lote])
+    return cadenas
+
+
+def _confirmar_cadena(
+    db: Any,
+    cadena: Sequence[LoteBorrado],
+    reintentos: int,
+    espera_base_s: float,
+    dormir: Callable[[float], None],
+) -> None:
+    # Un lote que agota los reintentos corta la cadena: el documento de la muestra,
+    # en el último lote, solo se borra si todo lo anterior se ha borrado.
+    for lote in cadena:
+        _confirmar_lote(db, lote, reintentos, espera_base_s, dormir)
+
+
+def _confirmar_lote(
+    db: Any,
+    lote: LoteBorrado,
+    reintentos: int,
+    espera_base_s: float,
+    dormir: Callable[[float], None],
+) -> None:
+    for intento in range(reintentos + 1):
+        batch = db.batch()
+        for referencia in lote.referencias:
+            batch.delete(referencia)
+        try:
+            batch.commit()
+            return
+        except Exception:
+            if intento >= reintentos:
+                raise
+            dormir(espera_base_s * (2 ** intento))
+
+
+def borrar_muestras(
+    db: Any,
+    ids_muestra: Iterable[str],
+    incluir_fotos: bool = False,
+    hilos: int = HILOS_BORRADO,
+    reintentos: int = REINTENTOS_COMMIT,
+    espera_base_s: float = ESPERA_BASE_S,
+    progreso: Callable[[int, int], None] | None = None,
+    dormir: Callable[[float], None] = time.sleep,
+) -> ResultadoBorrado:
+    """Borra las muestras indicadas y devuelve un único resumen del proceso.
+
+    ``progreso(hechos, total)`` se llama desde el hilo que invoca la función
+    cada vez que termina un lote, con el número de muestras ya resueltas
+    (borradas o fallidas).
+    """
+    inicio = time.monotonic()
+    ids = list(dict.fromkeys(str(i) for i in ids_muestra if str(i).strip()))
+    resultado = ResultadoBorrado()
+    if not ids:
+        return resultado
+
+    fotos = buscar_fotos(db, ids, hilos) if incluir_fotos else {}
+    coleccion = db.collection(COLECCION_MUESTRAS)
+    grupos = [(id_muestra, fotos.get(id_muestra, []) + [coleccion.document(id_muestra)]) for id_muestra in ids]
+    cadenas = encadenar_lotes(agrupar_en_lotes(grupos))
+
+    fallidas: dict[str, str] = {}
+    fotos_por_muestra = {id_muestra: len(fotos.get(id_muestra, [])) for id_muestra in ids}
+    resueltas = 0
+
+    with ThreadPoolExecutor(max_workers=max(hilos, 1)) as pool:
+        futuros = {
+            pool.submit(_confirmar_cadena, db, cadena, reintentos, espera_base_s, dormir): cadena[0].muestras
+            for cadena in cadenas
+        }
+        for futuro in as_completed(futuros):
+            muestras = futuros[futuro]
+            error = futuro.exception()
+            if error is not None:
+                for id_muestra in muestras:
+                    fallidas[id_muestra] = str(error) or type(error).__name__
+            resueltas += len(muestras)
+            if progreso is not None:
+                progreso(resueltas, len(ids))
+
+    resultado.fallidas = {id_muestra: fallidas[id_muestra] for id_muestra in ids if id_muestra in fallidas}
+    resultado.eliminadas = [id_muestra for id_muestra in ids if id_muestra not in fallidas]
+    resultado.fotos_eliminadas = sum(fotos_por_muestra[id_muestra] for id_muestra in resultado.eliminadas)
+    resultado.segundos = time.monotonic() - inicio
+    return resultado
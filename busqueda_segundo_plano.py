@@ -0,0 +1,89 @@
+"""Búsqueda en un hilo de fondo que entrega resultados parciales a la UI.
+
+El hilo consume una fuente de registros (un generador que puede estar leyendo de
+Firestore o de la caché local) y los agrupa en páginas. Las páginas, el final y
+los errores se entregan a través de ``planificar``, que en la aplicación es
+``root.after(0, ...)`` para que todo lo que toca widgets ocurra en el hilo de Tk.
+Cancelar solo levanta una bandera: el hilo deja de leer en el siguiente registro
+y cualquier entrega ya encolada se descarta al ejecutarse.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+PAGINA_MINIMA = 500
+INTERVALO_ENTREGA_S = 0.25
+
+Fuente = Callable[[threading.Event], Iterable[dict[str, Any]]]
+
+
+class BusquedaEnSegundoPlano:
+    """Ejecuta ``fuente`` en un hilo daemon y notifica páginas, fin o error."""
+
+    def __init__(
+        self,
+        fuente: Fuente,
+        planificar: Callable[[Callable[[], None]], Any],
+        al_pagina: Callable[[list[dict[str, Any]], int], None],
+        al_terminar: Callable[[int], None],
+        al_error: Callable[[Exception], None] | None = None,
+        pagina_minima: int = PAGINA_MINIMA,
+        intervalo_entrega_s: float = INTERVALO_ENTREGA_S,
+    ) -> None:
+        self._fuente = fuente
+        self._planificar = planificar
+        self._al_pagina = al_pagina
+        self._al_terminar = al_terminar
+        self._al_error = al_error
+        self._pagina_minima = max(int(pagina_minima), 1)
+        self._intervalo = intervalo_entrega_s
+        self._cancelado = threading.Event()
+        self._hilo: threading.Thread | None = None
+
+    @property
+    def cancelada(self) -> bool:
+        return self._cancelado.is_set()
+
+    def cancelar(self) -> None:
+        self._cancelado.set()
+
+    def iniciar(self) -> "BusquedaEnSegundoPlano":
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+        return self
+
+    def esperar(self, timeout: float | None = None) -> None:
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def _entregar(self, funcion: Callable[..., None], *args: Any) -> None:
+        def _si_vigente() -> None:
+            if not self._cancelado.is_set():
+                funcion(*args)
+
+        self._planificar(_si_vigente)
+
+    def _ejecutar(self) -> None:
+        leidos = 0
+        pendientes: list[dict[str, Any]] = []
+        ultima_entrega = time.monotonic()
+        try:
+            for registro in self._fuente(self._cancelado):
+                if self._cancelado.is_set():
+                    return
+                pendientes.append(registro)
+                leidos += 1
+                if len(pendientes) >= self._pagina_minima and time.monotonic() - ultima_entrega >= self._intervalo:
+                    self._entregar(self._al_pagina, pendientes, leidos)
+                    pendientes = []
+                    ultima_entrega = time.monotonic()
+            if self._cancelado.is_set():
+                return
+            if pendientes:
+                self._entregar(self._al_pagina, pendientes, leidos)
+            self._entregar(self._al_terminar, leidos)
+        except Exception as e:
+            if self._al_error is not None and not self._cancelado.is_set():
+                self._entregar(self._al_error, e)
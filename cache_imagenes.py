@@ -0,0 +1,360 @@
+"""Caché en disco de las imágenes del servidor de fotos.
+
+Las entradas se indexan por ``ruta_local`` (lo que va detrás de ``/fotos/`` en la
+URL), de modo que sobreviven a cambios de la URL base del servidor; las URLs de
+otra forma se indexan con su host, ruta y consulta. El contenido
+se guarda direccionado por su SHA-256: dos rutas con la misma imagen comparten
+fichero y una descarga que devuelve los mismos bytes no reescribe nada.
+
+Cada entrada guarda los validadores que dio el servidor (``ETag`` /
+``Last-Modified``). Dentro de ``frescura_s`` se sirve sin tocar la red; pasado ese
+tiempo se revalida con una petición condicional y un ``304`` solo actualiza la
+fecha de validación. Si la revalidación falla por red se sirve la copia local.
+El tamaño total está acotado y se expulsa por LRU (último acceso), sin tocar los
+ficheros que se están leyendo en este proceso; si otro proceso expulsa uno en
+plena lectura, ``obtener`` lo vuelve a pedir.
+
+El transporte HTTP es intercambiable (``descargador_requests`` por defecto en el
+escritorio, ``descargador_urllib`` para el servicio interno, que no depende de
+``requests``). El índice es SQLite, seguro entre hilos y procesos; el módulo solo
+usa la biblioteca estándar para que el servicio pueda llevarlo consigo.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+from urllib.parse import unquote, urlparse
+
+CACHE_IMAGENES_DIR_ENV = "HARVESTSYNC_IMAGENES_CACHE_PATH"
+TAMANO_MAXIMO_BYTES = 512 * 1024 * 1024
+# Las fotos de una ruta no cambian una vez subidas: se revalidan poco.
+FRESCURA_S = 6 * 3600
+# Tras expulsar se deja margen para no expulsar en cada escritura.
+FRACCION_TRAS_EXPULSION = 0.9
+TIMEOUT_DESCARGA = (3.05, 10)
+
+
+@dataclass
+class RespuestaHTTP:
+    status: int
+    contenido: bytes = b""
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class ErrorDescargaImagen(Exception):
+    """La imagen no está en caché y el servidor no la ha devuelto."""
+
+    def __init__(self, url: str, status: int) -> None:
+        super().__init__(f"HTTP {status} descargando {url}")
+        self.url = url
+        self.status = status
+
+
+Descargador = Callable[[str, dict[str, str]], RespuestaHTTP]
+
+
+def descargador_requests(sesion: Any = None, timeout: Any = TIMEOUT_DESCARGA) -> Descargador:
+    """Transporte sobre ``requests`` (por defecto, la sesión compartida de ``descarga_fotos``)."""
+
+    def _descargar(url: str, cabeceras: dict[str, str]) -> RespuestaHTTP:
+        if sesion is None:
+            from descarga_fotos import obtener_sesion
+
+            cliente = obtener_sesion()
+        else:
+            cliente = sesion
+        resp = cliente.get(url, headers=cabeceras, timeout=timeout)
+        return RespuestaHTTP(
+            status=resp.status_code,
+            contenido=resp.content if resp.status_code == 200 else b"",
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+
+    return _descargar
+
+
+def descargador_urllib(timeout: float = TIMEOUT_DESCARGA[1]) -> Descargador:
+    """Transporte sobre ``urllib``; los errores HTTP distintos de ``304`` se propagan."""
+
+    def _descargar(url: str, cabeceras: dict[str, str]) -> RespuestaHTTP:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=cabeceras), timeout=timeout) as resp:
+                return RespuestaHTTP(
+                    status=resp.status,
+                    contenido=resp.read(),
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                )
+        except urllib.error.HTTPError as exc:
+            if exc.code != 304:
+                raise
+            return RespuestaHTTP(status=304)
+
+    return _descargar
+
+
+def clave_desde_url(url: str) -> str:
+    """``ruta_local`` de una URL ``.../fotos/<ruta_local>``; si no encaja, host + ruta + consulta."""
+    partes = urlparse(url)
+    ruta = unquote(partes.path)
+    marcador = "/fotos/"
+    if marcador in ruta:
+        return ruta.split(marcador, 1)[1].lstrip("/")
+    # Fuera del servidor de fotos la misma ruta en otro host es otra imagen.
+    clave = f"{partes.netloc}/{ruta.lstrip('/')}"
+    return f"{clave}?{partes.query}" if partes.query else clave
+
+
+def ruta_cache_por_defecto() -> Path:
+    """Carpeta persistente por usuario, junto a la caché de muestras."""
+    base = os.getenv("LOCALAPPDATA") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "HarvestSyncDesk" / "imagenes"
+
+
+class CacheImagenes:
+    """Caché de imágenes con índice SQLite y ficheros direccionados por contenido."""
+
+    def __init__(
+        self,
+        directorio: str | Path | None = None,
+        tamano_maximo: int = TAMANO_MAXIMO_BYTES,
+        frescura_s: float = FRESCURA_S,
+        reloj: Callable[[], float] = time.time,
+    ) -> None:
+        configurado = str(directorio or os.getenv(CACHE_IMAGENES_DIR_ENV, "")).strip()
+        self.directorio = Path(configurado) if configurado else ruta_cache_por_defecto()
+        self.db_path = str(self.directorio / "indice.sqlite")
+        self.tamano_maximo = tamano_maximo
+        self.frescura_s = frescura_s
+        self._reloj = reloj
+        self._initialized = False
+        self._lock = threading.Lock()
+        # Blobs que algún hilo está leyendo: la expulsión no los borra.
+        self._en_uso: dict[Path, int] = {}
+        self.descargas_completas = 0
+        self.revalidaciones = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000;")
+        return conn
+
+    def ensure_schema(self) -> None:
+        with self._lock:
+            if self._initialized:
+                return
+            (self.directorio / "blobs").mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode = WAL;")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS imagenes (
+                        clave TEXT PRIMARY KEY,
+                        sha256 TEXT NOT NULL,
+                        extension TEXT NOT NULL,
+                        tamano INTEGER NOT NULL,
+                        etag TEXT,
+                        last_modified TEXT,
+                        validado_en REAL NOT NULL,
+                        ultimo_acceso REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_imagenes_acceso ON imagenes(ultimo_acceso)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_imagenes_sha ON imagenes(sha256)")
+                conn.commit()
+            self._initialized = True
+
+    # --- Ficheros ---
+    def _ruta_blob(self, sha256: str, extension: str) -> Path:
+        return self.directorio / "blobs" / sha256[:2] / f"{sha256}{extension}"
+
+    def _guardar_blob(self, contenido: bytes, extension: str) -> str:
+        sha256 = hashlib.sha256(contenido).hexdigest()
+        destino = self._ruta_blob(sha256, extension)
+        if not destino.exists():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=destino.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(contenido)
+                os.replace(temporal, destino)
+            except BaseException:
+                Path(temporal).unlink(missing_ok=True)
+                raise
+        return sha256
+
+    # --- Consulta ---
+    def _leer_entrada(self, conn: sqlite3.Connection, clave: str) -> tuple[sqlite3.Row, Path] | None:
+        fila = conn.execute("SELECT * FROM imagenes WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        ruta = self._ruta_blob(fila["sha256"], fila["extension"])
+        if not ruta.exists():
+            conn.execute("DELETE FROM imagenes WHERE clave = ?", (clave,))
+            conn.commit()
+            return None
+        return fila, ruta
+
+    def obtener_ruta(self, url: str, descargar: Descargador | None = None, clave: str | None = None) -> Path:
+        """Ruta en disco de la imagen de ``url``, descargándola o revalidándola si hace falta."""
+        self.ensure_schema()
+        clave = clave or clave_desde_url(url)
+        descargar = descargar or descargador_requests()
+        ahora = self._reloj()
+
+        with self._connect() as conn:
+            entrada = self._leer_entrada(conn, clave)
+        if entrada is not None:
+            fila, ruta = entrada
+            if ahora - fila["validado_en"] < self.frescura_s:
+                self._tocar(clave, ahora)
+                return ruta
+            cabeceras = {}
+            if fila["etag"]:
+                cabeceras["If-None-Match"] = fila["etag"]
+            if fila["last_modified"]:
+                cabeceras["If-Modified-Since"] = fila["last_modified"]
+            try:
+                respuesta = descargar(url, cabeceras)
+            except Exception as e:
+                print(f"⚠️ Sin revalidar {clave}, se usa la copia local: {e}")
+                self._tocar(clave, ahora)
+                return ruta
+            self.revalidaciones += 1
+            if respuesta.status == 304:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE imagenes SET validado_en = ?, ultimo_acceso = ? WHERE clave = ?",
+                        (ahora, ahora, clave),
+                    )
+                    conn.commit()
+                return ruta
+        else:
+            respuesta = descargar(url, {})
+
+        if respuesta.status != 200 or not respuesta.contenido:
+            raise ErrorDescargaImagen(url, respuesta.status)
+        self.descargas_completas += 1
+        return self._guardar(clave, respuesta, ahora)
+
+    def obtener(self, url: str, descargar: Descargador | None = None, clave: str | None = None) -> bytes:
+        """Contenido de la imagen; si el blob desaparece en plena lectura se vuelve a pedir una vez."""
+        ruta = self.obtener_ruta(url, descargar, clave)
+        try:
+            with self._usando(ruta):
+                return ruta.read_bytes()
+        except FileNotFoundError:
+            # Otro proceso lo ha expulsado entre la consulta y la lectura.
+            ruta = self.obtener_ruta(url, descargar, clave)
+            with self._usando(ruta):
+                return ruta.read_bytes()
+
+    @contextmanager
+    def _usando(self, ruta: Path) -> Iterator[None]:
+        with self._lock:
+            self._en_uso[ruta] = self._en_uso.get(ruta, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                restantes = self._en_uso.pop(ruta) - 1
+                if restantes:
+                    self._en_uso[ruta] = restantes
+
+    def _tocar(self, clave: str, ahora: float) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE imagenes SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave))
+            conn.commit()
+
+    def _guardar(self, clave: str, respuesta: RespuestaHTTP, ahora: float) -> Path:
+        extension = Path(clave.split("?", 1)[0]).suffix.lower()[:10] or ".jpg"
+        sha256 = self._guardar_blob(respuesta.contenido, extension)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO imagenes (clave, sha256, extension, tamano, etag, last_modified, validado_en, ultimo_acceso)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(clave) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    extension = excluded.extension,
+                    tamano = excluded.tamano,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    validado_en = excluded.validado_en,
+                    ultimo_acceso = excluded.ultimo_acceso
+                """,
+                (clave, sha256, extension, len(respuesta.contenido), respuesta.etag, respuesta.last_modified, ahora, ahora),
+            )
+            conn.commit()
+            self._expulsar(conn, proteger=(sha256, extension))
+        return self._ruta_blob(sha256, extension)
+
+    # --- Expulsión LRU ---
+    def tamano_total(self) -> int:
+        self.ensure_schema()
+        with self._connect() as conn:
+            return self._tamano_blobs(conn)
+
+    @staticmethod
+    def _tamano_blobs(conn: sqlite3.Connection) -> int:
+        fila = conn.execute(
+            "SELECT COALESCE(SUM(tamano), 0) AS total FROM "
+            "(SELECT MAX(tamano) AS tamano FROM imagenes GROUP BY sha256, extension)"
+        ).fetchone()
+        return int(fila["total"])
+
+    def _expulsar(self, conn: sqlite3.Connection, proteger: tuple[str, str] | None = None) -> None:
+        total = self._tamano_blobs(conn)
+        if total <= self.tamano_maximo:
+            return
+        objetivo = int(self.tamano_maximo * FRACCION_TRAS_EXPULSION)
+        filas = conn.execute("SELECT clave, sha256, extension, tamano FROM imagenes ORDER BY ultimo_acceso ASC").fetchall()
+        with self._lock:
+            en_uso = set(self._en_uso)
+        for fila in filas:
+            if total <= objetivo:
+                break
+            ruta = self._ruta_blob(fila["sha256"], fila["extension"])
+            if (fila["sha256"], fila["extension"]) == proteger or ruta in en_uso:
+                continue
+            conn.execute("DELETE FROM imagenes WHERE clave = ?", (fila["clave"],))
+            compartido = conn.execute(
+                "SELECT 1 FROM imagenes WHERE sha256 = ? AND extension = ? LIMIT 1",
+                (fila["sha256"], fila["extension"]),
+            ).fetchone()
+            if compartido is None:
+                try:
+                    ruta.unlink(missing_ok=True)
+                except OSError as e:
+                    # En Windows no se puede borrar un fichero abierto por otro proceso.
+                    print(f"⚠️ No se pudo expulsar {ruta.name}: {e}")
+                    continue
+                total -= fila["tamano"]
+        conn.commit()
+
+
+_cache: CacheImagenes | None = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_imagenes() -> CacheImagenes:
+    """Caché del proceso, en ``HARVESTSYNC_IMAGENES_CACHE_PATH`` o la carpeta por defecto."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheImagenes()
+        return _cache
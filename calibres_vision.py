@@ -136,6 +136,186 @@ class PhotoFruitMeasurement:
         }
 
 
+# Marcadores SOF (inicio de imagen) de JPEG; C4, C8 y CC son otros segmentos.
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_dimensions(raw_image: bytes) -> tuple[int, int] | None:
+    """``(ancho, alto)`` leídos de la cabecera SOF sin decodificar; ``None`` si no es JPEG."""
+    if len(raw_image) < 4 or raw_image[:2] != b"\xff\xd8":
+        return None
+    pos, total = 2, len(raw_image)
+    while pos + 4 <= total:
+        if raw_image[pos] != 0xFF:
+            return None
+        marker = raw_image[pos + 1]
+        if marker == 0xFF:  # relleno entre segmentos
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # marcadores sin longitud
+            pos += 2
+            continue
+        if marker == 0xDA:  # empiezan los datos comprimidos sin haber visto SOF
+            return None
+        if marker in _JPEG_SOF:
+            if pos + 9 > total:
+                return None
+            height = int.from_bytes(raw_image[pos + 5 : pos + 7], "big")
+            width = int.from_bytes(raw_image[pos + 7 : pos + 9], "big")
+            return (width, height) if width and height else None
+        pos += 2 + int.from_bytes(raw_image[pos + 2 : pos + 4], "big")
+    return None
+
+
+def _reduction_factor(longest: int, max_size: int) -> int:
+    """Mayor divisor del decodificador JPEG (8, 4, 2) que no baja de ``max_size``."""
+    for factor in (8, 4, 2):
+        if longest // factor >= max_size:
+            return factor
+    return 1
+
+
+class DecodedFrame:
+    """Foto decodificada una sola vez y compartida por las etapas de visión.
+
+    La detección del patrón, el análisis de frutos, la medición con escala y sus
+    overlays aceptan un ``DecodedFrame`` en lugar de los bytes JPEG. La imagen
+    BGR, las copias reducidas por tamaño máximo y sus planos gris/HSV se
+    calculan la primera vez que se piden y se reutilizan después. Los cálculos
+    perezosos no usan cerrojo: dos hilos con la misma foto pueden repetir
+    trabajo, pero obtienen el mismo resultado.
+
+    Las copias reducidas de un JPEG se decodifican ya a 1/2, 1/4 u 1/8
+    (``IMREAD_REDUCED_COLOR_*``, elegido con las dimensiones de la cabecera),
+    así que la imagen completa solo se decodifica si alguien pide ``image``
+    (p. ej. el overlay del patrón a tamaño original).
+    """
+
+    def __init__(self, raw_image: bytes = b"", image: Any = None) -> None:
+        self.raw_image = raw_image or b""
+        self._image = image
+        self._shape: tuple[int, ...] | None = tuple(image.shape) if image is not None else None
+        self._gray: Any = None
+        self._hsv: Any = None
+        self._scaled: dict[int, tuple[DecodedFrame, float]] = {}
+        self._reduced: dict[int, Any] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.raw_image) or self._image is not None
+
+    @property
+    def image(self) -> Any:
+        """Imagen BGR a resolución completa (``None`` si no se puede decodificar)."""
+        if self._image is None and self.raw_image and cv2 is not None:
+            self._image = cv2.imdecode(np.frombuffer(self.raw_image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if self._image is not None:
+                self._shape = tuple(self._image.shape)
+        return self._image
+
+    @property
+    def valid(self) -> bool:
+        """``True`` si la foto se decodifica; un JPEG se prueba a 1/8, la decodificación más barata."""
+        if self._shape is not None or self._image is not None:
+            return True
+        dimensions = jpeg_dimensions(self.raw_image)
+        if dimensions is not None and cv2 is not None and self._reduced_decode(8, dimensions) is not None:
+            return True
+        return self.image is not None
+
+    def decodes(self, max_size: int) -> bool:
+        """Decodifica la copia de ``max_size`` que va a usar la etapa; ``False`` si la foto está corrupta."""
+        try:
+            self.scaled(max_size)
+        except ValueError:
+            return False
+        return True
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        if self._shape is None and self.image is None:
+            raise ValueError("No se pudo decodificar la imagen")
+        return self._shape
+
+    @property
+    def gray(self) -> Any:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hsv(self) -> Any:
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    def scaled(self, max_size: int) -> tuple[DecodedFrame, float]:
+        """Copia cuyo lado mayor no supera ``max_size`` (``INTER_AREA``) y su factor de escala.
+
+        El factor es siempre respecto a la resolución completa, aunque la copia
+        se haya obtenido de una decodificación reducida.
+        """
+        if max_size not in self._scaled:
+            source = self._decode_reduced(max_size)
+            height, width = self.shape[:2]
+            longest = max(height, width)
+            if longest <= max_size:
+                self._scaled[max_size] = (self, 1.0)
+            else:
+                if source is None:
+                    source = self.image
+                if source is None:
+                    raise ValueError("No se pudo decodificar la imagen")
+                ratio = max_size / float(longest)
+                size = (max(int(round(width * ratio)), 1), max(int(round(height * ratio)), 1))
+                resized = source if source.shape[1::-1] == size else cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+                self._scaled[max_size] = (DecodedFrame(image=resized), ratio)
+        return self._scaled[max_size]
+
+    def _decode_reduced(self, max_size: int) -> Any:
+        """Decodificación a 1/2, 1/4 u 1/8 suficiente para ``max_size``, o ``None``."""
+        if self._image is not None or cv2 is None:
+            return None
+        dimensions = jpeg_dimensions(self.raw_image)
+        factor = _reduction_factor(max(dimensions), max_size) if dimensions else 1
+        if factor == 1:
+            return None
+        return self._reduced_decode(factor, dimensions)
+
+    def _reduced_decode(self, factor: int, dimensions: tuple[int, int]) -> Any:
+        reduced = self._reduced.get(factor)
+        if reduced is None:
+            flag = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[factor]
+            reduced = cv2.imdecode(np.frombuffer(self.raw_image, dtype=np.uint8), flag)
+            if reduced is None:
+                return None
+            self._reduced[factor] = reduced
+        if self._shape is None:
+            width, height = dimensions
+            # imdecode aplica la orientación EXIF: si la reducida sale girada, la completa también.
+            if (reduced.shape[0] > reduced.shape[1]) != (height > width):
+                width, height = height, width
+            self._shape = (height, width, reduced.shape[2])
+        return reduced
+
+    def release_full_resolution(self, *keep_sizes: int) -> None:
+        """Libera la imagen completa conservando las copias ``keep_sizes``.
+
+        Si luego se vuelve a pedir la imagen completa se decodifica otra vez.
+        """
+        if not self.raw_image or any(self.scaled(size)[0] is self for size in keep_sizes):
+            return
+        self._image = self._gray = self._hsv = None
+        self._reduced = {}
+
+
+def _as_decoded_frame(image: bytes | DecodedFrame | Any) -> DecodedFrame:
+    if isinstance(image, DecodedFrame):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return DecodedFrame(bytes(image))
+    return DecodedFrame(image=image)
+
+
 class CirclePatternDetector:
     """Detector clásico (sin deep learning) basado en OpenCV."""
 
@@ -151,7 +331,7 @@ class CirclePatternDetector:
         self.max_mm_per_px = 1.5
         self.max_border_margin_ratio = 0.04
 
-    def detect_from_bytes(self, image_id: str, raw_image: bytes) -> CircleDetectionResult:
+    def detect_from_bytes(self, image_id: str, raw_image: bytes | DecodedFrame) -> CircleDetectionResult:
         if cv2 is None or np is None:
             return CircleDetectionResult(
                 image_id=image_id,
@@ -173,9 +353,8 @@ class CirclePatternDetector:
             )
 
         try:
-            image_array = np.frombuffer(raw_image, dtype=np.uint8)
-            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            if frame is None:
+            frame = _as_decoded_frame(raw_image)
+            if not frame.decodes(self.max_detection_size):
                 raise ValueError("No se pudo decodificar la imagen")
 
             candidate, reason = self._estimate_circle(frame)
@@ -239,14 +418,13 @@ class CirclePatternDetector:
                 error=str(exc),
             )
 
-    def build_overlay_bytes(self, raw_image: bytes, result: CircleDetectionResult) -> bytes | None:
+    def build_overlay_bytes(self, raw_image: bytes | DecodedFrame, result: CircleDetectionResult) -> bytes | None:
         """Genera PNG anotado para validación visual de la detección."""
         if cv2 is None or np is None or not raw_image:
             return None
 
         try:
-            image_array = np.frombuffer(raw_image, dtype=np.uint8)
-            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            frame = _as_decoded_frame(raw_image).image
             if frame is None:
                 return None
 
@@ -299,14 +477,9 @@ class CirclePatternDetector:
         except Exception:
             return None
 
-    def _estimate_circle(self, frame: Any) -> tuple[PatternCandidate | None, str | None]:
+    def _estimate_circle(self, frame: DecodedFrame | Any) -> tuple[PatternCandidate | None, str | None]:
         """Estima patrón circular/elíptico en píxeles reales usando imagen reducida para acelerar."""
-        height, width = frame.shape[:2]
-        longest = max(height, width)
-        scale = 1.0
-        if longest > self.max_detection_size:
-            scale = self.max_detection_size / float(longest)
-            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        frame, scale = _as_decoded_frame(frame).scaled(self.max_detection_size)
 
         candidate_small, reason = self._estimate_circle_on_frame(frame)
         if candidate_small is None:
@@ -338,7 +511,8 @@ class CirclePatternDetector:
             ), None
         return candidate_small, None
 
-    def _estimate_circle_on_frame(self, frame: Any) -> tuple[PatternCandidate | None, str | None]:
+    def _estimate_circle_on_frame(self, frame: DecodedFrame | Any) -> tuple[PatternCandidate | None, str | None]:
+        frame = _as_decoded_frame(frame)
         gray, white_mask = self._prepare_marker_masks(frame)
         marker_candidates = self._find_marker_candidates(frame, white_mask)
         LOGGER.info("Detección patrón: candidatos marcador encontrados=%s", len(marker_candidates))
@@ -440,11 +614,9 @@ class CirclePatternDetector:
             confidence = "baja"
         return score, None, confidence
 
-    def _prepare_marker_masks(self, frame: Any) -> tuple[Any, Any]:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (7, 7), 1.4)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        white_hsv = cv2.inRange(hsv, (0, 0, 145), (180, 90, 255))
+    def _prepare_marker_masks(self, frame: DecodedFrame) -> tuple[Any, Any]:
+        gray = cv2.GaussianBlur(frame.gray, (7, 7), 1.4)
+        white_hsv = cv2.inRange(frame.hsv, (0, 0, 145), (180, 90, 255))
         white_adapt = cv2.adaptiveThreshold(
             gray,
             255,
@@ -612,8 +784,8 @@ class CirclePatternDetector:
                 )
         return best, None if best is not None else "hough_global_descartado"
 
-    def _contrast_score(self, frame: Any, cx: float, cy: float, radius: float) -> float:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def _contrast_score(self, frame: DecodedFrame | Any, cx: float, cy: float, radius: float) -> float:
+        gray = _as_decoded_frame(frame).gray
         height, width = gray.shape[:2]
         yy, xx = np.ogrid[:height, :width]
         dist = np.sqrt((xx - cx) ** 2 + (yy - cy) ** 2)
@@ -647,7 +819,7 @@ class FruitCaliberAnalyzer:
     def analyze_photo(
         self,
         image_id: str,
-        raw_image: bytes,
+        raw_image: bytes | DecodedFrame,
         mm_per_pixel: float,
         caliber_ranges: list[dict[str, Any]],
     ) -> PhotoFruitAnalysisResult:
@@ -685,12 +857,11 @@ class FruitCaliberAnalyzer:
             )
 
         try:
-            image_array = np.frombuffer(raw_image, dtype=np.uint8)
-            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            if frame is None:
+            frame = _as_decoded_frame(raw_image)
+            if not frame.decodes(self.max_detection_size):
                 raise ValueError("No se pudo decodificar la imagen")
 
-            frame_scaled, ratio = self._resize_if_needed(frame)
+            frame_scaled, ratio = frame.scaled(self.max_detection_size)
             contours = self._detect_fruit_candidates(frame_scaled)
             fruits: list[FruitDetection] = []
 
@@ -820,17 +991,16 @@ class FruitCaliberAnalyzer:
                 error=str(exc),
             )
 
-    def build_overlay_bytes(self, raw_image: bytes, result: PhotoFruitAnalysisResult) -> bytes | None:
+    def build_overlay_bytes(self, raw_image: bytes | DecodedFrame, result: PhotoFruitAnalysisResult) -> bytes | None:
         if cv2 is None or np is None or not raw_image:
             return None
 
         try:
-            image_array = np.frombuffer(raw_image, dtype=np.uint8)
-            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-            if frame is None:
+            frame = _as_decoded_frame(raw_image)
+            if not frame.decodes(self.max_detection_size):
                 return None
-            frame_scaled, ratio = self._resize_if_needed(frame)
-            overlay = frame_scaled.copy()
+            frame_scaled, ratio = frame.scaled(self.max_detection_size)
+            overlay = frame_scaled.image.copy()
 
             for fruit in result.fruits:
                 contour = fruit.contour
@@ -873,22 +1043,14 @@ class FruitCaliberAnalyzer:
         except Exception:
             return None
 
-    def _resize_if_needed(self, frame: Any) -> tuple[Any, float]:
-        h, w = frame.shape[:2]
-        longest = max(h, w)
-        if longest <= self.max_detection_size:
-            return frame, 1.0
-        ratio = self.max_detection_size / float(longest)
-        resized = cv2.resize(frame, None, fx=ratio, fy=ratio, interpolation=cv2.INTER_AREA)
-        return resized, ratio
-
-    def _detect_fruit_candidates(self, frame: Any) -> list[Any]:
+    def _detect_fruit_candidates(self, frame: DecodedFrame | Any) -> list[Any]:
         """Obtiene candidatos individuales con enfoque local para fruta en contacto."""
+        frame = _as_decoded_frame(frame)
         mask = self._build_orange_mask(frame)
         if cv2.countNonZero(mask) == 0:
             return []
 
-        contours = self._split_touching_regions_with_watershed(frame, mask)
+        contours = self._split_touching_regions_with_watershed(frame.image, mask)
         if contours:
             return contours
 
@@ -896,8 +1058,9 @@ class FruitCaliberAnalyzer:
         contours_cc, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         return list(contours_cc)
 
-    def _build_orange_mask(self, frame: Any) -> Any:
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    def _build_orange_mask(self, frame: DecodedFrame | Any) -> Any:
+        frame = _as_decoded_frame(frame)
+        hsv = frame.hsv
         lower_1 = np.array([3, 70, 45], dtype=np.uint8)
         upper_1 = np.array([24, 255, 255], dtype=np.uint8)
         lower_2 = np.array([0, 70, 35], dtype=np.uint8)
@@ -912,15 +1075,21 @@ class FruitCaliberAnalyzer:
         mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel_close, iterations=2)
 
         # Limpieza por componente para evitar ruido de color naranja pequeño.
-        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
         min_component_area = max(int(frame.shape[0] * frame.shape[1] * 0.00008), 80)
-        cleaned = np.zeros_like(mask)
-        for idx in range(1, num_labels):
-            area = int(stats[idx, cv2.CC_STAT_AREA])
-            if area >= min_component_area:
-                cleaned[labels == idx] = 255
+        return self._remove_small_components(mask, min_component_area)
 
-        return cleaned
+    @staticmethod
+    def _remove_small_components(mask: Any, min_area: int) -> Any:
+        """Deja a 255 solo los componentes de al menos ``min_area`` píxeles.
+
+        Una tabla etiqueta -> 0/255 se aplica a la imagen de etiquetas en una sola
+        pasada; recorrer los componentes uno a uno era una pasada completa por
+        cada mota de color.
+        """
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        keep = np.where(stats[:, cv2.CC_STAT_AREA] >= min_area, 255, 0).astype(np.uint8)
+        keep[0] = 0  # fondo
+        return keep[labels]
 
     def _split_touching_regions_with_watershed(self, frame: Any, mask: Any) -> list[Any]:
         """Separa masas conectadas usando transformada de distancia + watershed."""
@@ -951,12 +1120,16 @@ class FruitCaliberAnalyzer:
 
         image_h, image_w = frame.shape[:2]
         border_margin = max(int(min(image_h, image_w) * 0.015), 4)
+        areas, boxes = self._label_areas_and_boxes(markers)
         contours: list[Any] = []
-        for label in range(2, int(markers.max()) + 1):
-            region_mask = np.uint8(markers == label) * 255
-            if cv2.countNonZero(region_mask) < 80:
+        for label in range(2, len(areas)):
+            if areas[label] < 80:
                 continue
-            cs, _ = cv2.findContours(region_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Recorte con 1 px de margen para que findContours vea el mismo borde que en la imagen entera.
+            x0, y0, x1, y1 = boxes[label]
+            x0, y0, x1, y1 = max(x0 - 1, 0), max(y0 - 1, 0), min(x1 + 1, image_w), min(y1 + 1, image_h)
+            region_mask = np.uint8(markers[y0:y1, x0:x1] == label) * 255
+            cs, _ = cv2.findContours(region_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
             if not cs:
                 continue
             contour = max(cs, key=cv2.contourArea)
@@ -968,6 +1141,33 @@ class FruitCaliberAnalyzer:
 
         return contours
 
+    @staticmethod
+    def _label_areas_and_boxes(markers: Any) -> tuple[Any, list[tuple[int, int, int, int]]]:
+        """Área y caja ``(x0, y0, x1, y1)`` (extremo exclusivo) de cada etiqueta >= 2 de watershed.
+
+        Dos ``bincount`` sobre (fila, etiqueta) y (columna, etiqueta) recorren la
+        imagen una sola vez sea cual sea el número de regiones. El fondo (1), las
+        fronteras (-1) y las etiquetas sin píxeles tienen área 0.
+        """
+        height, width = markers.shape[:2]
+        num_labels = max(int(markers.max()) + 1, 2)
+        regions = np.where(markers >= 2, markers, 0)
+        rows = np.bincount(
+            (np.arange(height)[:, None] * num_labels + regions).ravel(), minlength=height * num_labels
+        ).reshape(height, num_labels)
+        cols = np.bincount(
+            (np.arange(width)[None, :] * num_labels + regions).ravel(), minlength=width * num_labels
+        ).reshape(width, num_labels)
+        areas = rows.sum(axis=0)
+        areas[:2] = 0
+        rows_present, cols_present = rows > 0, cols > 0
+        y0 = rows_present.argmax(axis=0)
+        y1 = height - rows_present[::-1].argmax(axis=0)
+        x0 = cols_present.argmax(axis=0)
+        x1 = width - cols_present[::-1].argmax(axis=0)
+        boxes = [(int(a), int(b), int(c), int(d)) for a, b, c, d in zip(x0, y0, x1, y1)]
+        return areas, boxes
+
     def _assign_caliber(self, diameter_mm: float, caliber_ranges: list[dict[str, Any]]) -> str:
         if not caliber_ranges:
             return "SIN_RANGO"
@@ -989,7 +1189,7 @@ class FruitCaliberAnalyzer:
 
 
 def medir_frutos_con_escala(
-    image_bytes: bytes,
+    image_bytes: bytes | DecodedFrame,
     mm_por_px: float,
     rangos_calibres: list[dict[str, Any]],
 ) -> list[PhotoFruitMeasurement]:
@@ -999,12 +1199,11 @@ def medir_frutos_con_escala(
 
     analyzer = FruitCaliberAnalyzer()
     try:
-        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-        frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-        if frame is None:
+        frame = _as_decoded_frame(image_bytes)
+        if not frame.decodes(analyzer.max_detection_size):
             return []
 
-        frame_scaled, ratio = analyzer._resize_if_needed(frame)
+        frame_scaled, ratio = frame.scaled(analyzer.max_detection_size)
         contours = analyzer._detect_fruit_candidates(frame_scaled)
         if not contours:
             return []
@@ -0,0 +1,140 @@
+"""Cola de trabajos de informes en hilos de fondo.
+
+Los botones de informe encolan un trabajo (una función que genera el PDF y
+devuelve su ruta) y vuelven al momento; un pool pequeño de hilos los ejecuta.
+Cada cambio de estado se notifica con ``al_cambio(trabajo)`` desde el hilo que
+lo produce, así que la interfaz debe reenviarlo a su hilo con ``root.after``.
+
+Un trabajo en cola se cancela sin llegar a ejecutarse. Uno en marcha no se puede
+interrumpir a mitad de ``doc.build()``: se marca y su resultado se descarta.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+EN_COLA = "En cola"
+GENERANDO = "Generando"
+CANCELANDO = "Cancelando"
+TERMINADO = "Terminado"
+FALLIDO = "Error"
+CANCELADO = "Cancelado"
+ESTADOS_FINALES = (TERMINADO, FALLIDO, CANCELADO)
+
+HILOS_INFORMES = 2
+
+
+@dataclass
+class TrabajoCola:
+    id: int
+    titulo: str
+    estado: str = EN_COLA
+    ruta: str | None = None
+    error: str | None = None
+    creado: float = field(default_factory=time.monotonic)
+    inicio: float | None = None
+    fin: float | None = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in ESTADOS_FINALES
+
+    def duracion(self) -> float | None:
+        if self.inicio is None:
+            return None
+        return (self.fin or time.monotonic()) - self.inicio
+
+
+class ColaInformes:
+    """Ejecuta funciones de informe en segundo plano y guarda su historial."""
+
+    def __init__(self, hilos: int = HILOS_INFORMES, al_cambio: Callable[[TrabajoCola], None] | None = None) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="informe")
+        self._al_cambio = al_cambio
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._trabajos: dict[int, TrabajoCola] = {}
+        self._futuros: dict[int, Future] = {}
+
+    def encolar(self, titulo: str, funcion: Callable[..., Any], *args: Any, **kwargs: Any) -> TrabajoCola:
+        """Añade ``funcion(*args, **kwargs)``; su valor de retorno es la ruta del PDF."""
+        trabajo = TrabajoCola(id=next(self._ids), titulo=titulo)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._futuros[trabajo.id] = self._pool.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        self._notificar(trabajo)
+        return trabajo
+
+    def _ejecutar(self, trabajo: TrabajoCola, funcion, args, kwargs) -> None:
+        with self._lock:
+            if trabajo.estado != EN_COLA:
+                return
+            trabajo.estado = GENERANDO
+            trabajo.inicio = time.monotonic()
+        self._notificar(trabajo)
+        try:
+            ruta = funcion(*args, **kwargs)
+        except Exception as e:  # noqa: BLE001 - el error se muestra en el panel
+            with self._lock:
+                trabajo.estado = CANCELADO if trabajo.estado == CANCELANDO else FALLIDO
+                trabajo.error = None if trabajo.estado == CANCELADO else (str(e) or type(e).__name__)
+        else:
+            with self._lock:
+                if trabajo.estado == CANCELANDO:
+                    trabajo.estado = CANCELADO
+                else:
+                    trabajo.estado = TERMINADO
+                    trabajo.ruta = str(ruta) if ruta else None
+        finally:
+            with self._lock:
+                trabajo.fin = time.monotonic()
+                self._futuros.pop(trabajo.id, None)
+        self._notificar(trabajo)
+
+    def cancelar(self, id_trabajo: int) -> bool:
+        """Cancela un trabajo pendiente o en marcha; ``False`` si ya había terminado."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is None or trabajo.terminado or trabajo.estado == CANCELANDO:
+                return False
+            if trabajo.estado == EN_COLA:
+                futuro = self._futuros.pop(id_trabajo, None)
+                if futuro is not None:
+                    futuro.cancel()
+                trabajo.estado = CANCELADO
+                trabajo.fin = time.monotonic()
+            else:
+                trabajo.estado = CANCELANDO
+        self._notificar(trabajo)
+        return True
+
+    def trabajos(self) -> list[TrabajoCola]:
+        with self._lock:
+            return list(self._trabajos.values())
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return sum(1 for t in self._trabajos.values() if not t.terminado)
+
+    def limpiar_terminados(self) -> None:
+        with self._lock:
+            for id_trabajo in [i for i, t in self._trabajos.items() if t.terminado]:
+                del self._trabajos[id_trabajo]
+
+    def cerrar(self) -> None:
+        """Cancela lo pendiente y deja terminar lo que está en marcha sin esperarlo."""
+        for trabajo in self.trabajos():
+            if trabajo.estado == EN_COLA:
+                self.cancelar(trabajo.id)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _notificar(self, trabajo: TrabajoCola) -> None:
+        if self._al_cambio is not None:
+            try:
+                self._al_cambio(trabajo)
+            except Exception as e:  # noqa: BLE001 - un fallo de la UI no tumba la cola
+                print(f"⚠️ Error notificando el trabajo {trabajo.id}: {e}")
@@ -0,0 +1,98 @@
+"""Descarga concurrente de fotos con una ``requests.Session`` compartida.
+
+Todas las URL de un informe se piden de una vez a un pool acotado de hilos que
+reutiliza conexiones (keep-alive) contra el servidor de fotos. Cada petición
+tiene su propio timeout y, además, el conjunto tiene un plazo máximo: lo que no
+haya llegado al vencer se da por perdido y el informe se genera sin esa foto.
+Las descargas pasan por la caché en disco de ``cache_imagenes``.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache_imagenes import CacheImagenes, ErrorDescargaImagen, descargador_requests, obtener_cache_imagenes
+
+HILOS_DESCARGA = 6
+TIMEOUT_PETICION = (3.05, 10)
+PLAZO_TOTAL_S = 45.0
+
+_sesion: requests.Session | None = None
+_sesion_lock = threading.Lock()
+
+
+def crear_sesion(conexiones: int = HILOS_DESCARGA) -> requests.Session:
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones, max_retries=1)
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión del proceso, creada en el primer uso."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            _sesion = crear_sesion()
+        return _sesion
+
+
+def descargar(
+    url: str,
+    sesion: requests.Session | None = None,
+    timeout=TIMEOUT_PETICION,
+    cache: CacheImagenes | None = None,
+) -> bytes | None:
+    """Contenido de ``url`` (desde la caché si está) o ``None`` si falla."""
+    cache = cache or obtener_cache_imagenes()
+    try:
+        return cache.obtener(url, descargador_requests(sesion or obtener_sesion(), timeout))
+    except ErrorDescargaImagen as e:
+        print(f"❌ Error descargando imagen. URL: {url} | HTTP: {e.status}")
+    except Exception as e:
+        print(f"❌ Excepción descargando imagen. URL: {url} | Error: {e}")
+    return None
+
+
+def descargar_fotos(
+    urls: Iterable[str],
+    hilos: int = HILOS_DESCARGA,
+    timeout=TIMEOUT_PETICION,
+    plazo_total_s: float | None = PLAZO_TOTAL_S,
+    sesion: requests.Session | None = None,
+    cache: CacheImagenes | None = None,
+) -> dict[str, bytes | None]:
+    """Descarga ``urls`` en paralelo y devuelve ``{url: bytes | None}``.
+
+    Vuelve cuando todas han terminado o ha vencido ``plazo_total_s``; las
+    pendientes en ese momento quedan como ``None``.
+    """
+    pendientes_urls = list(dict.fromkeys(u for u in urls if u))
+    resultado: dict[str, bytes | None] = {url: None for url in pendientes_urls}
+    if not pendientes_urls:
+        return resultado
+
+    sesion = sesion or obtener_sesion()
+    cache = cache or obtener_cache_imagenes()
+    limite = None if plazo_total_s is None else time.monotonic() + plazo_total_s
+    pool = ThreadPoolExecutor(max_workers=max(1, min(hilos, len(pendientes_urls))))
+    try:
+        futuros = {pool.submit(descargar, url, sesion, timeout, cache): url for url in pendientes_urls}
+        pendientes = set(futuros)
+        while pendientes:
+            restante = None if limite is None else max(limite - time.monotonic(), 0)
+            hechos, pendientes = wait(pendientes, timeout=restante, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                resultado[futuros[futuro]] = futuro.result()
+            if not hechos:
+                print(f"⏱️ Plazo agotado: {len(pendientes)} fotos sin descargar.")
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return resultado
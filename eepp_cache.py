@@ -0,0 +1,105 @@
+"""Resolución de documentos EEPP por boleta con lecturas en lote y caché TTL de proceso."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Iterable
+
+COLECCION_EEPP = "EEPP"
+TTL_SEGUNDOS = 15 * 60
+TAMANO_LOTE_GET_ALL = 300
+
+
+class EEPPResolver:
+    """Devuelve los datos EEPP de muchas boletas con ``get_all`` y recuerda el resultado.
+
+    Las boletas sin documento también se cachean (como ``None``) para no volver a
+    preguntar por ellas en cada fila.
+    """
+
+    def __init__(self, db: Any, ttl_segundos: float = TTL_SEGUNDOS) -> None:
+        self.db = db
+        self.ttl_segundos = float(ttl_segundos)
+        self._cache: dict[str, tuple[float, dict[str, Any] | None]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalizar(boleta: Any) -> str:
+        return str(boleta or "").strip()
+
+    def _vigentes(self, boletas: Iterable[str]) -> tuple[dict[str, dict[str, Any] | None], list[str]]:
+        ahora = time.monotonic()
+        encontrados: dict[str, dict[str, Any] | None] = {}
+        pendientes: list[str] = []
+        with self._lock:
+            for boleta in boletas:
+                entrada = self._cache.get(boleta)
+                if entrada is not None and (ahora - entrada[0]) < self.ttl_segundos:
+                    encontrados[boleta] = entrada[1]
+                else:
+                    pendientes.append(boleta)
+        return encontrados, pendientes
+
+    def _descargar(self, boletas: list[str]) -> dict[str, dict[str, Any] | None]:
+        coleccion = self.db.collection(COLECCION_EEPP)
+        descargados: dict[str, dict[str, Any] | None] = {boleta: None for boleta in boletas}
+        for inicio in range(0, len(boletas), TAMANO_LOTE_GET_ALL):
+            refs = [coleccion.document(boleta) for boleta in boletas[inicio : inicio + TAMANO_LOTE_GET_ALL]]
+            for snap in self.db.get_all(refs):
+                descargados[snap.id] = (snap.to_dict() or {}) if snap.exists else None
+        ahora = time.monotonic()
+        with self._lock:
+            for boleta, datos in descargados.items():
+                self._cache[boleta] = (ahora, datos)
+        return descargados
+
+    def resolver(self, boletas: Iterable[Any]) -> dict[str, dict[str, Any] | None]:
+        """Datos EEPP por boleta (``None`` si no existe documento)."""
+        unicas = list(dict.fromkeys(b for b in (self._normalizar(x) for x in boletas) if b))
+        encontrados, pendientes = self._vigentes(unicas)
+        if pendientes:
+            encontrados.update(self._descargar(pendientes))
+        return encontrados
+
+    def obtener(self, boleta: Any) -> dict[str, Any] | None:
+        boleta_norm = self._normalizar(boleta)
+        if not boleta_norm:
+            return None
+        return self.resolver([boleta_norm]).get(boleta_norm)
+
+    def obtener_variedad(self, boleta: Any, defecto: str = "") -> str:
+        datos = self.obtener(boleta)
+        if not datos:
+            return defecto
+        return str(datos.get("Variedad", defecto) or defecto)
+
+    def variedades(self, boletas: Iterable[Any]) -> dict[str, str]:
+        return {
+            boleta: str((datos or {}).get("Variedad", "") or "")
+            for boleta, datos in self.resolver(boletas).items()
+        }
+
+    def invalidar(self, boletas: Iterable[Any] | None = None) -> None:
+        with self._lock:
+            if boletas is None:
+                self._cache.clear()
+                return
+            for boleta in boletas:
+                self._cache.pop(self._normalizar(boleta), None)
+
+
+_resolver_global: EEPPResolver | None = None
+_resolver_lock = threading.Lock()
+
+
+def obtener_resolver_eepp(db: Any) -> EEPPResolver:
+    """Resolver compartido por la pantalla principal y los generadores de informes.
+
+    Se comparte mientras se pida con el mismo cliente; otro ``db`` (p. ej. uno
+    inyectado en pruebas o por la CLI) estrena resolver y caché propios.
+    """
+    global _resolver_global
+    with _resolver_lock:
+        if _resolver_global is None or _resolver_global.db is not db:
+            _resolver_global = EEPPResolver(db)
+        return _resolver_global
@@ -0,0 +1,53 @@
+"""Acceso compartido y perezoso al cliente de Firestore.
+
+Importar ``firebase_admin`` y crear el cliente cuesta del orden de medio segundo
+en frío, así que ningún módulo lo hace al importarse: todos piden el cliente con
+``obtener_db()`` en el momento de usarlo. La primera llamada inicializa la app
+con las credenciales de ``HarvestSync.json``; el resto devuelve el mismo cliente.
+
+Con ``FIRESTORE_EMULATOR_HOST`` definido se usa el emulador local en lugar del
+proyecto real (lo heredan también los procesos hijos). ``establecer_db`` permite
+inyectar cualquier otro cliente compatible, p. ej. un sustituto en memoria.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any
+
+CREDENCIALES_FIREBASE = "HarvestSync.json"
+PROYECTO_EMULADOR_POR_DEFECTO = "harvestsync-local"
+
+_db: Any = None
+_lock = threading.Lock()
+
+
+def obtener_db() -> Any:
+    """Devuelve el ``firestore.Client`` del proceso, inicializando Firebase si hace falta."""
+    global _db
+    if _db is not None:
+        return _db
+    with _lock:
+        if _db is None:
+            if os.getenv("FIRESTORE_EMULATOR_HOST"):
+                from google.cloud import firestore as cloud_firestore
+
+                proyecto = os.getenv("GOOGLE_CLOUD_PROJECT") or PROYECTO_EMULADOR_POR_DEFECTO
+                _db = cloud_firestore.Client(project=proyecto)
+                return _db
+
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            from ui_utils import resource_path  # ui_utils importa tkinter; la consola no lo necesita
+
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(credentials.Certificate(resource_path(CREDENCIALES_FIREBASE)))
+            _db = firestore.client()
+    return _db
+
+
+def establecer_db(db: Any) -> None:
+    """Sustituye el cliente del proceso (``None`` vuelve al comportamiento normal)."""
+    global _db
+    with _lock:
+        _db = db
@@ -0,0 +1,70 @@
+"""Gráficas de distribución vectoriales para los informes PDF.
+
+Antes cada barra era una ``Table`` anidada dentro de otra ``Table``; reportlab
+tenía que medir y partir dos tablas por fila. Aquí la gráfica entera es un único
+``Drawing`` de ``reportlab.graphics`` (rectángulos y textos) que se maqueta como
+un solo flowable de tamaño fijo.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from reportlab.graphics.shapes import Drawing, Rect, String
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+COLOR_BARRAS = HexColor("#7D98A1")
+FUENTE = "Helvetica"
+TAMANO_FUENTE = 9
+
+ANCHO_GRAFICA = 16 * cm
+ANCHO_ETIQUETAS = 3 * cm
+ANCHO_VALORES = 1.6 * cm
+ALTO_FILA = 0.55 * cm
+SEPARACION = 2
+
+
+def valores_distribucion(filas: Iterable[tuple[str, object]]) -> list[tuple[str, float]]:
+    """``(etiqueta, porcentaje)`` de las filas con valor numérico; el resto se omite."""
+    valores = []
+    for etiqueta, valor in filas:
+        try:
+            valores.append((str(etiqueta), float(valor)))
+        except (TypeError, ValueError):
+            continue
+    return valores
+
+
+def es_distribucion(filas: Iterable[tuple[str, object]]) -> bool:
+    """``True`` si todas las filas son numéricas y suman 100 (±0,5)."""
+    filas = list(filas)
+    valores = valores_distribucion(filas)
+    return bool(valores) and len(valores) == len(filas) and 99.5 < sum(v for _, v in valores) < 100.5
+
+
+def _recortar(texto: str, ancho: float) -> str:
+    if stringWidth(texto, FUENTE, TAMANO_FUENTE) <= ancho:
+        return texto
+    while texto and stringWidth(texto + "…", FUENTE, TAMANO_FUENTE) > ancho:
+        texto = texto[:-1]
+    return texto + "…"
+
+
+def grafica_distribucion(filas: Iterable[tuple[str, object]], ancho: float = ANCHO_GRAFICA) -> Drawing:
+    """Gráfica de barras horizontales (0-100 %) de ``filas`` ``(etiqueta, valor)``."""
+    valores = valores_distribucion(filas)
+    ancho_barras = ancho - ANCHO_ETIQUETAS - ANCHO_VALORES
+    dibujo = Drawing(ancho, len(valores) * ALTO_FILA)
+    base_texto = (ALTO_FILA - TAMANO_FUENTE) / 2 + 1.5
+
+    for indice, (etiqueta, porcentaje) in enumerate(valores):
+        y = (len(valores) - 1 - indice) * ALTO_FILA
+        largo = ancho_barras * min(max(porcentaje, 0.0), 100.0) / 100.0
+        dibujo.add(String(0, y + base_texto, _recortar(etiqueta, ANCHO_ETIQUETAS - 6), fontName=FUENTE, fontSize=TAMANO_FUENTE))
+        if largo > 0:
+            dibujo.add(Rect(ANCHO_ETIQUETAS, y + SEPARACION / 2, largo, ALTO_FILA - SEPARACION, fillColor=COLOR_BARRAS, strokeColor=None))
+        dibujo.add(
+            String(ANCHO_ETIQUETAS + largo + 4, y + base_texto, f"{porcentaje:.1f}%", fontName=FUENTE, fontSize=TAMANO_FUENTE)
+        )
+    return dibujo
@@ -11,20 +11,22 @@ import tempfile
 import threading
 import time
 import unicodedata
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-import requests
 import tkinter as tk
 from firebase_admin import firestore
 from tkinter import messagebox, simpledialog, ttk
 
+from cache_imagenes import descargador_requests, obtener_cache_imagenes
 from ui_utils import BaseToolWindow
 from calibres_vision import (
     CircleDetectionResult,
     CirclePatternDetector,
+    DecodedFrame,
     FruitCaliberAnalyzer,
     PhotoFruitMeasurement,
     PhotoFruitAnalysisResult,
@@ -53,6 +55,8 @@ CALIBRES_CALIBRADOR = [f"CAL {idx}" for idx in range(10)]
 FILTRO_CALIBRADOR_CAMPANA = "2026"
 FILTRO_CALIBRADOR_EMPRESA = "1"
 FILTRO_CALIBRADOR_CULTIVO = "CITRICOS"
+# Fotos decodificadas que se conservan (solo su copia reducida tras detectar el patrón).
+FOTOS_DECODIFICADAS_MAX = 8
 OPCION_BOLETA_COMPLETA = "Boleta completa"
 ESTADO_ESTIMACION_PREVIA = "ESTIMACION_PREVIA"
 ESTADO_VALIDADO = "VALIDADO_CON_CALIBRADOR"
@@ -1847,9 +1851,7 @@ class CalibresDataService:
         return str(data.get("url", "") or "").rstrip("/")
 
     def descargar_imagen(self, url: str, timeout: int = 8) -> bytes:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        return response.content
+        return obtener_cache_imagenes().obtener(url, descargador_requests(timeout=timeout))
 
     def resolve_url_servicio_ia(self) -> tuple[str, str, str | None]:
         """Resuelve URL del servicio IA y devuelve (url, origen, error)."""
@@ -2990,6 +2992,8 @@ class ObtencionCalibresWindow(BaseToolWindow):
         self._overlay_dir = Path(tempfile.gettempdir()) / "harvestsync_desk" / "calibres_overlays"
         self._overlay_dir.mkdir(parents=True, exist_ok=True)
         self._fruit_analyzer = FruitCaliberAnalyzer()
+        self._fotos_decodificadas: OrderedDict[str, DecodedFrame] = OrderedDict()
+        self._fotos_decodificadas_lock = threading.Lock()
         self._ai_validacion_en_curso = False
         self._ai_lote_en_curso = False
         self._ai_estimacion_en_curso = False
@@ -3774,9 +3778,11 @@ class ObtencionCalibresWindow(BaseToolWindow):
                     )
                     continue
 
-                result = self._detector.detect_from_bytes(id_foto, card.get("raw") or b"")
+                foto = self._foto_decodificada(id_foto, card.get("raw") or b"")
+                result = self._detector.detect_from_bytes(id_foto, foto)
                 resultados[id_foto] = result
-                overlay_path = self._save_overlay_image(id_foto, card.get("raw") or b"", result)
+                overlay_path = self._save_overlay_image(id_foto, foto, result)
+                self._compactar_foto_decodificada(foto)
                 if overlay_path:
                     overlays[id_foto] = overlay_path
 
@@ -3789,7 +3795,7 @@ class ObtencionCalibresWindow(BaseToolWindow):
         self._overlay_paths_by_foto = overlays
         self._pintar_resultados_deteccion(resultados)
 
-    def _save_overlay_image(self, id_foto: str, raw_image: bytes, result: CircleDetectionResult) -> str | None:
+    def _save_overlay_image(self, id_foto: str, raw_image: bytes | DecodedFrame, result: CircleDetectionResult) -> str | None:
         if self._detector is None:
             return None
         overlay_bytes = self._detector.build_overlay_bytes(raw_image, result)
@@ -3919,21 +3925,22 @@ class ObtencionCalibresWindow(BaseToolWindow):
                         error="Foto no disponible en memoria.",
                     )
                     continue
+                foto = self._foto_decodificada(id_foto, card.get("raw") or b"")
                 result = self._fruit_analyzer.analyze_photo(
                     image_id=id_foto,
-                    raw_image=card.get("raw") or b"",
+                    raw_image=foto,
                     mm_per_pixel=escala.mm_per_pixel,
                     caliber_ranges=rangos,
                 )
                 resultados[id_foto] = result
-                overlay = self._save_fruit_overlay_image(id_foto, card.get("raw") or b"", result)
+                overlay = self._save_fruit_overlay_image(id_foto, foto, result)
                 if overlay:
                     overlays[id_foto] = overlay
             self.after(0, lambda: self._on_analisis_frutos_done(resultados, overlays))
 
         threading.Thread(target=worker, daemon=True).start()
 
-    def _save_fruit_overlay_image(self, id_foto: str, raw_image: bytes, result: PhotoFruitAnalysisResult) -> str | None:
+    def _save_fruit_overlay_image(self, id_foto: str, raw_image: bytes | DecodedFrame, result: PhotoFruitAnalysisResult) -> str | None:
         overlay_bytes = self._fruit_analyzer.build_overlay_bytes(raw_image, result)
         if not overlay_bytes:
             return None
@@ -5137,7 +5144,9 @@ class ObtencionCalibresWindow(BaseToolWindow):
             if detector is None or abs(float(detector.diametro_real_mm) - diametro_patron_mm) > 1e-9:
                 detector = CirclePatternDetector(diametro_patron_mm)
                 self._detector = detector
-            result = detector.detect_from_bytes(id_foto, raw_image)
+            foto = self._foto_decodificada(id_foto, raw_image)
+            result = detector.detect_from_bytes(id_foto, foto)
+            self._compactar_foto_decodificada(foto)
             self._deteccion_resultados[id_foto] = result
 
         patron_detectado = bool(result.detected)
@@ -5161,6 +5170,22 @@ class ObtencionCalibresWindow(BaseToolWindow):
             "escala_fisica_fiable": escala_fiable,
         }
 
+    def _foto_decodificada(self, id_foto: str, raw_image: bytes) -> DecodedFrame:
+        """Foto decodificada que comparten detección, análisis de frutos, medición CV y overlays."""
+        with self._fotos_decodificadas_lock:
+            foto = self._fotos_decodificadas.get(id_foto)
+            if foto is None or foto.raw_image != raw_image:
+                foto = DecodedFrame(raw_image)
+                self._fotos_decodificadas[id_foto] = foto
+            self._fotos_decodificadas.move_to_end(id_foto)
+            while len(self._fotos_decodificadas) > FOTOS_DECODIFICADAS_MAX:
+                self._fotos_decodificadas.popitem(last=False)
+            return foto
+
+    def _compactar_foto_decodificada(self, foto: DecodedFrame) -> None:
+        """Tras el overlay del patrón solo hace falta la copia reducida del análisis de frutos."""
+        foto.release_full_resolution(self._fruit_analyzer.max_detection_size)
+
     def _obtener_raw_image_para_foto(self, id_foto: str) -> bytes | None:
         cards_by_id = {str(card.get("foto", {}).get("id_foto", "")): card for card in self._current_cards}
         card = cards_by_id.get(id_foto)
@@ -5983,7 +6008,7 @@ class ObtencionCalibresWindow(BaseToolWindow):
                         raw_image = self._obtener_raw_image_para_foto(id_foto)
                         if raw_image and patron_info.get("mm_por_px"):
                             frutos_medidos_cv = medir_frutos_con_escala(
-                                image_bytes=raw_image,
+                                image_bytes=self._foto_decodificada(id_foto, raw_image),
                                 mm_por_px=float(patron_info["mm_por_px"]),
                                 rangos_calibres=rangos,
                             )
@@ -6188,7 +6213,7 @@ class ObtencionCalibresWindow(BaseToolWindow):
                         raw_image = self._obtener_raw_image_para_foto(id_foto)
                         if raw_image and escala_info.get("mm_por_px"):
                             frutos_medidos_cv = medir_frutos_con_escala(
-                                image_bytes=raw_image,
+                                image_bytes=self._foto_decodificada(id_foto, raw_image),
                                 mm_por_px=float(escala_info["mm_por_px"]),
                                 rangos_calibres=rangos,
                             )
@@ -6506,9 +6531,11 @@ class ObtencionCalibresWindow(BaseToolWindow):
                         card = cards_by_id.get(id_foto)
                         if not card:
                             continue
-                        result = self._detector.detect_from_bytes(id_foto, card.get("raw") or b"")
+                        foto = self._foto_decodificada(id_foto, card.get("raw") or b"")
+                        result = self._detector.detect_from_bytes(id_foto, foto)
                         resultados_patron[id_foto] = result
-                        overlay_path = self._save_overlay_image(id_foto, card.get("raw") or b"", result)
+                        overlay_path = self._save_overlay_image(id_foto, foto, result)
+                        self._compactar_foto_decodificada(foto)
                         if overlay_path:
                             overlays_patron[id_foto] = overlay_path
                     self._deteccion_resultados = resultados_patron
@@ -6542,14 +6569,15 @@ class ObtencionCalibresWindow(BaseToolWindow):
                         card = cards_by_id.get(id_foto)
                         if not escala or not escala.valid_for_next_step or escala.mm_per_pixel is None or not card:
                             continue
+                        foto = self._foto_decodificada(id_foto, card.get("raw") or b"")
                         result = self._fruit_analyzer.analyze_photo(
                             image_id=id_foto,
-                            raw_image=card.get("raw") or b"",
+                            raw_image=foto,
                             mm_per_pixel=escala.mm_per_pixel,
                             caliber_ranges=rangos,
                         )
                         resultados_frutos[id_foto] = result
-                        overlay = self._save_fruit_overlay_image(id_foto, card.get("raw") or b"", result)
+                        overlay = self._save_fruit_overlay_image(id_foto, foto, result)
                         if overlay:
                             overlays_frutos[id_foto] = overlay
                     self._frutos_resultados = resultados_frutos
@@ -0,0 +1,69 @@
+"""Preparación de fotos para incrustarlas en los informes PDF.
+
+Las fotos llegan a resolución de cámara (12 Mpx o más) y se pintan en celdas de
+pocos centímetros. Aquí se reducen al tamaño impreso a ``DPI_FOTOS_INFORME``:
+en JPEG se pide al decodificador una versión ya reducida (``Image.draft``, que
+escala por 1/2, 1/4 u 1/8 en la propia decodificación), se aplica la rotación
+EXIF y se remuestrea al número exacto de píxeles de la celda.
+"""
+from __future__ import annotations
+
+import io
+import os
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+DPI_FOTOS_INFORME = int(os.getenv("HARVESTSYNC_DPI_FOTOS", "150"))
+CALIDAD_JPEG = 85
+PUNTOS_POR_PULGADA = 72.0
+
+# Orientaciones EXIF que intercambian ancho y alto al enderezar la foto.
+_ORIENTACIONES_GIRADAS = {5, 6, 7, 8}
+_TAG_ORIENTACION = 0x0112
+
+
+def pixeles_para(ancho_pt: float, alto_pt: float, dpi: int = DPI_FOTOS_INFORME) -> tuple[int, int]:
+    """Píxeles necesarios para imprimir un hueco de ``ancho_pt`` × ``alto_pt`` puntos."""
+    escala = dpi / PUNTOS_POR_PULGADA
+    return max(1, round(ancho_pt * escala)), max(1, round(alto_pt * escala))
+
+
+def preparar_imagen(
+    image_bytes: bytes,
+    ancho_pt: float | None = None,
+    alto_pt: float | None = None,
+    dpi: int = DPI_FOTOS_INFORME,
+) -> io.BytesIO:
+    """Endereza la foto y la reduce al hueco que ocupará en el PDF.
+
+    Sin ``ancho_pt``/``alto_pt`` solo se corrige la orientación. Nunca se amplía:
+    una foto más pequeña que el hueco se conserva tal cual. Si la imagen no se
+    puede leer se devuelven los bytes originales.
+    """
+    try:
+        with PILImage.open(io.BytesIO(image_bytes)) as image:
+            formato = image.format or "JPEG"
+            destino = pixeles_para(ancho_pt, alto_pt, dpi) if ancho_pt and alto_pt else None
+
+            if destino and formato.upper() == "JPEG":
+                orientacion = image.getexif().get(_TAG_ORIENTACION, 1)
+                pedido = destino[::-1] if orientacion in _ORIENTACIONES_GIRADAS else destino
+                image.draft("RGB", pedido)
+
+            corregida = ImageOps.exif_transpose(image)
+            if destino and (corregida.width > destino[0] or corregida.height > destino[1]):
+                tamano = (min(destino[0], corregida.width), min(destino[1], corregida.height))
+                corregida = corregida.resize(tamano, PILImage.LANCZOS, reducing_gap=3.0)
+
+            if formato.upper() == "JPEG" and corregida.mode not in ("RGB", "L"):
+                corregida = corregida.convert("RGB")
+            output = io.BytesIO()
+            if formato.upper() == "JPEG":
+                corregida.save(output, format="JPEG", quality=CALIDAD_JPEG, optimize=True)
+            else:
+                corregida.save(output, format=formato)
+            output.seek(0)
+            return output
+    except Exception:
+        return io.BytesIO(image_bytes)
@@ -0,0 +1,161 @@
+"""Índice en memoria para filtrar muestras mientras se escribe.
+
+Cada campo se factoriza en valores únicos ya normalizados (minúsculas, sin
+acentos) y se indexa por trigramas sobre esos valores, no sobre las filas: un
+filtro resuelve primero qué valores únicos contienen el texto y después marca las
+filas con un ``isin`` vectorizado. Si la nueva búsqueda solo estrecha la anterior
+(se ha añadido texto a un término) se parte del resultado previo en lugar de
+recorrer todo el conjunto.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from muestras_en_vivo import CLAVE_MUESTRA, aplicar_cambios
+from muestras_filtros import normalizar_texto
+
+CAMPOS_INDEXADOS = ("Boleta", "Nombre", "Nombre Usuario", "CULTIVO", "Variedad")
+TAMANO_NGRAMA = 3
+_COLUMNA_ORIGEN = "__fila_indice"
+
+
+def _ngramas(texto: str, n: int = TAMANO_NGRAMA) -> set[str]:
+    if len(texto) < n:
+        return set()
+    return {texto[i : i + n] for i in range(len(texto) - n + 1)}
+
+
+class _CampoIndexado:
+    """Códigos por fila + valores únicos normalizados + trigramas de esos valores."""
+
+    def __init__(self, serie: pd.Series) -> None:
+        # Se normaliza una vez por valor distinto, no por fila.
+        codigos_crudos, crudos = pd.factorize(serie, sort=False, use_na_sentinel=True)
+        normalizados = [normalizar_texto(valor) for valor in crudos] + [""]
+        codigos_norm, unicos = pd.factorize(pd.Series(normalizados, dtype=object), sort=False)
+        # El centinela -1 de los nulos apunta al "" añadido al final.
+        self.codigos = codigos_norm[codigos_crudos]
+        self.unicos: list[str] = list(unicos)
+        self._posiciones = {texto: idx for idx, texto in enumerate(self.unicos)}
+        self.ngramas: dict[str, set[int]] = {}
+        for idx, texto in enumerate(self.unicos):
+            for gram in _ngramas(texto):
+                self.ngramas.setdefault(gram, set()).add(idx)
+
+    def codificar(self, serie: pd.Series) -> np.ndarray:
+        """Códigos de valores nuevos; los textos aún no vistos se añaden al índice."""
+        codigos_crudos, crudos = pd.factorize(serie, sort=False, use_na_sentinel=True)
+        codigos_valores = np.empty(len(crudos) + 1, dtype=np.int64)
+        for pos, valor in enumerate(list(crudos) + [None]):
+            texto = normalizar_texto(valor)
+            idx = self._posiciones.get(texto)
+            if idx is None:
+                idx = self._posiciones[texto] = len(self.unicos)
+                self.unicos.append(texto)
+                for gram in _ngramas(texto):
+                    self.ngramas.setdefault(gram, set()).add(idx)
+            codigos_valores[pos] = idx
+        # El centinela -1 de los nulos apunta al último elemento, el de ``None``.
+        return codigos_valores[codigos_crudos]
+
+    def valores_que_contienen(self, termino: str) -> np.ndarray:
+        candidatos: Iterable[int]
+        grams = _ngramas(termino)
+        if grams:
+            conjuntos = sorted((self.ngramas.get(g, set()) for g in grams), key=len)
+            if not conjuntos[0]:
+                return np.empty(0, dtype=np.int64)
+            candidatos = set.intersection(*conjuntos)
+        else:
+            candidatos = range(len(self.unicos))
+        return np.fromiter((i for i in candidatos if termino in self.unicos[i]), dtype=np.int64)
+
+
+class IndiceMuestras:
+    """Filtrado incremental por subcadena sobre un DataFrame de muestras."""
+
+    def __init__(self, df: pd.DataFrame, campos: Iterable[str] = CAMPOS_INDEXADOS) -> None:
+        self.datos = df.reset_index(drop=True)
+        self._campos: dict[str, _CampoIndexado] = {}
+        for campo in campos:
+            if campo in self.datos.columns:
+                self._campos[campo] = _CampoIndexado(self.datos[campo])
+        self._ultimos_terminos: dict[str, str] = {}
+        self._ultimas_filas: np.ndarray = np.arange(len(self.datos))
+
+    def __len__(self) -> int:
+        return len(self.datos)
+
+    def tiene_campo(self, campo: str) -> bool:
+        return campo in self._campos
+
+    def agregar_campo(self, campo: str, valores: pd.Series) -> None:
+        """Añade (o sustituye) una columna calculada a posteriori, p. ej. Variedad desde EEPP."""
+        self.datos[campo] = valores.reset_index(drop=True).values
+        self._campos[campo] = _CampoIndexado(self.datos[campo])
+        self._ultimos_terminos = {}
+        self._ultimas_filas = np.arange(len(self.datos))
+
+    def actualizar(self, nuevos: pd.DataFrame, eliminadas: Iterable[str] = (), clave: str = CLAVE_MUESTRA) -> None:
+        """Aplica un delta del modo en vivo sin reindexar las filas que no cambian.
+
+        Las filas quedan en el mismo orden que con ``muestras_en_vivo.aplicar_cambios``;
+        solo se normalizan los valores de las filas nuevas o modificadas.
+        """
+        nuevos = pd.DataFrame(columns=[clave]) if nuevos is None else nuevos.reset_index(drop=True)
+        base = self.datos.assign(**{_COLUMNA_ORIGEN: np.arange(len(self.datos))})
+        marcados = nuevos.assign(**{_COLUMNA_ORIGEN: -1 - np.arange(len(nuevos))})
+        combinado = aplicar_cambios(base, marcados, eliminadas, clave)
+        if _COLUMNA_ORIGEN in combinado.columns:
+            origen = combinado.pop(_COLUMNA_ORIGEN).to_numpy(dtype=np.int64)
+        else:
+            origen = np.empty(0, dtype=np.int64)
+        de_base = origen >= 0
+        filas_nuevas = -1 - origen[~de_base]
+        for campo, indice in self._campos.items():
+            codigos = np.empty(len(origen), dtype=np.int64)
+            codigos[de_base] = indice.codigos[origen[de_base]]
+            if len(filas_nuevas):
+                valores = nuevos[campo] if campo in nuevos.columns else pd.Series([None] * len(nuevos), dtype=object)
+                codigos[~de_base] = indice.codificar(valores.iloc[filas_nuevas])
+            indice.codigos = codigos
+        self.datos = combinado
+        self._ultimos_terminos = {}
+        self._ultimas_filas = np.arange(len(self.datos))
+
+    def _es_refinamiento(self, terminos: dict[str, str]) -> bool:
+        for campo, anterior in self._ultimos_terminos.items():
+            if anterior and anterior not in terminos.get(campo, ""):
+                return False
+        return True
+
+    def buscar(self, terminos: dict[str, str]) -> np.ndarray:
+        """Posiciones de fila que contienen cada término en su campo."""
+        terminos = {
+            campo: normalizar_texto(valor)
+            for campo, valor in terminos.items()
+            if campo in self._campos and normalizar_texto(valor)
+        }
+        if self._es_refinamiento(terminos):
+            filas = self._ultimas_filas
+        else:
+            filas = np.arange(len(self.datos))
+
+        for campo, termino in terminos.items():
+            if not len(filas):
+                break
+            if self._ultimos_terminos.get(campo) == termino and filas is self._ultimas_filas:
+                continue
+            indice = self._campos[campo]
+            validos = indice.valores_que_contienen(termino)
+            filas = filas[np.isin(indice.codigos[filas], validos)]
+
+        self._ultimos_terminos = terminos
+        self._ultimas_filas = filas
+        return filas
+
+    def filtrar(self, terminos: dict[str, str]) -> pd.DataFrame:
+        return self.datos.iloc[self.buscar(terminos)]
@@ -0,0 +1,143 @@
+"""Índice de PDFs ya generados, por huella de sus datos de entrada.
+
+Cada informe calcula una huella (SHA-256) con todo lo que determina su contenido:
+``update_time`` de las muestras, plantillas, EEPP, lista de fotos... Si en la
+carpeta temporal ``HarvestSyncDesk`` ya hay un PDF con esa huella se reutiliza
+en lugar de volver a descargar y maquetar. ``pdf_utils.cleanup_old_pdfs``
+consulta el índice para conservar los PDFs que se siguen abriendo.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+# Se incrementa cuando cambia la maquetación, para no reutilizar PDFs antiguos.
+VERSION_INFORMES = 2
+NOMBRE_INDICE = "indice_pdfs.sqlite"
+
+
+def carpeta_pdfs() -> Path:
+    return Path(tempfile.gettempdir()) / "HarvestSyncDesk"
+
+
+def huella_informe(tipo: str, *partes: Any) -> str:
+    """SHA-256 estable de ``partes`` (fechas y tipos de Firestore se pasan a texto)."""
+    contenido = json.dumps([tipo, VERSION_INFORMES, *partes], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class IndicePdfs:
+    """Tabla ``huella -> ruta`` en SQLite dentro de la carpeta temporal de PDFs."""
+
+    def __init__(self, directorio: str | Path | None = None, reloj=time.time) -> None:
+        self.directorio = Path(directorio or carpeta_pdfs())
+        self.db_path = str(self.directorio / NOMBRE_INDICE)
+        self._reloj = reloj
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000;")
+        return conn
+
+    def ensure_schema(self) -> None:
+        with self._lock:
+            if self._initialized:
+                return
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS pdfs (
+                        huella TEXT PRIMARY KEY,
+                        ruta TEXT NOT NULL,
+                        tipo TEXT NOT NULL,
+                        creado REAL NOT NULL,
+                        ultimo_uso REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_pdfs_ruta ON pdfs(ruta)")
+            self._initialized = True
+
+    def buscar(self, huella: str) -> str | None:
+        """Ruta del PDF con esa huella si sigue en disco; anota el uso."""
+        self.ensure_schema()
+        with self._connect() as conn:
+            fila = conn.execute("SELECT ruta FROM pdfs WHERE huella = ?", (huella,)).fetchone()
+            if fila is None:
+                return None
+            if not os.path.isfile(fila["ruta"]):
+                conn.execute("DELETE FROM pdfs WHERE huella = ?", (huella,))
+                return None
+            conn.execute("UPDATE pdfs SET ultimo_uso = ? WHERE huella = ?", (self._reloj(), huella))
+            return fila["ruta"]
+
+    def registrar(self, huella: str, ruta: str | Path, tipo: str) -> None:
+        self.ensure_schema()
+        ahora = self._reloj()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pdfs (huella, ruta, tipo, creado, ultimo_uso) VALUES (?, ?, ?, ?, ?)",
+                (huella, str(ruta), tipo, ahora, ahora),
+            )
+
+    def ultimos_usos(self) -> dict[str, float]:
+        """``{ruta: último uso}`` de los PDFs indexados."""
+        self.ensure_schema()
+        with self._connect() as conn:
+            return {fila["ruta"]: fila["ultimo_uso"] for fila in conn.execute("SELECT ruta, ultimo_uso FROM pdfs")}
+
+    def olvidar(self, rutas: list[str]) -> None:
+        if not rutas:
+            return
+        self.ensure_schema()
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM pdfs WHERE ruta = ?", [(str(r),) for r in rutas])
+
+
+_indice_global: IndicePdfs | None = None
+_indice_lock = threading.Lock()
+
+
+def obtener_indice_pdfs() -> IndicePdfs:
+    global _indice_global
+    with _indice_lock:
+        if _indice_global is None:
+            _indice_global = IndicePdfs()
+        return _indice_global
+
+
+def reutilizar_pdf(huella: str, ruta_salida: str | Path | None = None) -> str | None:
+    """Ruta de un PDF ya generado con esa huella (copiado a ``ruta_salida`` si se pide)."""
+    try:
+        ruta = obtener_indice_pdfs().buscar(huella)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Índice de PDFs no disponible: {e}")
+        return None
+    if ruta is None:
+        return None
+    if ruta_salida:
+        shutil.copyfile(ruta, ruta_salida)
+        return str(ruta_salida)
+    return ruta
+
+
+def registrar_pdf(huella: str, ruta: str | Path, tipo: str) -> None:
+    """Indexa un PDF recién generado en la carpeta temporal; los demás se ignoran."""
+    if Path(ruta).resolve().parent != carpeta_pdfs().resolve():
+        return
+    try:
+        obtener_indice_pdfs().registrar(huella, ruta, tipo)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ No se pudo indexar el PDF {ruta}: {e}")
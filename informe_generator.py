@@ -1,7 +1,3 @@
-import io
-import requests
-from PIL import Image as PILImage
-from PIL import ImageOps
 from datetime import datetime
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -9,13 +5,15 @@ from reportlab.lib.units import cm
 from reportlab.pdfgen import canvas
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet
-import firebase_admin
-from firebase_admin import credentials, firestore
 from reportlab.lib.colors import HexColor
-import threading
-from tkinter import Toplevel, Label
 import sys, os
 
+from descarga_fotos import descargar_fotos
+from firebase_utils import obtener_db
+from graficas_pdf import es_distribucion, grafica_distribucion
+from imagenes_pdf import DPI_FOTOS_INFORME, preparar_imagen
+from indice_pdfs import huella_informe, registrar_pdf, reutilizar_pdf
+from plantillas_cache import obtener_cache_plantillas
 from pdf_utils import create_temp_pdf_name, open_pdf
 def recurso_path(rel_path):
     """Devuelve la ruta absoluta a un recurso, compatible con PyInstaller"""
@@ -28,122 +26,85 @@ def recurso_path(rel_path):
 
 mi_color = HexColor("#7D98A1")
 
-cred = credentials.Certificate(recurso_path("HarvestSync.json"))
-
-
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-
 styles = getSampleStyleSheet()
 
 
-def corregir_orientacion_imagen(image_bytes):
+def corregir_orientacion_imagen(image_bytes, ancho=None, alto=None):
     """
     Corrige la orientación EXIF de una imagen y devuelve un buffer listo para ReportLab.
-    Si ocurre algún error, devuelve la imagen original sin interrumpir el flujo.
+    Con ``ancho``/``alto`` (en puntos) la reduce además al tamaño impreso a
+    ``DPI_FOTOS_INFORME``. Si ocurre algún error, devuelve la imagen original.
     """
-    try:
-        with PILImage.open(io.BytesIO(image_bytes)) as image:
-            image_corregida = ImageOps.exif_transpose(image)
-            output = io.BytesIO()
-            formato = image_corregida.format or image.format or "JPEG"
-            if formato.upper() == "JPEG" and image_corregida.mode in ("RGBA", "LA", "P"):
-                image_corregida = image_corregida.convert("RGB")
-            image_corregida.save(output, format=formato)
-            output.seek(0)
-            return output
-    except Exception:
-        return io.BytesIO(image_bytes)
+    return preparar_imagen(image_bytes, ancho, alto)
 
 
 def _es_grafica_posible(filas):
-    try:
-        valores = [float(valor) for _, valor in filas]
-        suma = sum(valores)
-        return 99.5 < suma < 100.5
-    except:
-        return False
+    return es_distribucion(filas)
 
 
 from reportlab.lib.styles import ParagraphStyle
 
-def _crear_grafica(filas):
-    titulo_grafico_style = ParagraphStyle(name='GraficoTitulo', fontSize=14, leading=16, fontName='Helvetica-Bold')
-    grafico = [Paragraph("Gráfico de distribución", titulo_grafico_style), Spacer(1, 6)]
+titulo_grafico_style = ParagraphStyle(name='GraficoTitulo', fontSize=14, leading=16, fontName='Helvetica-Bold')
 
-    for etiqueta, valor in filas:
-        try:
-            porcentaje = float(valor)
-        except:
+
+def _crear_grafica(filas):
+    return [Paragraph("Gráfico de distribución", titulo_grafico_style), Spacer(1, 6), grafica_distribucion(filas)]
+
+def _rutas_fotos_por_pantalla(db, id_muestra):
+    """``{pantalla: [ruta_local .jpg]}`` ordenadas por timestamp, con una sola consulta."""
+    por_pantalla = {}
+    for foto_doc in db.collection("Fotos").where("idMuestra", "==", id_muestra).stream():
+        data = foto_doc.to_dict() or {}
+        ruta = data.get("ruta_local", "")
+        if "timestamp" not in data or not ruta or not ruta.lower().endswith(".jpg"):
             continue
+        por_pantalla.setdefault(data.get("pantalla"), []).append((data["timestamp"], ruta))
+    return {
+        pantalla: [ruta for _, ruta in sorted(fotos, key=lambda f: f[0])]
+        for pantalla, fotos in por_pantalla.items()
+    }
+
 
-        ancho_barra = 10 * cm * (porcentaje / 100)
-        fila = Table(
-            [[
-                Paragraph(etiqueta, styles['Normal']),
-                Table(
-                    [[
-                        '',
-                        Paragraph(f"{porcentaje:.1f}%", styles['Normal'])
-                    ]],
-                    colWidths=[ancho_barra, 2 * cm],
-                    style=TableStyle([
-                    ('BACKGROUND', (0, 0), (0, 0), mi_color),
-                    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 6),     # Espacio entre barra y borde
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 6),    # Espacio entre barra y porcentaje
-                    ('TOPPADDING', (0, 0), (-1, -1), 1),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-                ])
-                )
-            ]],
-            colWidths=[3 * cm, 13 * cm],
-            style=TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE')])
-        )
-
-        grafico.append(fila)
-        grafico.append(Spacer(1, 1))
-
-    return grafico
-def generar_con_espera():
-    loading = Toplevel(root)
-    loading.title("Generando informe...")
-    Label(loading, text="Por favor, espere. Generando informe PDF...").pack(padx=20, pady=20)
-    loading.update()
-
-    def tarea():
-        try:
-            buffer = generar_pdf(id_muestra, cultivo, uid_usuario)
-            guardar_pdf(buffer)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el informe:\n{e}")
-        loading.destroy()
-
-    threading.Thread(target=tarea).start()
-
-
-def generar_pdf(id_muestra, cultivo, uid_usuario):
-    datos_muestra = db.collection("Muestras").document(id_muestra).get().to_dict()
+def generar_pdf(id_muestra, cultivo, uid_usuario, ruta_salida=None, abrir=True, reutilizar=True):
+    """Genera el informe de una muestra y devuelve la ruta del PDF.
+
+    Por defecto se escribe en la carpeta temporal y se abre; el lote de informes
+    (``lote_informes``) pasa ``ruta_salida`` y ``abrir=False``. Si ya se generó
+    un PDF con los mismos datos (ver ``indice_pdfs``) se reutiliza.
+    """
+    db = obtener_db()
+    snap_muestra = db.collection("Muestras").document(id_muestra).get()
+    datos_muestra = snap_muestra.to_dict()
     nombre_muestra = None
     if datos_muestra:
         nombre_muestra = datos_muestra.get("Nombre")
 
-    filename = create_temp_pdf_name(nombre_muestra)
-    doc = SimpleDocTemplate(filename, pagesize=A4)
-    elementos = []
-
-    plantilla_datos = db.collection("PlantillasInforme").document("DATOS").get().to_dict()
-    secciones = plantilla_datos.get("CAMPO", [])
+    cache_plantillas = obtener_cache_plantillas(db)
+    secciones = cache_plantillas.secciones()
+    plantillas = cache_plantillas.plantillas((seccion, cultivo) for seccion in secciones)
 
     usuario_doc = db.collection("UsuariosAutorizados").document(uid_usuario).get().to_dict()
     nombre_usuario = usuario_doc.get("Nombre", uid_usuario)
 
     servidor_doc = db.collection("ServidorFotos").document("url_actual").get().to_dict()
     url_base = servidor_doc.get("url", "")
-
+    fotos_por_pantalla = _rutas_fotos_por_pantalla(db, id_muestra)
+
+    huella = huella_informe(
+        "muestra", id_muestra, cultivo, getattr(snap_muestra, "update_time", None), datos_muestra,
+        nombre_usuario, secciones, sorted(plantillas.items()), url_base, sorted(fotos_por_pantalla.items(), key=str),
+        DPI_FOTOS_INFORME,
+    )
+    if reutilizar:
+        existente = reutilizar_pdf(huella, ruta_salida)
+        if existente:
+            if abrir:
+                open_pdf(existente)
+            return existente
+
+    filename = ruta_salida or create_temp_pdf_name(nombre_muestra)
+    doc = SimpleDocTemplate(filename, pagesize=A4)
+    elementos = []
 
     # Agregar logo
     try:
@@ -161,12 +122,20 @@ def generar_pdf(id_muestra, cultivo, uid_usuario):
     elementos.append(Paragraph(f"Fecha: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
     elementos.append(Spacer(1, 12))
 
+    # Primero se reúnen las secciones y las URL de todas sus fotos; las fotos se
+    # descargan a la vez antes de montar el PDF.
+    secciones_informe = []
     for seccion in secciones:
-        doc_seccion = db.collection(seccion).document(cultivo).get().to_dict()
+        doc_seccion = plantillas.get((seccion, str(cultivo)))
         if not doc_seccion:
             continue
-
         titulo = doc_seccion.get("Titulo", seccion)
+        urls = [f"{url_base}/fotos/{ruta}" for ruta in fotos_por_pantalla.get(titulo, [])]
+        secciones_informe.append((titulo, doc_seccion, urls))
+
+    fotos_descargadas = descargar_fotos(url for _, _, urls in secciones_informe for url in urls)
+
+    for titulo, doc_seccion, urls in secciones_informe:
         campos_raw = doc_seccion.get("CAMPO", [])
         campos = [c.split("[")[0].strip() for c in campos_raw]
 
@@ -193,23 +162,12 @@ def generar_pdf(id_muestra, cultivo, uid_usuario):
         else:
             elementos.append(Spacer(1, 12))
 
-        fotos = db.collection("Fotos").where("idMuestra", "==", id_muestra).where("pantalla", "==", titulo).order_by("timestamp").stream()
         imagenes = []
-        for foto_doc in fotos:
-            ruta = foto_doc.to_dict().get("ruta_local", "")
-            if ruta and ruta.lower().endswith(".jpg"):
-                url_completa = f"{url_base}/fotos/{ruta}"
-                print(f"📷 URL final: {url_completa}")
-                try:
-                    resp = requests.get(url_completa, timeout=5)
-                    if resp.status_code == 200:
-                        imagen_buffer = corregir_orientacion_imagen(resp.content)
-                        img = Image(imagen_buffer, width=4 * cm, height=4 * cm)
-                        imagenes.append(img)
-                    else:
-                        print(f"❌ Error descargando imagen. URL: {url_completa} | HTTP: {resp.status_code}")
-                except Exception as e:
-                    print(f"❌ Excepción descargando imagen. URL: {url_completa} | Error: {e}")
+        for url_completa in urls:
+            contenido = fotos_descargadas.get(url_completa)
+            if contenido:
+                imagen_buffer = corregir_orientacion_imagen(contenido, 4 * cm, 4 * cm)
+                imagenes.append(Image(imagen_buffer, width=4 * cm, height=4 * cm))
 
         if imagenes:
             elementos.append(Spacer(1, 6))
@@ -246,7 +204,14 @@ def generar_pdf(id_muestra, cultivo, uid_usuario):
         #    elementos.append(Spacer(1, 12))
 
     doc.build(elementos)
-    open_pdf(filename)
+    # Un informe con fotos que no se pudieron descargar no se indexa: la próxima
+    # petición idéntica vuelve a generarlo en vez de reutilizarlo incompleto.
+    if all(fotos_descargadas.get(url) for _, _, urls in secciones_informe for url in urls):
+        registrar_pdf(huella, filename, "muestra")
+    else:
+        print(f"⚠️ Informe {filename} sin todas sus fotos: no se reutilizará")
+    if abrir:
+        open_pdf(filename)
     return filename
 
 
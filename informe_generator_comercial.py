@@ -3,31 +3,31 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-from firebase_admin import firestore
 from collections import defaultdict
 import statistics
 
+from eepp_cache import obtener_resolver_eepp
+from firebase_utils import obtener_db
 from pdf_utils import create_temp_pdf_name, open_pdf
 
 SECCIONES_UTILIZADAS = ['Datos Calibre', 'Aprovechamiento']
 
-# Acceso a Firestore
-DB = firestore.client()
-
 def obtener_variedad(boleta):
-    doc = DB.collection('EEPP').document(boleta).get()
-    return doc.to_dict().get('Variedad', '') if doc.exists else ''
+    return obtener_resolver_eepp(obtener_db()).obtener_variedad(boleta)
 
 def calcular_media(valores):
     valores_numericos = [v for v in valores if isinstance(v, (int, float))]
     return round(statistics.mean(valores_numericos), 2) if valores_numericos else ''
 
-def generar_informe_comercial_desde_ui(lista_datos, nombre: str | None = None):
-    filename = create_temp_pdf_name(nombre, prefix="InformeComercial")
+def generar_informe_comercial_desde_ui(lista_datos, nombre: str | None = None, ruta_salida=None, abrir=True):
+    filename = ruta_salida or create_temp_pdf_name(nombre, prefix="InformeComercial")
     doc = SimpleDocTemplate(filename, pagesize=landscape(A4), rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
     styles = getSampleStyleSheet()
     elementos = []
 
+    # Una sola lectura en lote de EEPP para todas las boletas del informe
+    obtener_resolver_eepp(obtener_db()).resolver(m.get('Boleta', '') for m in lista_datos)
+
     # Agrupar datos por Cultivo > Boleta
     datos_agrupados = defaultdict(lambda: defaultdict(list))
     for muestra in lista_datos:
@@ -92,5 +92,6 @@ def generar_informe_comercial_desde_ui(lista_datos, nombre: str | None = None):
             elementos.append(Spacer(1, 0.5 * cm))
 
     doc.build(elementos)
-    open_pdf(filename)
+    if abrir:
+        open_pdf(filename)
     return filename
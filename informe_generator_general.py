@@ -5,10 +5,14 @@ from reportlab.lib.pagesizes import landscape  # Asegúrate de tenerlo importado
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
-import firebase_admin
-from firebase_admin import credentials, firestore
 import sys, os
+from dataclasses import dataclass, field
 
+from eepp_cache import TAMANO_LOTE_GET_ALL, obtener_resolver_eepp
+from firebase_utils import obtener_db
+from graficas_pdf import es_distribucion, grafica_distribucion
+from indice_pdfs import huella_informe, registrar_pdf, reutilizar_pdf
+from plantillas_cache import obtener_cache_plantillas
 from pdf_utils import create_temp_pdf_name, open_pdf
 
 def recurso_path(rel_path):
@@ -18,21 +22,155 @@ def recurso_path(rel_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, rel_path)
 
-cred = credentials.Certificate(recurso_path("HarvestSync.json"))
+styles = getSampleStyleSheet()
 
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
 
-styles = getSampleStyleSheet()
+@dataclass
+class DatosInformeGeneral:
+    """Todo lo que necesita el informe, leído de Firestore antes de maquetar."""
+
+    muestras: dict = field(default_factory=dict)       # IdMuestra -> datos (o None)
+    secciones: list = field(default_factory=list)      # colecciones de PlantillasInforme/DATOS
+    plantillas: dict = field(default_factory=dict)     # (seccion, cultivo) -> plantilla (o None)
+    versiones: dict = field(default_factory=dict)      # IdMuestra -> update_time del documento
+
+    def huella(self, lista_datos, variedades):
+        """Huella de todo lo que determina el PDF (ver ``indice_pdfs``)."""
+        return huella_informe(
+            "general",
+            [[item.get(c) for c in ("IdMuestra", "CULTIVO", "Boleta", "Nombre")] for item in lista_datos],
+            sorted(self.versiones.items()),
+            sorted(variedades.items()),
+            self.secciones,
+            sorted(self.plantillas.items(), key=lambda par: par[0]),
+            FILAS_POR_TABLA,
+        )
+
+
+def _leer_en_lote(db, refs):
+    """``{ref.path: (datos | None, update_time)}`` con ``get_all`` en bloques de ``TAMANO_LOTE_GET_ALL``."""
+    leidos = {ref.path: (None, None) for ref in refs}
+    refs = list(refs)
+    for inicio in range(0, len(refs), TAMANO_LOTE_GET_ALL):
+        for snap in db.get_all(refs[inicio:inicio + TAMANO_LOTE_GET_ALL]):
+            datos = (snap.to_dict() or {}) if snap.exists else None
+            leidos[snap.reference.path] = (datos, getattr(snap, "update_time", None))
+    return leidos
+
+
+def precargar_datos_informe(db, lista_datos, resolver_eepp=None, plantillas=None):
+    """Lee de una vez muestras, EEPP y plantillas de sección del informe.
+
+    Cada muestra se pide una sola vez con ``get_all``; EEPP y plantillas salen
+    de sus cachés de proceso y solo van a Firestore si están frías.
+    """
+    resolver_eepp = resolver_eepp or obtener_resolver_eepp(db)
+    plantillas = plantillas or obtener_cache_plantillas(db)
+    resolver_eepp.resolver(str(item.get("Boleta", "")) for item in lista_datos)
+
+    ids = list(dict.fromkeys(str(item["IdMuestra"]) for item in lista_datos))
+    coleccion_muestras = db.collection("Muestras")
+    refs_muestras = {id_muestra: coleccion_muestras.document(id_muestra) for id_muestra in ids}
+
+    secciones = [s for s in plantillas.secciones() if s != "PlantillasMuestra"]
+    cultivos = list(dict.fromkeys(item["CULTIVO"] for item in lista_datos))
+    por_seccion = plantillas.plantillas((seccion, cultivo) for cultivo in cultivos for seccion in secciones)
+
+    leidos = _leer_en_lote(db, list(refs_muestras.values()))
+    return DatosInformeGeneral(
+        muestras={id_muestra: leidos[ref.path][0] for id_muestra, ref in refs_muestras.items()},
+        secciones=secciones,
+        plantillas={(seccion, str(cultivo)): datos for (seccion, cultivo), datos in por_seccion.items()},
+        # Sin update_time (emuladores antiguos) la versión es el propio contenido.
+        versiones={id_muestra: leidos[ref.path][1] or leidos[ref.path][0] for id_muestra, ref in refs_muestras.items()},
+    )
+
+
+FILAS_POR_TABLA = 100
+
+_ESTILO_TABLA = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+]
+
+
+def tablas_por_bloques(encabezado, filas, fila_final=None, filas_por_tabla=FILAS_POR_TABLA):
+    """Trocea ``filas`` en tablas de ``filas_por_tabla`` con el encabezado repetido.
+
+    Partir una única ``Table`` de miles de filas entre páginas es cuadrático en
+    reportlab; con bloques fijos el coste por fila es constante. ``fila_final``
+    (el TOTAL) va en negrita al final del último bloque.
+    """
+    filas = list(filas)
+    if fila_final is not None:
+        filas.append(fila_final)
+    tablas = []
+    for inicio in range(0, len(filas), filas_por_tabla):
+        bloque = filas[inicio:inicio + filas_por_tabla]
+        estilo = list(_ESTILO_TABLA)
+        if fila_final is not None and inicio + filas_por_tabla >= len(filas):
+            estilo.append(('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'))
+        tablas.append(Table([encabezado] + bloque, repeatRows=1, style=TableStyle(estilo)))
+    return tablas
+
+
+def filas_seccion(muestras, datos_por_id, campos):
+    """Filas de una sección y su fila TOTAL con las medias por columna.
+
+    Solo entran las muestras con algún valor distinto de ``""``, ``"-"`` o
+    ``None`` en los campos de la sección. Las medias se calculan de una vez por
+    columna sobre el texto mostrado; lo no numérico no cuenta.
+    """
+    if not muestras or not campos:
+        return [], None
+    import pandas as pd
+
+    valores = pd.DataFrame(
+        [[(datos_por_id.get(str(m["IdMuestra"])) or {}).get(campo, "") for campo in campos] for m in muestras],
+        columns=range(len(campos)),
+        dtype=object,
+    )
+    presentes = (valores.notna() & ~valores.isin(["", "-"])).any(axis=1).to_numpy()
+    if not presentes.any():
+        return [], None
+    valores = valores[presentes]
+    texto = valores.where(valores.notna() & (valores != "-"), "-").astype(str)
+
+    cabeceras = [[str(m.get("Boleta", "")), m.get("Nombre", "")] for m, presente in zip(muestras, presentes) if presente]
+    filas = [cabecera + valores_fila for cabecera, valores_fila in zip(cabeceras, texto.to_numpy().tolist())]
+
+    try:
+        promedios = texto.apply(pd.to_numeric, errors='coerce').mean(skipna=True).round(1)
+        fila_total = ["TOTAL", ""] + ["-" if pd.isna(val) else f"{val:.1f}" for val in promedios]
+    except Exception as e:
+        print(f"⚠️ Error calculando promedio: {e}")
+        fila_total = None
+    return filas, fila_total
 
 
-def generar_pdf_general(lista_datos):
+def generar_pdf_general(lista_datos, db=None, ruta_salida=None, abrir=True, resolver_eepp=None, plantillas=None, reutilizar=True):
+    """Informe agrupado por cultivo; devuelve la ruta del PDF.
+
+    Si ya se generó uno con los mismos datos (ver ``indice_pdfs``) se reutiliza.
+    """
+    db = db or obtener_db()
     nombre_referencia = None
     if lista_datos:
         nombre_referencia = lista_datos[0].get("Nombre")
 
-    filename = create_temp_pdf_name(nombre_referencia, prefix="InformeGeneral")
+    resolver_eepp = resolver_eepp or obtener_resolver_eepp(db)
+    precargados = precargar_datos_informe(db, lista_datos, resolver_eepp, plantillas)
+    huella = precargados.huella(lista_datos, resolver_eepp.variedades(item.get("Boleta", "") for item in lista_datos))
+    if reutilizar:
+        existente = reutilizar_pdf(huella, ruta_salida)
+        if existente:
+            if abrir:
+                open_pdf(existente)
+            return existente
+
+    filename = ruta_salida or create_temp_pdf_name(nombre_referencia, prefix="InformeGeneral")
     doc = SimpleDocTemplate(filename, pagesize=landscape(A4))
     elementos = []
 
@@ -55,16 +193,15 @@ def generar_pdf_general(lista_datos):
 
         # === Tabla inicial de muestras ===
         encabezado_muestra = ["Boleta", "Nombre", "Variedad", "IdMuestra", "Albaran", "FechaHora", "Tipo"]
-        filas_muestra = [encabezado_muestra]
+        filas_muestra = []
 
         for muestra in muestras:
             id_muestra = muestra["IdMuestra"]
-            datos = db.collection("Muestras").document(id_muestra).get().to_dict()
+            datos = precargados.muestras.get(str(id_muestra)) or {}
 
             boleta = str(muestra.get("Boleta", ""))
             nombre = muestra.get("Nombre", "")
-            variedad = db.collection("EEPP").document(boleta).get().to_dict()
-            variedad = variedad.get("Variedad", "-") if variedad else "-"
+            variedad = resolver_eepp.obtener_variedad(boleta, defecto="-")
 
             fila = [
                 boleta,
@@ -78,24 +215,14 @@ def generar_pdf_general(lista_datos):
             filas_muestra.append(fila)
 
         # Sin totalizar columnas de string como boleta
-        tabla_muestra = Table(filas_muestra, repeatRows=1)
-        tabla_muestra.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
         elementos.append(Paragraph("<b><i>Datos Muestra</i></b>", styles['Heading3']))
-        elementos.append(tabla_muestra)
+        elementos.extend(tablas_por_bloques(encabezado_muestra, filas_muestra))
         elementos.append(Spacer(1, 8))
 
         # === Secciones dinámicas ===
-        doc_plantilla = db.collection("PlantillasInforme").document("DATOS").get().to_dict()
-        secciones = [s for s in doc_plantilla.get("CAMPO", []) if s != "PlantillasMuestra"]
-
-
-        for seccion in secciones:
-            doc_seccion = db.collection(seccion).document(cultivo).get().to_dict()
+        con_datos = [m for m in muestras if precargados.muestras.get(str(m["IdMuestra"]))]
+        for seccion in precargados.secciones:
+            doc_seccion = precargados.plantillas.get((seccion, str(cultivo)))
             if not doc_seccion:
                 continue
 
@@ -103,58 +230,22 @@ def generar_pdf_general(lista_datos):
             campos_raw = doc_seccion.get("CAMPO", [])
             campos = [c.split("[")[0].strip() for c in campos_raw]
 
-            tabla_datos = [ ["Boleta", "Nombre"] + campos ]
-            datos_validos = []
-
-            for muestra in muestras:
-                id_muestra = muestra["IdMuestra"]
-                datos = db.collection("Muestras").document(id_muestra).get().to_dict()
-                if not datos:
-                    continue
-
-                fila = [str(muestra.get("Boleta", "")), muestra.get("Nombre", "")]
-                fila_valores = []
-                valores_presentes = False
-
-                for campo in campos:
-                    valor = datos.get(campo, "")
-                    fila_valores.append(valor)
-                    if valor not in ["", "-", None]:
-                        valores_presentes = True
-
-                if valores_presentes:
-                    fila.extend(str(v) if v not in [None, "-"] else "-" for v in fila_valores)
-                    tabla_datos.append(fila)
-                    datos_validos.append((fila[2:]))
-
-            if len(tabla_datos) <= 1:
+            filas, fila_total = filas_seccion(con_datos, precargados.muestras, campos)
+            if not filas:
                 continue
 
-            # Calcular promedios solo si hay datos válidos
-            if datos_validos:
-                try:
-                    import pandas as pd
-                    df = pd.DataFrame(datos_validos, columns=campos)
-                    df = df.apply(pd.to_numeric, errors='coerce')
-                    promedios = df.mean(skipna=True).round(1).fillna("-")
-                    fila_total = ["TOTAL", ""] + [f"{val:.1f}" if isinstance(val, float) else "-" for val in promedios]
-                    tabla_datos.append(fila_total)
-                except Exception as e:
-                    print(f"⚠️ Error calculando promedio: {e}")
-
-            tabla = Table(tabla_datos, repeatRows=1)
-            tabla.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')
-            ]))
-
             elementos.append(Paragraph(f"<b><i>{titulo}</i></b>", styles['Heading3']))
-            elementos.append(tabla)
+            elementos.extend(tablas_por_bloques(["Boleta", "Nombre"] + campos, filas, fila_final=fila_total))
+            medias = list(zip(campos, fila_total[2:])) if fila_total else []
+            if es_distribucion(medias):
+                elementos.append(Spacer(1, 6))
+                elementos.append(Paragraph(f"Distribución media ({cultivo})", styles['Normal']))
+                elementos.append(Spacer(1, 4))
+                elementos.append(grafica_distribucion(medias))
             elementos.append(Spacer(1, 12))
 
     doc.build(elementos)
-    open_pdf(filename)
+    registrar_pdf(huella, filename, "general")
+    if abrir:
+        open_pdf(filename)
     return filename
@@ -0,0 +1,169 @@
+"""Generación de informes desde la línea de comandos, sin Tk.
+
+Pensado para tareas programadas (p. ej. el paquete de informes nocturno)::
+
+    python informes_cli.py muestras --cultivo NARANJA --desde 2024-11-01 --hasta 2024-11-30 \\
+        --formato zip --salida informes_noviembre.zip --procesos 4
+    python informes_cli.py general --cultivo NARANJA --ultima-por-boleta --salida ultima.pdf
+    python informes_cli.py comercial --boleta 1001 --boleta 1002 --salida comercial.pdf
+
+Las muestras se seleccionan con los mismos filtros que la pantalla principal
+(``FiltroMuestras``), más una lista de boletas. Con ``--emulador HOST:PUERTO``
+se trabaja contra el emulador de Firestore en lugar del proyecto real.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Any, Sequence
+
+from muestras_filtros import FiltroMuestras, construir_query_firestore, rango_dia_utc
+
+# Límite de valores de un filtro ``in`` de Firestore.
+MAXIMO_IN = 30
+
+
+def _fecha(texto: str) -> date:
+    try:
+        return date.fromisoformat(texto)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Fecha no válida (AAAA-MM-DD): {texto}") from e
+
+
+def construir_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="informes_cli", description="Genera informes de HarvestSync sin interfaz.")
+    parser.add_argument("--emulador", metavar="HOST:PUERTO", help="usa el emulador de Firestore")
+
+    filtros = argparse.ArgumentParser(add_help=False)
+    filtros.add_argument("--cultivo", default="")
+    filtros.add_argument("--tipo", default="")
+    filtros.add_argument("--boleta", action="append", default=[], help="repetible; también admite valores separados por comas")
+    filtros.add_argument("--desde", type=_fecha, help="fecha inicial (AAAA-MM-DD)")
+    filtros.add_argument("--hasta", type=_fecha, help="fecha final (AAAA-MM-DD), incluida")
+    filtros.add_argument("--salida", required=True, help="carpeta, .zip o .pdf de destino")
+
+    sub = parser.add_subparsers(dest="informe", required=True)
+    muestras = sub.add_parser("muestras", parents=[filtros], help="un informe individual por muestra")
+    muestras.add_argument("--formato", choices=("carpeta", "zip", "pdf"), default="carpeta")
+    muestras.add_argument("--procesos", type=int, default=None, help="trabajos en paralelo")
+    muestras.add_argument("--hilos", action="store_true", help="paraleliza con hilos en lugar de procesos")
+
+    general = sub.add_parser("general", parents=[filtros], help="informe general agrupado por cultivo")
+    general.add_argument("--ultima-por-boleta", action="store_true", help="solo la última muestra de cada boleta")
+
+    sub.add_parser("comercial", parents=[filtros], help="informe comercial por boleta")
+    return parser
+
+
+def _boletas(valores: Sequence[str]) -> list[str]:
+    return list(dict.fromkeys(b.strip() for valor in valores for b in valor.split(",") if b.strip()))
+
+
+def _valores_boleta(boletas: Sequence[str]) -> list[Any]:
+    """La Boleta se guarda como texto o como número según el origen: se buscan ambos."""
+    valores: list[Any] = []
+    for boleta in boletas:
+        valores.append(boleta)
+        if boleta.isdigit():
+            valores.append(int(boleta))
+    return valores
+
+
+def buscar_muestras(db: Any, args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Muestras que cumplen los filtros, de la más antigua a la más reciente."""
+    desde = rango_dia_utc(args.desde, args.desde)[0] if args.desde else None
+    hasta = rango_dia_utc(args.hasta, args.hasta)[1] if args.hasta else None
+    filtro = FiltroMuestras(cultivo=args.cultivo, tipo=args.tipo, desde=desde, hasta=hasta)
+    boletas = _valores_boleta(_boletas(args.boleta))
+
+    consultas = [construir_query_firestore(db, filtro)]
+    if boletas:
+        consultas = [
+            consulta.where("Boleta", "in", boletas[i:i + MAXIMO_IN])
+            for consulta in consultas
+            for i in range(0, len(boletas), MAXIMO_IN)
+        ]
+    muestras: dict[str, dict[str, Any]] = {}
+    for consulta in consultas:
+        for doc in consulta.stream():
+            data = doc.to_dict() or {}
+            if filtro.coincide(data):
+                muestras[doc.id] = dict(data, IdMuestra=doc.id)
+    return sorted(muestras.values(), key=lambda m: (str(m.get("FechaHora") or ""), m["IdMuestra"]))
+
+
+def _ultima_por_boleta(muestras: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    ultimas: dict[str, dict[str, Any]] = {}
+    for muestra in muestras:  # ya ordenadas por fecha: gana la última
+        ultimas[str(muestra.get("Boleta", ""))] = muestra
+    return list(reversed(list(ultimas.values())))
+
+
+def ejecutar(args: argparse.Namespace, db: Any, inyectada: bool = False) -> int:
+    muestras = buscar_muestras(db, args)
+    if not muestras:
+        print("Sin muestras para los filtros indicados.")
+        return 0
+    print(f"{len(muestras)} muestras encontradas.")
+
+    if args.informe == "muestras":
+        from lote_informes import TrabajoInforme, generar_lote
+
+        trabajos = [
+            TrabajoInforme(
+                id_muestra=m["IdMuestra"],
+                cultivo=m.get("CULTIVO", "") or "",
+                uid_usuario=m.get("Usuario", "") or "",
+                titulo=" · ".join(str(m.get(c)) for c in ("Boleta", "Nombre") if m.get(c)) or m["IdMuestra"],
+            )
+            for m in muestras
+        ]
+        resultado = generar_lote(
+            trabajos,
+            args.salida,
+            modo=args.formato,
+            procesos=args.procesos,
+            hilos=args.hilos or inyectada,
+            progreso=lambda hechos, total: print(f"  {hechos}/{total}", end="\r" if hechos < total else "\n"),
+        )
+        print(resultado.resumen())
+        return 1 if resultado.fallidos else 0
+
+    Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+    if args.informe == "general":
+        from informe_generator_general import generar_pdf_general
+
+        lista = _ultima_por_boleta(muestras) if args.ultima_por_boleta else muestras
+        ruta = generar_pdf_general(lista, db=db, ruta_salida=args.salida, abrir=False)
+    else:
+        from informe_generator_comercial import generar_informe_comercial_desde_ui
+
+        ruta = generar_informe_comercial_desde_ui(muestras, nombre=muestras[0].get("Nombre"), ruta_salida=args.salida, abrir=False)
+    print(f"Informe guardado en {ruta}")
+    return 0
+
+
+def main(argv: Sequence[str] | None = None, db: Any = None) -> int:
+    """Punto de entrada; ``db`` permite pasar un cliente ya creado (tests, scripts)."""
+    args = construir_parser().parse_args(argv)
+    if args.emulador:
+        os.environ["FIRESTORE_EMULATOR_HOST"] = args.emulador
+
+    from firebase_utils import establecer_db, obtener_db
+
+    if db is not None:
+        establecer_db(db)
+    try:
+        return ejecutar(args, obtener_db(), inyectada=db is not None)
+    finally:
+        if db is not None:
+            establecer_db(None)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
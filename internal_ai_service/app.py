@@ -11,6 +11,7 @@ import json
 import logging
 import os
 import socket
+import sqlite3
 import tempfile
 import time
 import traceback
@@ -26,6 +27,11 @@ from flask import Flask, jsonify, request
 from internal_ai_service.config import Settings, load_settings
 from internal_ai_service.openai_gateway import OpenAIGateway, OpenAIServiceError
 
+try:  # Junto al escritorio se comparte su caché de fotos; desplegado a solas se descarga sin caché.
+    from cache_imagenes import ErrorDescargaImagen, descargador_urllib, obtener_cache_imagenes
+except ImportError:  # pragma: no cover - depende del despliegue
+    obtener_cache_imagenes = None
+
 logger = logging.getLogger("harvestsync.internal_ai")
 
 
@@ -39,6 +45,8 @@ def _configure_logging() -> None:
 app = Flask(__name__)
 _config: Settings | None = None
 _gateway: OpenAIGateway | None = None
+_image_cache: Any = None
+_image_cache_disabled = False
 
 
 def _extract_cultivo_variedad_from_context(context: str) -> tuple[str, str]:
@@ -75,6 +83,36 @@ def get_gateway() -> OpenAIGateway:
     return _gateway
 
 
+def get_image_cache() -> Any:
+    """Caché de fotos compartida (``HARVESTSYNC_IMAGENES_CACHE_PATH``); ``None`` si no se puede usar."""
+    global _image_cache, _image_cache_disabled
+    if _image_cache is None and not _image_cache_disabled:
+        if obtener_cache_imagenes is None:
+            _image_cache_disabled = True
+            logger.info("get_image_cache: cache_imagenes no disponible, descargas sin caché")
+        else:
+            try:
+                cache = obtener_cache_imagenes()
+                cache.ensure_schema()
+                _image_cache = cache
+            except (OSError, sqlite3.Error) as exc:
+                _image_cache_disabled = True
+                logger.warning("get_image_cache: caché de fotos no disponible, descargas sin caché detail=%s", exc)
+    return _image_cache
+
+
+def _download_image(image_url: str, timeout: float) -> bytes:
+    """Bytes de ``image_url``, a través de la caché de fotos cuando está disponible."""
+    cache = get_image_cache()
+    if cache is None:
+        with urllib.request.urlopen(image_url, timeout=timeout) as response:
+            return response.read()
+    try:
+        return cache.obtener(image_url, descargador_urllib(timeout))
+    except ErrorDescargaImagen:
+        return b""
+
+
 def _forbidden() -> Any:
     return jsonify({"ok": False, "error": "forbidden"}), 403
 
@@ -188,8 +226,7 @@ def analyze_image() -> Any:
             image_url,
         )
         try:
-            with urllib.request.urlopen(image_url, timeout=timeout_download) as response:
-                image_bytes = response.read()
+            image_bytes = _download_image(image_url, timeout_download)
         except socket.timeout:
             logger.error("analyze_image: image_download_timeout request_id=%s image_url=%s", request_id, image_url)
             return jsonify({"ok": False, "error": "image_download_timeout", "request_id": request_id}), 504
@@ -0,0 +1,213 @@
+"""Generación por lotes de informes individuales en un pool de procesos.
+
+Cada muestra seleccionada se renderiza con ``informe_generator.generar_pdf`` en
+un proceso aparte (reportlab y la preparación de fotos son CPU puro y no se
+benefician de hilos). El resultado se entrega de tres formas:
+
+* ``carpeta``: un PDF por muestra en el directorio elegido.
+* ``zip``: los mismos PDF dentro de un único ``.zip``.
+* ``pdf``: un solo PDF con un marcador por muestra (requiere ``pypdf``).
+
+Los procesos hijos arrancan con ``spawn``. En el ejecutable de PyInstaller
+``multiprocessing.freeze_support()`` (al principio de ``HarvestSync_Desk.py``)
+los intercepta; ejecutando desde fuentes se evita que reimporten el script
+principal, que levantaría otra ventana.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from importlib.machinery import ModuleSpec
+from pathlib import Path
+from typing import Callable, Iterable
+
+from pdf_utils import slugify
+
+MODOS_SALIDA = ("carpeta", "zip", "pdf")
+
+
+def procesos_por_defecto() -> int:
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+@dataclass(frozen=True)
+class TrabajoInforme:
+    """Una muestra a renderizar; ``titulo`` se usa para el nombre y el marcador."""
+
+    id_muestra: str
+    cultivo: str = ""
+    uid_usuario: str = ""
+    titulo: str = ""
+
+    def nombre_archivo(self) -> str:
+        base = slugify(self.titulo or self.id_muestra, default="Informe")
+        return f"{base}_{slugify(self.id_muestra)}.pdf" if self.titulo else f"{base}.pdf"
+
+
+@dataclass
+class ResultadoLote:
+    generados: list[tuple[TrabajoInforme, Path]] = field(default_factory=list)
+    fallidos: list[tuple[TrabajoInforme, str]] = field(default_factory=list)
+    salida: Path | None = None
+    cancelado: bool = False
+    segundos: float = 0.0
+
+    def resumen(self) -> str:
+        lineas = [f"{len(self.generados)} informes generados en {self.segundos:.1f} s."]
+        if self.cancelado:
+            lineas.append("El lote se canceló antes de terminar.")
+        if self.fallidos:
+            lineas.append(f"{len(self.fallidos)} fallidos:")
+            lineas.extend(f"  · {t.titulo or t.id_muestra}: {error}" for t, error in self.fallidos[:10])
+            if len(self.fallidos) > 10:
+                lineas.append(f"  … y {len(self.fallidos) - 10} más")
+        if self.salida is not None:
+            lineas.append(f"Salida: {self.salida}")
+        return "\n".join(lineas)
+
+
+def generar_informe_individual(trabajo: TrabajoInforme, ruta_salida: str) -> str:
+    """Tarea de cada proceso hijo: renderiza un informe sin abrirlo."""
+    from informe_generator import generar_pdf
+
+    return generar_pdf(trabajo.id_muestra, trabajo.cultivo, trabajo.uid_usuario, ruta_salida=ruta_salida, abrir=False)
+
+
+def _evitar_reimportar_principal() -> None:
+    """Impide que los hijos ``spawn`` vuelvan a ejecutar el script de la interfaz.
+
+    Al arrancar, ``multiprocessing`` ejecuta en cada hijo el fichero de
+    ``__main__`` salvo que su ``__spec__`` se llame ``__main__``. Los hijos del
+    lote solo necesitan módulos importables, así que basta con marcarlo.
+    """
+    principal = sys.modules.get("__main__")
+    if principal is not None and getattr(principal, "__spec__", None) is None:
+        principal.__spec__ = ModuleSpec("__main__", None)
+
+
+def _rutas_unicas(trabajos: list[TrabajoInforme], carpeta: Path) -> list[Path]:
+    usados: set[str] = set()
+    rutas = []
+    for trabajo in trabajos:
+        nombre = trabajo.nombre_archivo()
+        base, ext = os.path.splitext(nombre)
+        n = 1
+        while nombre.lower() in usados:
+            n += 1
+            nombre = f"{base}_{n}{ext}"
+        usados.add(nombre.lower())
+        rutas.append(carpeta / nombre)
+    return rutas
+
+
+def empaquetar_zip(generados: list[tuple[TrabajoInforme, Path]], destino: Path) -> Path:
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for _, ruta in generados:
+            zf.write(ruta, arcname=ruta.name)
+    return destino
+
+
+def unir_con_marcadores(generados: list[tuple[TrabajoInforme, Path]], destino: Path) -> Path:
+    """Une los PDF en ``destino`` con un marcador por muestra."""
+    try:
+        from pypdf import PdfWriter
+    except ImportError as e:
+        raise RuntimeError("Para unir los informes en un solo PDF instala 'pypdf' o elige carpeta/ZIP.") from e
+    writer = PdfWriter()
+    for trabajo, ruta in generados:
+        writer.append(str(ruta), outline_item=trabajo.titulo or trabajo.id_muestra)
+    with open(destino, "wb") as f:
+        writer.write(f)
+    return destino
+
+
+def generar_lote(
+    trabajos: Iterable[TrabajoInforme],
+    destino: str | Path,
+    modo: str = "carpeta",
+    procesos: int | None = None,
+    progreso: Callable[[int, int], None] | None = None,
+    cancelado: threading.Event | None = None,
+    generar: Callable[[TrabajoInforme, str], str] = generar_informe_individual,
+    hilos: bool = False,
+) -> ResultadoLote:
+    """Renderiza ``trabajos`` en paralelo y los deja en ``destino`` según ``modo``.
+
+    ``destino`` es un directorio en modo ``carpeta`` y la ruta del ``.zip`` o del
+    ``.pdf`` en los otros dos. Los fallos de una muestra no detienen el resto.
+    ``generar`` debe ser una función de módulo (se envía por pickle al hijo).
+    Con ``hilos=True`` se usa un pool de hilos del propio proceso, necesario si
+    el cliente de Firestore se ha inyectado con ``firebase_utils.establecer_db``.
+    En los modos ``zip`` y ``pdf`` las rutas de ``generados`` son temporales y
+    ya no existen al volver.
+    """
+    if modo not in MODOS_SALIDA:
+        raise ValueError(f"Modo de salida desconocido: {modo!r}")
+    trabajos = list(trabajos)
+    inicio = time.perf_counter()
+    resultado = ResultadoLote()
+    destino = Path(destino)
+
+    temporal = None
+    if modo == "carpeta":
+        carpeta = destino
+        carpeta.mkdir(parents=True, exist_ok=True)
+    else:
+        temporal = tempfile.mkdtemp(prefix="HarvestSyncLote_")
+        carpeta = Path(temporal)
+
+    try:
+        rutas = _rutas_unicas(trabajos, carpeta)
+        hechos = 0
+        if progreso:
+            progreso(0, len(trabajos))
+        if trabajos:
+            procesos = max(1, min(procesos or procesos_por_defecto(), len(trabajos)))
+            if hilos:
+                pool = ThreadPoolExecutor(max_workers=procesos, thread_name_prefix="lote")
+            else:
+                _evitar_reimportar_principal()
+                pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                futuros = {pool.submit(generar, t, str(r)): i for i, (t, r) in enumerate(zip(trabajos, rutas))}
+                por_indice: dict[int, Path] = {}
+                pendientes = set(futuros)
+                while pendientes:
+                    if cancelado is not None and cancelado.is_set():
+                        resultado.cancelado = True
+                        break
+                    listos, pendientes = wait(pendientes, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        i = futuros[futuro]
+                        try:
+                            por_indice[i] = Path(futuro.result())
+                        except Exception as e:  # noqa: BLE001 - se informa por muestra
+                            resultado.fallidos.append((trabajos[i], str(e) or type(e).__name__))
+                        hechos += 1
+                        if progreso:
+                            progreso(hechos, len(trabajos))
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+            resultado.generados = [(trabajos[i], por_indice[i]) for i in sorted(por_indice)]
+
+        if modo == "carpeta":
+            resultado.salida = carpeta
+        elif resultado.generados and not resultado.cancelado:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            if modo == "zip":
+                resultado.salida = empaquetar_zip(resultado.generados, destino)
+            else:
+                resultado.salida = unir_con_marcadores(resultado.generados, destino)
+    finally:
+        if temporal is not None:
+            shutil.rmtree(temporal, ignore_errors=True)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
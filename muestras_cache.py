@@ -0,0 +1,350 @@
+"""Caché local SQLite de la colección Muestras con sincronización incremental.
+
+El cursor incremental es ``FechaHora``, la fecha de creación de la muestra:
+Firestore no permite filtrar por ``update_time`` y las muestras no llevan un campo
+de última modificación. Las ediciones de muestras con ``FechaHora`` dentro de la
+``VENTANA_SOLAPE`` llegan en la siguiente sincronización; las de muestras más
+antiguas, en la siguiente pasada completa (cada ``RESINCRONIZACION_COMPLETA_HORAS``,
+configurable con ``HARVESTSYNC_MUESTRAS_RESYNC_HORAS``) o al momento con el modo
+en vivo.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from muestras_filtros import FiltroMuestras, contiene
+
+COLECCION_MUESTRAS = "Muestras"
+CAMPO_CURSOR = "FechaHora"
+MUESTRAS_CACHE_DB_ENV = "HARVESTSYNC_MUESTRAS_CACHE_PATH"
+# Las muestras recientes se siguen completando tras subirse: se relee este margen
+# por detrás del cursor para recoger sus ediciones sin descargar la colección entera.
+VENTANA_SOLAPE = timedelta(days=2)
+# Cada cierto tiempo se hace una pasada completa para reflejar borrados y ediciones
+# de muestras antiguas, que el cursor por FechaHora no detecta.
+RESINCRONIZACION_COMPLETA_ENV = "HARVESTSYNC_MUESTRAS_RESYNC_HORAS"
+RESINCRONIZACION_COMPLETA_HORAS = float(os.getenv(RESINCRONIZACION_COMPLETA_ENV, "6"))
+TAMANO_LOTE_ESCRITURA = 500
+
+
+def ruta_cache_por_defecto() -> Path:
+    """Carpeta persistente por usuario (no el temporal, que se limpia)."""
+    base = os.getenv("LOCALAPPDATA") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "HarvestSyncDesk" / "muestras_cache.sqlite"
+
+
+def _a_utc_iso(value: Any) -> str | None:
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    # Ancho fijo para que la comparación de texto en SQLite respete el orden temporal.
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _codificar_valor(value: Any) -> Any:
+    """Convierte tipos de Firestore a algo serializable en JSON y reversible."""
+    if isinstance(value, datetime):
+        return {"__dt__": _a_utc_iso(value)}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    latitude = getattr(value, "latitude", None)
+    longitude = getattr(value, "longitude", None)
+    if latitude is not None and longitude is not None:
+        return {"__geo__": [latitude, longitude]}
+    path = getattr(value, "path", None)
+    if isinstance(path, str):
+        return {"__ref__": path}
+    return str(value)
+
+
+def _decodificar_objeto(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__dt__" in obj:
+            return datetime.fromisoformat(obj["__dt__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        if "__geo__" in obj:
+            return tuple(obj["__geo__"])
+        if "__ref__" in obj:
+            return obj["__ref__"]
+    return obj
+
+
+def serializar_datos(data: dict[str, Any]) -> str:
+    return json.dumps(data, default=_codificar_valor, ensure_ascii=False)
+
+
+def deserializar_datos(raw: str) -> dict[str, Any]:
+    return json.loads(raw, object_hook=_decodificar_objeto)
+
+
+@dataclass
+class ResultadoSincronizacion:
+    """Resumen de una pasada de sincronización contra Firestore."""
+
+    documentos_leidos: int
+    completa: bool
+    cursor: str | None
+    # Filas insertadas, modificadas o purgadas; 0 si la caché ya estaba al día.
+    cambios: int = 0
+
+
+class MuestrasCache:
+    """Réplica local de Muestras: la búsqueda lee de disco y solo se descarga el delta."""
+
+    def __init__(self, db_path: str | Path | None = None) -> None:
+        configured = str(db_path or os.getenv(MUESTRAS_CACHE_DB_ENV, "")).strip()
+        self.db_path = configured or str(ruta_cache_por_defecto())
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000;")
+        # LIKE/lower() de SQLite solo pliegan ASCII: la subcadena se compara en Python.
+        conn.create_function("contiene", 2, contiene, deterministic=True)
+        return conn
+
+    def ensure_schema(self) -> None:
+        with self._lock:
+            if self._initialized:
+                return
+            parent_dir = os.path.dirname(self.db_path)
+            if parent_dir:
+                os.makedirs(parent_dir, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode = WAL;")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS muestras (
+                        id TEXT PRIMARY KEY,
+                        boleta TEXT,
+                        cultivo TEXT,
+                        tipo TEXT,
+                        usuario TEXT,
+                        nombre TEXT,
+                        fecha_hora TEXT,
+                        update_time TEXT,
+                        datos TEXT NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS sync_meta (
+                        clave TEXT PRIMARY KEY,
+                        valor TEXT
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_muestras_fecha_hora ON muestras(fecha_hora)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_muestras_boleta ON muestras(boleta)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_muestras_cultivo ON muestras(cultivo)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_muestras_tipo ON muestras(tipo)")
+                conn.commit()
+            self._initialized = True
+
+    # --- Metadatos de sincronización ---
+    def _leer_meta(self, conn: sqlite3.Connection, clave: str) -> str | None:
+        row = conn.execute("SELECT valor FROM sync_meta WHERE clave = ?", (clave,)).fetchone()
+        return row["valor"] if row else None
+
+    @staticmethod
+    def _guardar_meta(conn: sqlite3.Connection, clave: str, valor: str | None) -> None:
+        conn.execute(
+            "INSERT INTO sync_meta (clave, valor) VALUES (?, ?) "
+            "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+            (clave, valor),
+        )
+
+    def obtener_cursor(self) -> str | None:
+        self.ensure_schema()
+        with self._connect() as conn:
+            return self._leer_meta(conn, "cursor")
+
+    def _requiere_completa(self, conn: sqlite3.Connection) -> bool:
+        if self._leer_meta(conn, "cursor") is None:
+            return True
+        ultima = self._leer_meta(conn, "ultima_completa")
+        if not ultima:
+            return True
+        try:
+            ultima_dt = datetime.fromisoformat(ultima)
+        except ValueError:
+            return True
+        return datetime.now(timezone.utc) - ultima_dt > timedelta(hours=RESINCRONIZACION_COMPLETA_HORAS)
+
+    # --- Escritura ---
+    @staticmethod
+    def _fila_desde_documento(doc: Any) -> tuple[Any, ...]:
+        data = doc.to_dict() or {}
+        update_time = _a_utc_iso(getattr(doc, "update_time", None))
+        return (
+            doc.id,
+            str(data.get("Boleta", "") or "").strip(),
+            str(data.get("CULTIVO", "") or "").strip(),
+            str(data.get("Tipo", "") or "").strip(),
+            str(data.get("Usuario", "") or "").strip(),
+            str(data.get("Nombre", "") or "").strip(),
+            _a_utc_iso(data.get(CAMPO_CURSOR)),
+            update_time,
+            serializar_datos(data),
+        )
+
+    @staticmethod
+    def _escribir_filas(conn: sqlite3.Connection, filas: list[tuple[Any, ...]]) -> None:
+        conn.executemany(
+            """
+            INSERT INTO muestras (id, boleta, cultivo, tipo, usuario, nombre, fecha_hora, update_time, datos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                boleta = excluded.boleta,
+                cultivo = excluded.cultivo,
+                tipo = excluded.tipo,
+                usuario = excluded.usuario,
+                nombre = excluded.nombre,
+                fecha_hora = excluded.fecha_hora,
+                update_time = excluded.update_time,
+                datos = excluded.datos
+            WHERE muestras.datos IS NOT excluded.datos OR muestras.update_time IS NOT excluded.update_time
+            """,
+            filas,
+        )
+
+    def upsert_documentos(self, docs: Iterable[Any]) -> int:
+        """Guarda snapshots de Firestore ya leídos (p. ej. tras editar una muestra)."""
+        self.ensure_schema()
+        filas = [self._fila_desde_documento(doc) for doc in docs]
+        if not filas:
+            return 0
+        with self._connect() as conn:
+            self._escribir_filas(conn, filas)
+            conn.commit()
+        return len(filas)
+
+    def eliminar(self, ids: Iterable[str]) -> None:
+        self.ensure_schema()
+        ids_lista = [(str(id_muestra),) for id_muestra in ids]
+        if not ids_lista:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM muestras WHERE id = ?", ids_lista)
+            conn.commit()
+
+    def vaciar(self) -> None:
+        self.ensure_schema()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM muestras")
+            conn.execute("DELETE FROM sync_meta")
+            conn.commit()
+
+    # --- Sincronización ---
+    def sincronizar(self, db: Any, forzar_completa: bool = False) -> ResultadoSincronizacion:
+        """Trae de Firestore las muestras creadas desde el último cursor (menos el solape).
+
+        La primera vez (o cada ``RESINCRONIZACION_COMPLETA_HORAS``) se hace una pasada
+        completa que además recoge ediciones antiguas y purga los borrados remotos.
+        """
+        self.ensure_schema()
+        with self._connect() as conn:
+            completa = forzar_completa or self._requiere_completa(conn)
+            cursor_actual = self._leer_meta(conn, "cursor")
+
+        coleccion = db.collection(COLECCION_MUESTRAS)
+        if completa:
+            query = coleccion
+        else:
+            desde = datetime.fromisoformat(cursor_actual) - VENTANA_SOLAPE
+            query = coleccion.where(CAMPO_CURSOR, ">=", desde).order_by(CAMPO_CURSOR)
+
+        leidos = 0
+        cursor_nuevo = cursor_actual
+        vistos: set[str] = set()
+        pendientes: list[tuple[Any, ...]] = []
+        with self._connect() as conn:
+            if completa:
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS ids_vistos (id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM ids_vistos")
+            cambios_previos = conn.total_changes
+            for doc in query.stream():
+                fila = self._fila_desde_documento(doc)
+                pendientes.append(fila)
+                leidos += 1
+                fecha_iso = fila[6]
+                if fecha_iso and (cursor_nuevo is None or fecha_iso > cursor_nuevo):
+                    cursor_nuevo = fecha_iso
+                if completa:
+                    vistos.add(doc.id)
+                if len(pendientes) >= TAMANO_LOTE_ESCRITURA:
+                    self._escribir_filas(conn, pendientes)
+                    pendientes = []
+            if pendientes:
+                self._escribir_filas(conn, pendientes)
+            cambios = conn.total_changes - cambios_previos
+
+            ahora = datetime.now(timezone.utc).isoformat()
+            if completa:
+                conn.executemany("INSERT OR IGNORE INTO ids_vistos (id) VALUES (?)", [(i,) for i in vistos])
+                purgadas = conn.execute("DELETE FROM muestras WHERE id NOT IN (SELECT id FROM ids_vistos)")
+                cambios += purgadas.rowcount
+                conn.execute("DROP TABLE ids_vistos")
+                self._guardar_meta(conn, "ultima_completa", ahora)
+            self._guardar_meta(conn, "cursor", cursor_nuevo or ahora)
+            self._guardar_meta(conn, "ultima_sincronizacion", ahora)
+            conn.commit()
+
+        return ResultadoSincronizacion(documentos_leidos=leidos, completa=completa, cursor=cursor_nuevo, cambios=cambios)
+
+    # --- Lectura ---
+    @staticmethod
+    def _where_desde_filtro(filtro: FiltroMuestras | None) -> tuple[str, list[Any]]:
+        if filtro is None:
+            return "", []
+        columnas = {"Boleta": "boleta", "CULTIVO": "cultivo", "Tipo": "tipo"}
+        condiciones: list[str] = []
+        params: list[Any] = []
+        for campo, termino in filtro.filtros_texto():
+            condiciones.append(f"contiene({columnas[campo]}, ?)")
+            params.append(termino)
+        if filtro.desde is not None:
+            condiciones.append("fecha_hora >= ?")
+            params.append(_a_utc_iso(filtro.desde))
+        if filtro.hasta is not None:
+            condiciones.append("fecha_hora <= ?")
+            params.append(_a_utc_iso(filtro.hasta))
+        if not condiciones:
+            return "", []
+        return " WHERE " + " AND ".join(condiciones), params
+
+    def iterar(self, filtro: FiltroMuestras | None = None) -> Iterator[dict[str, Any]]:
+        """Genera las muestras cacheadas del filtro según se leen, de la más reciente a la más antigua."""
+        self.ensure_schema()
+        where, params = self._where_desde_filtro(filtro)
+        with self._connect() as conn:
+            sql = f"SELECT id, datos FROM muestras{where} ORDER BY fecha_hora DESC"
+            for row in conn.execute(sql, params):
+                data = deserializar_datos(row["datos"])
+                data["IdMuestra"] = row["id"]
+                yield data
+
+    def consultar(self, filtro: FiltroMuestras | None = None) -> list[dict[str, Any]]:
+        """Devuelve las muestras cacheadas que cumplen los filtros de texto y de fecha."""
+        return list(self.iterar(filtro))
+
+    def cargar_registros(self) -> list[dict[str, Any]]:
+        """Devuelve todas las muestras cacheadas como diccionarios (con ``IdMuestra``)."""
+        return self.consultar(None)
@@ -0,0 +1,136 @@
+"""Modo en vivo: escucha ``on_snapshot`` sobre la ventana de búsqueda actual.
+
+El listener se engancha a la misma consulta que usa Buscar cuando la caché está
+fría (rango de FechaHora). Firestore entrega primero el estado completo y después
+solo los cambios (altas, modificaciones y bajas); cada lote se traduce en un
+``CambiosMuestras`` y se aplica sobre el DataFrame cargado con ``aplicar_cambios``
+sin volver a descargar nada. Los documentos que no cumplen los filtros de texto
+se tratan como bajas: así desaparece también una muestra editada que deja de
+coincidir.
+
+El callback de Firestore llega en un hilo propio del SDK: quien use
+``EscuchaMuestras`` debe reenviar los cambios al hilo de la UI.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+from muestras_filtros import FiltroMuestras, construir_query_firestore
+
+CLAVE_MUESTRA = "IdMuestra"
+_COLUMNA_ORDEN = "__orden_en_vivo"
+
+
+@dataclass
+class CambiosMuestras:
+    """Documentos añadidos o modificados y ids eliminados en un snapshot.
+
+    ``descartados`` son documentos modificados que ya no cumplen los filtros de
+    texto: siguen existiendo (la caché los guarda) pero salen de la vista.
+    """
+
+    documentos: list[Any] = field(default_factory=list)
+    eliminadas: list[str] = field(default_factory=list)
+    descartados: list[Any] = field(default_factory=list)
+    inicial: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.documentos or self.eliminadas or self.descartados)
+
+    def fuera_de_vista(self) -> list[str]:
+        """Ids que hay que quitar de la tabla: bajas y documentos descartados."""
+        return self.eliminadas + [doc.id for doc in self.descartados]
+
+    def registros(self) -> list[dict[str, Any]]:
+        return [dict(doc.to_dict() or {}, **{CLAVE_MUESTRA: doc.id}) for doc in self.documentos]
+
+
+def cambios_desde_snapshot(changes: Iterable[Any]) -> CambiosMuestras:
+    """Agrupa los ``DocumentChange`` de un callback de ``on_snapshot``."""
+    cambios = CambiosMuestras()
+    for change in changes:
+        tipo = getattr(change.type, "name", str(change.type))
+        if tipo == "REMOVED":
+            cambios.eliminadas.append(change.document.id)
+        else:
+            cambios.documentos.append(change.document)
+    return cambios
+
+
+def aplicar_cambios(
+    df: pd.DataFrame,
+    nuevos: pd.DataFrame,
+    eliminadas: Iterable[str] = (),
+    clave: str = CLAVE_MUESTRA,
+) -> pd.DataFrame:
+    """Aplica un delta sobre ``df`` conservando el orden de las filas existentes.
+
+    Las filas modificadas se sustituyen en su sitio y las nuevas se colocan al
+    principio (son las más recientes), en el orden recibido.
+    """
+    eliminadas = set(eliminadas)
+    if df is None or df.empty or clave not in df.columns:
+        base = pd.DataFrame(columns=[clave])
+    else:
+        base = df.reset_index(drop=True)
+    if eliminadas:
+        base = base[~base[clave].isin(eliminadas)]
+    if nuevos is None or nuevos.empty:
+        return base.reset_index(drop=True)
+
+    nuevos = nuevos[~nuevos[clave].isin(eliminadas)].drop_duplicates(subset=clave, keep="last")
+    posicion_actual = pd.Series(range(len(base)), index=base[clave].to_numpy(), dtype="float64")
+    posicion_actual = posicion_actual[~posicion_actual.index.duplicated(keep="first")]
+    nuevos = nuevos.assign(**{_COLUMNA_ORDEN: nuevos[clave].map(posicion_actual).fillna(-1.0).to_numpy()})
+    resto = base.assign(**{_COLUMNA_ORDEN: range(len(base))})
+    resto = resto[~resto[clave].isin(nuevos[clave])]
+
+    combinado = pd.concat([nuevos, resto], ignore_index=True, sort=False)
+    combinado = combinado.sort_values(_COLUMNA_ORDEN, kind="mergesort")
+    return combinado.drop(columns=_COLUMNA_ORDEN).reset_index(drop=True)
+
+
+class EscuchaMuestras:
+    """Listener de Firestore sobre la consulta de un ``FiltroMuestras``."""
+
+    def __init__(self, db: Any, filtro: FiltroMuestras, al_cambios: Callable[[CambiosMuestras], None]) -> None:
+        self._db = db
+        self.filtro = filtro
+        self._al_cambios = al_cambios
+        self._watch: Any = None
+        self._primera = True
+        self._detenida = threading.Event()
+
+    @property
+    def activa(self) -> bool:
+        return self._watch is not None and not self._detenida.is_set()
+
+    def iniciar(self) -> "EscuchaMuestras":
+        self._watch = construir_query_firestore(self._db, self.filtro).on_snapshot(self._on_snapshot)
+        return self
+
+    def detener(self) -> None:
+        self._detenida.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            finally:
+                self._watch = None
+
+    def _on_snapshot(self, _docs: Any, changes: Iterable[Any], _read_time: Any) -> None:
+        if self._detenida.is_set():
+            return
+        cambios = cambios_desde_snapshot(changes)
+        if self.filtro.filtros_texto():
+            documentos, cambios.documentos = cambios.documentos, []
+            for doc in documentos:
+                destino = cambios.documentos if self.filtro.coincide(doc.to_dict() or {}) else cambios.descartados
+                destino.append(doc)
+        cambios.inicial = self._primera
+        self._primera = False
+        if cambios:
+            self._al_cambios(cambios)
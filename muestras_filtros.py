@@ -0,0 +1,83 @@
+"""Filtros de la búsqueda principal de muestras.
+
+Todos los campos de texto se buscan como subcadena sin distinguir mayúsculas ni
+tildes, igual que el filtro mientras se escribe. Solo el rango de FechaHora se
+resuelve en Firestore (``where``); Boleta, CULTIVO y Tipo se comprueban con
+``FiltroMuestras.coincide`` sobre cada documento, o con ``WHERE contiene(...)`` en
+la caché local. La Boleta se compara siempre como texto, esté guardada como
+número o como cadena. Nombre y Usuario no forman parte de la búsqueda: los filtra
+el índice local (``indice_muestras``) sobre las muestras ya cargadas.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+import unicodedata
+from typing import Any
+
+CAMPO_FECHA = "FechaHora"
+CAMPOS_TEXTO = ("Boleta", "CULTIVO", "Tipo")
+
+
+def normalizar_texto(valor: Any) -> str:
+    """Minúsculas y sin tildes/diacríticos; ``None``/NaN se tratan como vacío."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor != valor:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(valor))
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
+    return texto.lower().strip()
+
+
+def contiene(valor: Any, termino: str) -> bool:
+    """``True`` si ``termino`` aparece en ``valor`` sin distinguir mayúsculas ni tildes."""
+    return normalizar_texto(termino) in normalizar_texto(valor)
+
+
+@dataclass
+class FiltroMuestras:
+    """Criterios de búsqueda tal y como los introduce el usuario en la pantalla principal."""
+
+    boleta: str = ""
+    cultivo: str = ""
+    tipo: str = ""
+    desde: datetime | None = None
+    hasta: datetime | None = None
+
+    def __post_init__(self) -> None:
+        self.boleta = str(self.boleta or "").strip()
+        self.cultivo = str(self.cultivo or "").strip()
+        self.tipo = str(self.tipo or "").strip()
+
+    def filtros_texto(self) -> list[tuple[str, str]]:
+        """Pares (campo Firestore, término) de los filtros de subcadena informados."""
+        valores = {"Boleta": self.boleta, "CULTIVO": self.cultivo, "Tipo": self.tipo}
+        return [(campo, valores[campo]) for campo in CAMPOS_TEXTO if valores[campo]]
+
+    def coincide(self, data: dict[str, Any]) -> bool:
+        """Comprueba los filtros de texto sobre un documento ya leído."""
+        return all(contiene(data.get(campo), termino) for campo, termino in self.filtros_texto())
+
+
+def rango_dia_utc(desde: date, hasta: date) -> tuple[datetime, datetime]:
+    """Convierte las fechas de los selectores en el intervalo [00:00, 23:59:59] en UTC."""
+    inicio = datetime.combine(desde, time.min, tzinfo=timezone.utc)
+    fin = datetime.combine(hasta, time(23, 59, 59), tzinfo=timezone.utc)
+    return inicio, fin
+
+
+def construir_query_firestore(db: Any, filtro: FiltroMuestras, coleccion: str = "Muestras") -> Any:
+    """Traduce el rango de fecha del filtro a una consulta Firestore.
+
+    Firestore no busca subcadenas: quien recorra la consulta debe descartar los
+    documentos con ``filtro.coincide``.
+    """
+    query = db.collection(coleccion)
+    if filtro.desde is not None:
+        query = query.where(CAMPO_FECHA, ">=", filtro.desde)
+    if filtro.hasta is not None:
+        query = query.where(CAMPO_FECHA, "<=", filtro.hasta)
+    if filtro.desde is not None or filtro.hasta is not None:
+        query = query.order_by(CAMPO_FECHA)
+    return query
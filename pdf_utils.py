@@ -45,13 +45,26 @@ def open_pdf(filename: str) -> None:
 
 
 def cleanup_old_pdfs(max_age_hours: int = 24) -> None:
-    """Remove temporary PDFs older than *max_age_hours* from the temp folder."""
+    """Remove temporary PDFs older than *max_age_hours* from the temp folder.
+
+    PDFs registered in the reuse index (``indice_pdfs``) count their age from
+    their last reuse, and removed files are dropped from the index.
+    """
     base_dir = os.path.join(tempfile.gettempdir(), "HarvestSyncDesk")
     if not os.path.isdir(base_dir):
         return
 
     now = datetime.datetime.now().timestamp()
     max_age_seconds = max_age_hours * 3600
+    try:
+        from indice_pdfs import IndicePdfs
+
+        indice = IndicePdfs(base_dir)
+        indexed = {os.path.normcase(os.path.abspath(p)): (p, t) for p, t in indice.ultimos_usos().items()}
+    except Exception as exc:  # noqa: BLE001 - cleanup works without the index
+        print(f"Error reading PDF index: {exc}")
+        indice, indexed = None, {}
+    removed = []
 
     for name in os.listdir(base_dir):
         if not name.lower().endswith(".pdf"):
@@ -65,12 +78,15 @@ def cleanup_old_pdfs(max_age_hours: int = 24) -> None:
             print(f"Error stating {path}: {exc}")
             continue
 
-        age = now - stat_info.st_mtime
+        key = os.path.normcase(os.path.abspath(path))
+        reference = max(stat_info.st_mtime, indexed.get(key, (path, 0.0))[1])
+        age = now - reference
         if age <= max_age_seconds:
             continue
 
         try:
             os.remove(path)
+            removed.append(indexed.get(key, (path, 0.0))[0])
             print(f"Removed old temp PDF: {path}")
         except PermissionError:
             # File still in use; skip it silently.
@@ -79,3 +95,9 @@ def cleanup_old_pdfs(max_age_hours: int = 24) -> None:
             pass
         except OSError as exc:  # noqa: BLE001 - log unexpected issues
             print(f"Error removing {path}: {exc}")
+
+    if indice is not None and removed:
+        try:
+            indice.olvidar(removed)
+        except Exception as exc:  # noqa: BLE001 - the index is best effort
+            print(f"Error updating PDF index: {exc}")
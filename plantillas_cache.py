@@ -0,0 +1,204 @@
+"""Caché de proceso para las plantillas de informe.
+
+Los informes leen ``PlantillasInforme/DATOS`` (la lista de secciones) y un
+documento ``<seccion>/<cultivo>`` por sección y cultivo. Cambian pocas veces por
+campaña, así que se guardan con un TTL y, si se activa ``escuchar()``, se
+mantienen al día con listeners ``on_snapshot``: mientras escuchan, las entradas
+no caducan y preparar un informe no hace ninguna llamada a Firestore.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Iterable
+
+from eepp_cache import TAMANO_LOTE_GET_ALL
+
+COLECCION_PLANTILLAS = "PlantillasInforme"
+DOCUMENTO_SECCIONES = "DATOS"
+TTL_SEGUNDOS = 30 * 60
+
+Plantilla = dict[str, Any] | None
+
+
+class PlantillasCache:
+    """Secciones del informe y plantillas ``(seccion, cultivo)`` con TTL e invalidación."""
+
+    def __init__(self, db: Any, ttl_segundos: float = TTL_SEGUNDOS, reloj=time.monotonic) -> None:
+        self.db = db
+        self.ttl_segundos = float(ttl_segundos)
+        self._reloj = reloj
+        self._secciones: tuple[float, list[str]] | None = None
+        self._plantillas: dict[tuple[str, str], tuple[float, Plantilla]] = {}
+        self._lock = threading.Lock()
+        self._watches: dict[str, Any] = {}
+        self._escuchando = False
+        self._activo = False
+
+    # --- lectura ---
+
+    def _vigente(self, marca: float) -> bool:
+        return self._escuchando or (self._reloj() - marca) < self.ttl_segundos
+
+    def secciones(self) -> list[str]:
+        """Colecciones de sección en el orden de ``PlantillasInforme/DATOS``."""
+        with self._lock:
+            if self._secciones is not None and self._vigente(self._secciones[0]):
+                return list(self._secciones[1])
+        datos = self.db.collection(COLECCION_PLANTILLAS).document(DOCUMENTO_SECCIONES).get().to_dict() or {}
+        secciones = list(datos.get("CAMPO", []))
+        with self._lock:
+            self._secciones = (self._reloj(), secciones)
+        return list(secciones)
+
+    def plantillas(self, claves: Iterable[tuple[str, str]]) -> dict[tuple[str, str], Plantilla]:
+        """Plantillas por ``(seccion, cultivo)``; las que faltan se piden con ``get_all``."""
+        unicas = list(dict.fromkeys((str(s), str(c)) for s, c in claves))
+        encontradas: dict[tuple[str, str], Plantilla] = {}
+        pendientes: list[tuple[str, str]] = []
+        with self._lock:
+            for clave in unicas:
+                entrada = self._plantillas.get(clave)
+                if entrada is not None and self._vigente(entrada[0]):
+                    encontradas[clave] = entrada[1]
+                else:
+                    pendientes.append(clave)
+        if pendientes:
+            encontradas.update(self._descargar(pendientes))
+        return encontradas
+
+    def plantilla(self, seccion: str, cultivo: str) -> Plantilla:
+        return self.plantillas([(seccion, cultivo)]).get((str(seccion), str(cultivo)))
+
+    def _descargar(self, claves: list[tuple[str, str]]) -> dict[tuple[str, str], Plantilla]:
+        refs = {clave: self.db.collection(clave[0]).document(clave[1]) for clave in claves}
+        por_ruta = {ref.path: clave for clave, ref in refs.items()}
+        descargadas: dict[tuple[str, str], Plantilla] = {clave: None for clave in claves}
+        lista = list(refs.values())
+        for inicio in range(0, len(lista), TAMANO_LOTE_GET_ALL):
+            for snap in self.db.get_all(lista[inicio : inicio + TAMANO_LOTE_GET_ALL]):
+                descargadas[por_ruta[snap.reference.path]] = (snap.to_dict() or {}) if snap.exists else None
+        ahora = self._reloj()
+        with self._lock:
+            for clave, datos in descargadas.items():
+                self._plantillas[clave] = (ahora, datos)
+        return descargadas
+
+    def invalidar(self, seccion: str | None = None, cultivo: str | None = None) -> None:
+        """Olvida todo, una sección entera o una plantilla concreta."""
+        with self._lock:
+            if seccion is None:
+                self._secciones = None
+                self._plantillas.clear()
+                return
+            for clave in [c for c in self._plantillas if c[0] == seccion and (cultivo is None or c[1] == cultivo)]:
+                del self._plantillas[clave]
+
+    # --- listeners ---
+
+    @property
+    def escuchando(self) -> bool:
+        return self._escuchando
+
+    def escuchar(self) -> "PlantillasCache":
+        """Mantiene la caché al día con ``on_snapshot`` sobre DATOS y cada sección.
+
+        Llamado de nuevo con la escucha activa, vuelve a armar las secciones que
+        hayan perdido su listener por un error.
+        """
+        with self._lock:
+            ya_activo = self._activo
+            self._activo = True
+            secciones = list(self._secciones[1]) if self._secciones is not None else None
+        if ya_activo:
+            if secciones is not None:
+                self._armar_secciones(secciones)
+            return self
+        self._watches[DOCUMENTO_SECCIONES] = (
+            self.db.collection(COLECCION_PLANTILLAS).document(DOCUMENTO_SECCIONES).on_snapshot(self._on_datos)
+        )
+        return self
+
+    def detener(self) -> None:
+        with self._lock:
+            self._activo = False
+            self._escuchando = False
+            watches, self._watches = self._watches, {}
+        for watch in watches.values():
+            _soltar(watch)
+
+    def _on_datos(self, docs: list[Any], _changes: Any, _read_time: Any) -> None:
+        if not self._activo:
+            return
+        datos = (docs[0].to_dict() or {}) if docs and docs[0].exists else {}
+        secciones = list(datos.get("CAMPO", []))
+        with self._lock:
+            self._secciones = (self._reloj(), secciones)
+            retiradas = [s for s in self._watches if s != DOCUMENTO_SECCIONES and s not in secciones]
+            watches = [self._watches.pop(seccion) for seccion in retiradas]
+        for seccion, watch in zip(retiradas, watches):
+            _soltar(watch)
+            self.invalidar(seccion)
+        self._armar_secciones(secciones)
+
+    def _armar_secciones(self, secciones: list[str]) -> None:
+        """Engancha las secciones sin listener; solo con todas armadas se deja de caducar."""
+        completas = True
+        for seccion in [s for s in secciones if s not in self._watches]:
+            try:
+                self._watches[seccion] = self.db.collection(seccion).on_snapshot(
+                    lambda d, c, t, seccion=seccion: self._on_seccion(seccion, c)
+                )
+            except Exception as e:  # noqa: BLE001 - se reintenta en el próximo snapshot de DATOS
+                print(f"⚠️ No se pudo escuchar la sección de plantillas {seccion}: {e}")
+                completas = False
+        with self._lock:
+            self._escuchando = self._activo and completas
+
+    def _on_seccion(self, seccion: str, changes: Iterable[Any]) -> None:
+        if not self._activo:
+            return
+        ahora = self._reloj()
+        try:
+            with self._lock:
+                for change in changes:
+                    tipo = getattr(change.type, "name", str(change.type))
+                    documento = change.document
+                    datos = None if tipo == "REMOVED" else (documento.to_dict() or {})
+                    self._plantillas[(seccion, documento.id)] = (ahora, datos)
+        except Exception as e:  # noqa: BLE001 - el hilo del SDK no debe morir aquí
+            print(f"⚠️ Error en el listener de plantillas {seccion}: {e}")
+            self._descartar_seccion(seccion)
+
+    def _descartar_seccion(self, seccion: str) -> None:
+        """Suelta el listener de una sección que falló: vuelve al TTL hasta rearmarla."""
+        with self._lock:
+            self._escuchando = False
+            watch = self._watches.pop(seccion, None)
+        self.invalidar(seccion)
+        if watch is not None:
+            _soltar(watch)
+
+
+def _soltar(watch: Any) -> None:
+    try:
+        watch.unsubscribe()
+    except Exception as e:  # noqa: BLE001 - el cierre no debe fallar
+        print(f"⚠️ Error cerrando listener de plantillas: {e}")
+
+
+_cache_global: PlantillasCache | None = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_plantillas(db: Any) -> PlantillasCache:
+    """Caché compartida por la pantalla principal y los generadores de informes.
+
+    Se comparte mientras se pida con el mismo cliente; otro ``db`` (p. ej. uno
+    inyectado en pruebas o por la CLI) estrena caché propia.
+    """
+    global _cache_global
+    with _cache_lock:
+        if _cache_global is None or _cache_global.db is not db:
+            _cache_global = PlantillasCache(db)
+        return _cache_global
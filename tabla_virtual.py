@@ -0,0 +1,294 @@
+"""Tabla virtualizada sobre ``ttk.Treeview`` para resultados grandes.
+
+Solo existen tantos items en el Treeview como filas caben en pantalla (más un
+pequeño margen); al desplazarse se reescriben sus valores a partir del DataFrame
+subyacente. La ordenación y la selección viven en el DataFrame/claves, no en los
+items, así que el coste de repintar no depende del número total de filas.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Iterable
+
+import tkinter as tk
+from tkinter import ttk
+
+FILAS_MARGEN = 2
+PASO_RUEDA = 3
+# Shift y Control: con ellos el clic o la flecha amplían la selección en vez de sustituirla.
+MODIFICADORES_SELECCION = 0x0001 | 0x0004
+
+
+class TablaVirtual(ttk.Frame):
+    """Treeview paginado que muestra un DataFrame de cualquier tamaño."""
+
+    def __init__(
+        self,
+        master: tk.Misc,
+        columnas: list[str],
+        clave: str,
+        ancho_columna: int = 160,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(master, **kwargs)
+        self.columnas = list(columnas)
+        self.clave = clave
+        self._df: Any = None
+        self._total = 0
+        self._inicio = 0
+        self._visibles = 1
+        self._seleccion: set[Any] = set()
+        self._items: list[str] = []
+        self._clave_por_item: dict[str, Any] = {}
+        self._orden_columna: str | None = None
+        self._orden_descendente = False
+        self._pintando = False
+        # ``True``/``False`` según el último clic o tecla del usuario; ``None`` si la
+        # selección la cambia el propio código.
+        self._seleccion_ampliada: bool | None = None
+
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self, columns=self.columnas, show="headings", selectmode="extended")
+        for col in self.columnas:
+            self.tree.heading(col, text=col, command=lambda c=col: self.ordenar(c))
+            self.tree.column(col, width=ancho_columna)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        self.scroll_y = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scroll_y.grid(row=0, column=1, sticky="ns")
+        scroll_x = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        scroll_x.grid(row=1, column=0, sticky="ew")
+        self.tree.configure(xscrollcommand=scroll_x.set)
+
+        self.tree.bind("<Configure>", lambda _e: self._recalcular_visibles())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<ButtonPress-1>", self._registrar_modificadores)
+        self.tree.bind("<KeyPress>", self._registrar_modificadores)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda _e: self.desplazar(-PASO_RUEDA))
+        self.tree.bind("<Button-5>", lambda _e: self.desplazar(PASO_RUEDA))
+        self.tree.bind("<Up>", self._on_tecla_arriba)
+        self.tree.bind("<Down>", self._on_tecla_abajo)
+        self.tree.bind("<Prior>", lambda _e: self._desplazar_y_cortar(-self._visibles))
+        self.tree.bind("<Next>", lambda _e: self._desplazar_y_cortar(self._visibles))
+
+    # --- Datos ---
+    @property
+    def datos(self) -> Any:
+        """DataFrame mostrado, en el orden actual de la tabla."""
+        return self._df
+
+    def __len__(self) -> int:
+        return self._total
+
+    def cargar(self, df: Any, conservar_seleccion: bool = False, conservar_posicion: bool = False) -> None:
+        """Sustituye los datos mostrados. No crea un item por fila."""
+        self._df = df.reset_index(drop=True) if df is not None else None
+        self._total = 0 if self._df is None else len(self._df)
+        if not conservar_seleccion:
+            self._seleccion.clear()
+        elif self._total and self.clave in self._df.columns:
+            self._seleccion &= set(self._df[self.clave].tolist())
+        if self._orden_columna is not None and self._total:
+            self._aplicar_orden()
+        self._inicio = min(self._inicio, self._max_inicio()) if conservar_posicion else 0
+        self._pintar()
+
+    def ordenar(self, columna: str) -> None:
+        """Ordena sobre el DataFrame; un segundo clic en la misma columna invierte el orden."""
+        if self._orden_columna == columna:
+            self._orden_descendente = not self._orden_descendente
+        else:
+            self._orden_columna = columna
+            self._orden_descendente = False
+        for col in self.columnas:
+            flecha = ""
+            if col == self._orden_columna:
+                flecha = " ▼" if self._orden_descendente else " ▲"
+            self.tree.heading(col, text=f"{col}{flecha}")
+        if self._total:
+            self._aplicar_orden()
+            self._pintar()
+
+    def _aplicar_orden(self) -> None:
+        columna = self._orden_columna
+        if columna not in self._df.columns:
+            return
+        ascendente = not self._orden_descendente
+        try:
+            ordenado = self._df.sort_values(columna, ascending=ascendente, kind="mergesort", na_position="last")
+        except TypeError:
+            # Columnas con tipos mezclados: se ordena por su representación textual.
+            ordenado = self._df.sort_values(
+                columna,
+                ascending=ascendente,
+                kind="mergesort",
+                na_position="last",
+                key=lambda serie: serie.astype(str),
+            )
+        self._df = ordenado.reset_index(drop=True)
+
+    def eliminar_claves(self, claves: Iterable[Any]) -> None:
+        """Quita filas por clave sin recargar el resto."""
+        claves_set = set(claves)
+        if not claves_set or not self._total:
+            return
+        self._df = self._df[~self._df[self.clave].isin(claves_set)].reset_index(drop=True)
+        self._total = len(self._df)
+        self._seleccion -= claves_set
+        self._inicio = min(self._inicio, self._max_inicio())
+        self._pintar()
+
+    # --- Selección ---
+    def claves_seleccionadas(self) -> list[Any]:
+        """Claves seleccionadas en el orden en que aparecen en la tabla."""
+        if not self._seleccion or not self._total:
+            return []
+        mascara = self._df[self.clave].isin(self._seleccion)
+        return self._df.loc[mascara, self.clave].tolist()
+
+    def registros_seleccionados(self) -> Any:
+        if not self._total:
+            return self._df
+        return self._df[self._df[self.clave].isin(self._seleccion)]
+
+    def seleccionar_todo(self) -> None:
+        if self._total:
+            self._seleccion = set(self._df[self.clave].tolist())
+        self._pintar()
+
+    def limpiar_seleccion(self) -> None:
+        self._seleccion.clear()
+        self._pintar()
+
+    def _registrar_modificadores(self, event: tk.Event) -> None:
+        self._seleccion_ampliada = bool(int(event.state) & MODIFICADORES_SELECCION)
+
+    def _on_select(self, _event: tk.Event | None = None) -> None:
+        if self._pintando:
+            return
+        ampliada, self._seleccion_ampliada = self._seleccion_ampliada, None
+        if ampliada is False:
+            # Clic o flecha sin modificador: la selección es solo lo que se ve marcado,
+            # también fuera de la ventana visible.
+            self._seleccion.clear()
+        seleccion_visible = set(self.tree.selection())
+        for item, clave in self._clave_por_item.items():
+            if item in seleccion_visible:
+                self._seleccion.add(clave)
+            else:
+                self._seleccion.discard(clave)
+
+    # --- Desplazamiento ---
+    def _max_inicio(self) -> int:
+        return max(self._total - self._visibles, 0)
+
+    def desplazar(self, filas: int) -> None:
+        nuevo = min(max(self._inicio + int(filas), 0), self._max_inicio())
+        if nuevo != self._inicio:
+            self._inicio = nuevo
+            self._pintar()
+
+    def _desplazar_y_cortar(self, filas: int) -> str:
+        self.desplazar(filas)
+        return "break"
+
+    def _on_scrollbar(self, accion: str, valor: str, unidad: str | None = None) -> None:
+        if accion == "moveto":
+            self._inicio = min(max(int(float(valor) * self._total), 0), self._max_inicio())
+            self._pintar()
+        elif accion == "scroll":
+            paso = int(valor) * (self._visibles if unidad == "pages" else 1)
+            self.desplazar(paso)
+
+    def _on_mousewheel(self, event: tk.Event) -> str:
+        self.desplazar(-PASO_RUEDA if event.delta > 0 else PASO_RUEDA)
+        return "break"
+
+    def _on_tecla_arriba(self, event: tk.Event) -> str | None:
+        foco = self.tree.focus()
+        if self._items and foco == self._items[0] and self._inicio > 0:
+            self.desplazar(-1)
+            return "break"
+        self._registrar_modificadores(event)
+        return None
+
+    def _on_tecla_abajo(self, event: tk.Event) -> str | None:
+        foco = self.tree.focus()
+        ultimo_visible = min(self._visibles, len(self._items)) - 1
+        if self._items and ultimo_visible >= 0 and foco == self._items[ultimo_visible] and self._inicio < self._max_inicio():
+            self.desplazar(1)
+            return "break"
+        self._registrar_modificadores(event)
+        return None
+
+    def _altura_fila(self) -> int:
+        style = ttk.Style(self)
+        try:
+            altura = int(style.lookup("Treeview", "rowheight") or 0)
+        except (tk.TclError, ValueError):
+            altura = 0
+        return altura or 20
+
+    def _recalcular_visibles(self) -> None:
+        alto = self.tree.winfo_height()
+        # Se descuenta la fila de cabecera.
+        visibles = max(int(math.floor(alto / self._altura_fila())) - 1, 1)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._inicio = min(self._inicio, self._max_inicio())
+            self._pintar()
+
+    # --- Pintado ---
+    @staticmethod
+    def _texto(valor: Any) -> Any:
+        if valor is None:
+            return ""
+        if isinstance(valor, float) and math.isnan(valor):
+            return ""
+        try:
+            if valor != valor:  # NaT/NA de pandas
+                return ""
+        except (TypeError, ValueError):
+            pass
+        return valor
+
+    def _pintar(self) -> None:
+        self._pintando = True
+        try:
+            fin = min(self._inicio + self._visibles + FILAS_MARGEN, self._total)
+            necesarios = max(fin - self._inicio, 0)
+            while len(self._items) < necesarios:
+                self._items.append(self.tree.insert("", "end", values=[""] * len(self.columnas)))
+            while len(self._items) > necesarios:
+                self.tree.delete(self._items.pop())
+
+            self._clave_por_item = {}
+            seleccionar: list[str] = []
+            if necesarios:
+                ventana = self._df.iloc[self._inicio : fin]
+                cols_presentes = [c for c in self.columnas if c in ventana.columns]
+                claves = ventana[self.clave].tolist() if self.clave in ventana.columns else [None] * necesarios
+                valores_cols = {c: ventana[c].tolist() for c in cols_presentes}
+                for pos, item in enumerate(self._items):
+                    valores = [self._texto(valores_cols[c][pos]) if c in valores_cols else "" for c in self.columnas]
+                    self.tree.item(item, values=valores)
+                    clave = claves[pos]
+                    self._clave_por_item[item] = clave
+                    if clave in self._seleccion:
+                        seleccionar.append(item)
+            self.tree.selection_set(seleccionar)
+
+            if self._total:
+                primero = self._inicio / self._total
+                ultimo = min((self._inicio + self._visibles) / self._total, 1.0)
+            else:
+                primero, ultimo = 0.0, 1.0
+            self.scroll_y.set(primero, ultimo)
+        finally:
+            self.after_idle(self._fin_pintado)
+
+    def _fin_pintado(self) -> None:
+        self._pintando = False
@@ -0,0 +1,24 @@
+"""Pruebas de rendimiento opcionales: los umbrales de tiempo solo se exigen con ``HARVESTSYNC_BENCHMARK=1``."""
+
+from __future__ import annotations
+
+import os
+import time
+import unittest
+from typing import Any, Callable
+
+BENCHMARK_ENV = "HARVESTSYNC_BENCHMARK"
+
+requiere_benchmark = unittest.skipUnless(
+    os.environ.get(BENCHMARK_ENV) == "1", f"medición de tiempos desactivada (activar con {BENCHMARK_ENV}=1)"
+)
+
+
+def mejor_tiempo(funcion: Callable[[], Any], repeticiones: int = 3) -> tuple[float, Any]:
+    """Mejor de ``repeticiones`` ejecuciones de ``funcion`` y su último resultado."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
@@ -0,0 +1,131 @@
+"""Sustituto mínimo en memoria de ``firestore.Client`` para los tests."""
+from __future__ import annotations
+
+import copy
+import threading
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+_OPERADORES = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentRef", data: dict[str, Any] | None, update_time: datetime | None) -> None:
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeDocumentRef:
+    def __init__(self, client: "FakeFirestore", collection: str, doc_id: str) -> None:
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self) -> FakeSnapshot:
+        self._client.lecturas += 1
+        data, update_time = self._client._store.get(self.collection_name, {}).get(self.id, (None, None))
+        return FakeSnapshot(self, data, update_time)
+
+    def set(self, data: dict[str, Any]) -> None:
+        self._client.set(self.collection_name, self.id, data)
+
+    def delete(self) -> None:
+        self._client._store.get(self.collection_name, {}).pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeFirestore", collection: str, filters: list[tuple[str, str, Any]] | None = None, order: str | None = None) -> None:
+        self._client = client
+        self._collection = collection
+        self._filters = list(filters or [])
+        self._order = order
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return FakeQuery(self._client, self._collection, self._filters + [(field, op, value)], self._order)
+
+    def order_by(self, field: str) -> "FakeQuery":
+        return FakeQuery(self._client, self._collection, self._filters, field)
+
+    def stream(self) -> Iterable[FakeSnapshot]:
+        docs = self._client._store.get(self._collection, {})
+        resultados = []
+        for doc_id, (data, update_time) in docs.items():
+            if all(field in data and _OPERADORES[op](data.get(field), value) for field, op, value in self._filters):
+                resultados.append(FakeSnapshot(FakeDocumentRef(self._client, self._collection, doc_id), data, update_time))
+        if self._order:
+            resultados = [snap for snap in resultados if self._order in snap._data]
+            resultados.sort(key=lambda snap: snap._data[self._order])
+        self._client.lecturas += len(resultados)
+        return iter(resultados)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client: "FakeFirestore", name: str) -> None:
+        super().__init__(client, name)
+
+    def document(self, doc_id: str) -> FakeDocumentRef:
+        return FakeDocumentRef(self._client, self._collection, str(doc_id))
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestore") -> None:
+        self._client = client
+        self._borrados: list[FakeDocumentRef] = []
+
+    def delete(self, reference: FakeDocumentRef) -> None:
+        self._borrados.append(reference)
+
+    def commit(self) -> None:
+        if len(self._borrados) > 500:
+            raise ValueError("Un WriteBatch admite como máximo 500 operaciones")
+        with self._client._lock:
+            self._client.commits += 1
+            if self._client.fallos_commit > 0:
+                self._client.fallos_commit -= 1
+                raise RuntimeError("commit rechazado")
+        for reference in self._borrados:
+            reference.delete()
+
+
+class FakeFirestore:
+    """Guarda documentos por colección y cuenta las lecturas realizadas."""
+
+    def __init__(self) -> None:
+        self._store: dict[str, dict[str, tuple[dict[str, Any], datetime]]] = {}
+        self._lock = threading.Lock()
+        self.lecturas = 0
+        self.llamadas_get_all = 0
+        self.commits = 0
+        # Número de commits que fallarán antes de empezar a aceptarse.
+        self.fallos_commit = 0
+
+    def set(self, collection: str, doc_id: str, data: dict[str, Any]) -> None:
+        self._store.setdefault(collection, {})[str(doc_id)] = (copy.deepcopy(data), datetime.now(timezone.utc))
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def get_all(self, refs: Iterable[FakeDocumentRef]) -> Iterable[FakeSnapshot]:
+        self.llamadas_get_all += 1
+        return [ref.get() for ref in refs]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from aforo import calcular_aforo, exportar_aforo, tabla_eepp
+from tests.benchmark import mejor_tiempo, requiere_benchmark
+
+
+def _campana(n: int = 20_000) -> tuple[pd.DataFrame, pd.DataFrame]:
+    muestras = pd.DataFrame(
+        {
+            "Boleta": [str(i % 5000) for i in range(n)],
+            "FechaHora": pd.date_range("2024-01-01", periods=n, freq="min", tz="UTC"),
+            "Aforo (Kg/árbol)": [f"{i % 40},5" for i in range(n)],
+        }
+    )
+    return muestras, tabla_eepp({str(i): {"Arbol": str(100 + i)} for i in range(5000)})
+
+
+class TestAforo(unittest.TestCase):
+    def test_ultima_muestra_por_boleta_y_reglas_de_parseo(self) -> None:
+        muestras = pd.DataFrame(
+            {
+                "Boleta": ["100", "100", "200", "300", "400", "500"],
+                "FechaHora": pd.to_datetime(
+                    ["2024-01-01", "2024-02-01", "2024-01-05", "2024-01-06", "2024-01-07", "2024-01-08"], utc=True
+                ),
+                "Aforo (Kg/árbol)": ["10", " 12,5 ", "-3", "abc", "20", "7"],
+            }
+        )
+        eepp = tabla_eepp(
+            {
+                "100": {"Arbol": "100"},
+                "200": {"Arbol": 50},
+                "300": {"Arbol": "40,0"},
+                "400": {"Arbol": "0"},
+                "500": None,
+            }
+        )
+
+        resultado = calcular_aforo(muestras, eepp)
+
+        filas = {boleta: tuple(resto) for boleta, *resto in resultado.itertuples(index=False, name=None)}
+        self.assertEqual(filas, {"100": (12.5, 100.0, 1250.0), "200": (0.0, 50.0, 0.0), "300": (0.0, 40.0, 0.0)})
+        self.assertEqual(list(resultado.columns), ["Boleta", "Kg/Árbol", "Árboles", "Total Kg"])
+
+    def test_campana_completa_y_exportacion_csv(self) -> None:
+        resultado = calcular_aforo(*_campana())
+        self.assertEqual(len(resultado), 5000)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = exportar_aforo(resultado, Path(tmp) / "aforo.csv")
+            leido = pd.read_csv(ruta, sep=";", decimal=",", dtype={"Boleta": str}, encoding="utf-8-sig")
+        pd.testing.assert_series_equal(leido["Total Kg"], resultado["Total Kg"])
+
+    @requiere_benchmark
+    def test_campana_completa_en_menos_de_un_segundo(self) -> None:
+        muestras, eepp = _campana()
+        duracion, _ = mejor_tiempo(lambda: calcular_aforo(muestras, eepp))
+        self.assertLess(duracion, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
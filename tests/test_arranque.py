@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import importlib
+import sys
+import unittest
+from unittest import mock
+
+import firebase_utils
+from arranque import MEDIR_ARRANQUE_ENV, MedidorArranque, ModuloPerezoso
+
+
+class TestArranque(unittest.TestCase):
+    def test_modulo_perezoso_importa_en_el_primer_acceso(self) -> None:
+        sys.modules.pop("colorsys", None)
+        colorsys = ModuloPerezoso("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn("colorsys", sys.modules)
+
+    def test_medicion_por_opcion_o_entorno(self) -> None:
+        with mock.patch.dict("os.environ", {}, clear=True):
+            self.assertFalse(MedidorArranque.desde_entorno([]).activo)
+            medidor = MedidorArranque.desde_entorno(["HarvestSync_Desk.py", "--medir-arranque"])
+            self.assertTrue(medidor.activo and medidor.salir_al_terminar)
+        with mock.patch.dict("os.environ", {MEDIR_ARRANQUE_ENV: "1"}):
+            medidor = MedidorArranque.desde_entorno([])
+            self.assertTrue(medidor.activo)
+            self.assertFalse(medidor.salir_al_terminar)
+
+    def test_generadores_no_inicializan_firebase_al_importarse(self) -> None:
+        modulos = ("informe_generator", "informe_generator_general", "informe_generator_comercial")
+        # Los módulos reimportados guardan el obtener_db simulado: se restauran los originales.
+        originales = {modulo: sys.modules.get(modulo) for modulo in modulos}
+        for modulo, original in originales.items():
+            if original is None:
+                self.addCleanup(sys.modules.pop, modulo, None)
+            else:
+                self.addCleanup(sys.modules.__setitem__, modulo, original)
+        with mock.patch.object(firebase_utils, "obtener_db", side_effect=AssertionError("Firebase en import")):
+            for modulo in modulos:
+                sys.modules.pop(modulo, None)
+                importlib.import_module(modulo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import unittest
+
+from borrado_muestras import agrupar_en_lotes, borrar_muestras, encadenar_lotes
+from tests.fake_firestore import FakeFirestore
+
+
+class TestBorradoMuestras(unittest.TestCase):
+    def setUp(self) -> None:
+        self.db = FakeFirestore()
+        for idx in range(1200):
+            self.db.set("Muestras", f"M{idx}", {"Boleta": str(idx)})
+        for idx in range(40):
+            for foto in range(3):
+                self.db.set("Fotos", f"F{idx}_{foto}", {"idMuestra": f"M{idx}"})
+        self.db.set("Fotos", "OTRA", {"idMuestra": "M9999"})
+
+    def test_borra_en_lotes_con_fotos_en_cascada(self) -> None:
+        ids = [f"M{idx}" for idx in range(1100)]
+        avances: list[tuple[int, int]] = []
+
+        resultado = borrar_muestras(self.db, ids, incluir_fotos=True, progreso=lambda h, t: avances.append((h, t)))
+
+        self.assertEqual(len(resultado.eliminadas), 1100)
+        self.assertEqual(resultado.fotos_eliminadas, 120)
+        self.assertEqual(resultado.fallidas, {})
+        # 1100 muestras + 120 fotos = 1220 operaciones -> 3 lotes de <= 500.
+        self.assertEqual(self.db.commits, 3)
+        self.assertEqual(avances[-1], (1100, 1100))
+        self.assertEqual(sorted(self.db._store["Muestras"]), sorted(f"M{idx}" for idx in range(1100, 1200)))
+        self.assertEqual(list(self.db._store["Fotos"]), ["OTRA"])
+
+    def test_reintenta_y_resume_lo_que_no_se_pudo_borrar(self) -> None:
+        esperas: list[float] = []
+        self.db.fallos_commit = 2
+        resultado = borrar_muestras(self.db, ["M1", "M2"], hilos=1, reintentos=3, dormir=esperas.append)
+        self.assertEqual(resultado.eliminadas, ["M1", "M2"])
+        self.assertEqual(esperas, [0.5, 1.0])
+
+        self.db.fallos_commit = 10
+        resultado = borrar_muestras(self.db, ["M3"], hilos=1, reintentos=1, dormir=esperas.append)
+        self.assertEqual(resultado.eliminadas, [])
+        self.assertIn("M3", resultado.fallidas)
+        self.assertIn("M3", self.db._store["Muestras"])
+        self.assertIn("Muestras no eliminadas: 1", resultado.resumen())
+
+    def test_muestra_con_mas_referencias_que_el_limite_ocupa_lotes_propios(self) -> None:
+        lotes = agrupar_en_lotes([("A", list(range(3))), ("B", list(range(7))), ("C", [1])], limite=4)
+        self.assertEqual([(l.muestras, len(l.referencias)) for l in lotes], [(["A"], 3), (["B"], 4), (["B"], 3), (["C"], 1)])
+        self.assertEqual([len(cadena) for cadena in encadenar_lotes(lotes)], [1, 2, 1])
+
+    def test_muestra_partida_se_confirma_en_orden_y_conserva_el_documento_si_falla(self) -> None:
+        for foto in range(600):
+            self.db.set("Fotos", f"G{foto}", {"idMuestra": "M500"})
+        self.db.fallos_commit = 1
+
+        resultado = borrar_muestras(self.db, ["M500"], incluir_fotos=True, reintentos=0)
+
+        # Falla la primera parte y no se intenta la segunda, que lleva el documento.
+        self.assertEqual(self.db.commits, 1)
+        self.assertIn("M500", resultado.fallidas)
+        self.assertIn("M500", self.db._store["Muestras"])
+
+        resultado = borrar_muestras(self.db, ["M500"], incluir_fotos=True, reintentos=0)
+        self.assertEqual(resultado.eliminadas, ["M500"])
+        self.assertEqual(resultado.fotos_eliminadas, 600)
+        self.assertNotIn("M500", self.db._store["Muestras"])
+
+
+if __name__ == "__main__":
+    unittest.main()
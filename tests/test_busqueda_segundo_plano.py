@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import threading
+import unittest
+
+from busqueda_segundo_plano import BusquedaEnSegundoPlano
+
+
+class TestBusquedaEnSegundoPlano(unittest.TestCase):
+    def test_entrega_paginas_y_fin_con_el_total_leido(self) -> None:
+        paginas: list[list[dict]] = []
+        progreso: list[int] = []
+        fin: list[int] = []
+
+        def fuente(_cancelado):
+            for idx in range(1050):
+                yield {"IdMuestra": str(idx)}
+
+        busqueda = BusquedaEnSegundoPlano(
+            fuente,
+            planificar=lambda f: f(),
+            al_pagina=lambda registros, leidos: (paginas.append(registros), progreso.append(leidos)),
+            al_terminar=fin.append,
+            pagina_minima=500,
+            intervalo_entrega_s=0,
+        ).iniciar()
+        busqueda.esperar(5)
+
+        self.assertEqual([len(p) for p in paginas], [500, 500, 50])
+        self.assertEqual(progreso, [500, 1000, 1050])
+        self.assertEqual(fin, [1050])
+
+    def test_cancelar_detiene_la_lectura_y_descarta_entregas_pendientes(self) -> None:
+        primera_pagina = threading.Event()
+        continuar = threading.Event()
+        encoladas: list = []
+        leidos_fuente: list[int] = []
+
+        def fuente(cancelado):
+            for idx in range(10_000):
+                if idx == 10:
+                    primera_pagina.set()
+                    continuar.wait(5)
+                leidos_fuente.append(idx)
+                yield {"IdMuestra": str(idx)}
+
+        entregadas: list[int] = []
+        busqueda = BusquedaEnSegundoPlano(
+            fuente,
+            planificar=encoladas.append,
+            al_pagina=lambda registros, leidos: entregadas.append(leidos),
+            al_terminar=lambda leidos: entregadas.append(-1),
+            pagina_minima=5,
+            intervalo_entrega_s=0,
+        ).iniciar()
+        self.assertTrue(primera_pagina.wait(5))
+        busqueda.cancelar()
+        continuar.set()
+        busqueda.esperar(5)
+
+        # El hilo para en cuanto ve la bandera y lo ya encolado no llega a la UI.
+        self.assertLess(len(leidos_fuente), 20)
+        for entrega in encoladas:
+            entrega()
+        self.assertEqual(entregadas, [])
+
+    def test_error_de_la_fuente_se_notifica(self) -> None:
+        errores: list[Exception] = []
+
+        def fuente(_cancelado):
+            yield {"IdMuestra": "1"}
+            raise RuntimeError("sin conexión")
+
+        busqueda = BusquedaEnSegundoPlano(
+            fuente,
+            planificar=lambda f: f(),
+            al_pagina=lambda registros, leidos: None,
+            al_terminar=lambda leidos: self.fail("no debe terminar"),
+            al_error=errores.append,
+        ).iniciar()
+        busqueda.esperar(5)
+        self.assertEqual([str(e) for e in errores], ["sin conexión"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest import mock
+
+from cache_imagenes import CacheImagenes, ErrorDescargaImagen, RespuestaHTTP, clave_desde_url, descargador_urllib
+
+
+class _ServidorFalso:
+    def __init__(self) -> None:
+        self.fotos = {"/fotos/lote1/a.jpg": b"A" * 100, "/fotos/lote1/b.jpg": b"B" * 100, "/fotos/lote2/a_copia.jpg": b"A" * 100}
+        self.peticiones: list[tuple[str, dict]] = []
+
+    def __call__(self, url: str, cabeceras: dict) -> RespuestaHTTP:
+        self.peticiones.append((url, dict(cabeceras)))
+        ruta = url.split("://", 1)[1].split("/", 1)[1]
+        contenido = self.fotos.get("/" + ruta)
+        if contenido is None:
+            return RespuestaHTTP(status=404)
+        etag = f'"{len(contenido)}-{contenido[:1].decode()}"'
+        if cabeceras.get("If-None-Match") == etag:
+            return RespuestaHTTP(status=304, etag=etag)
+        return RespuestaHTTP(status=200, contenido=contenido, etag=etag)
+
+
+class _ManejadorFotos(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path != "/fotos/a.jpg":
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", "3")
+        self.end_headers()
+        self.wfile.write(b"JPG")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class TestCacheImagenes(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.ahora = 1000.0
+        self.servidor = _ServidorFalso()
+
+    def _cache(self, **kwargs) -> CacheImagenes:
+        return CacheImagenes(self._tmp.name, reloj=lambda: self.ahora, **kwargs)
+
+    def test_clave_es_la_ruta_local_independiente_del_servidor(self) -> None:
+        self.assertEqual(clave_desde_url("http://10.0.0.1:8080/fotos/lote1/a%20b.jpg"), "lote1/a b.jpg")
+        cache = self._cache()
+        cache.obtener("http://viejo/fotos/lote1/a.jpg", self.servidor)
+        self.assertEqual(cache.obtener("http://nuevo/fotos/lote1/a.jpg", self.servidor), b"A" * 100)
+        self.assertEqual(len(self.servidor.peticiones), 1)
+
+    def test_revalida_con_peticion_condicional_tras_la_frescura(self) -> None:
+        cache = self._cache(frescura_s=60)
+        url = "http://srv/fotos/lote1/a.jpg"
+        cache.obtener(url, self.servidor)
+        self.ahora += 30
+        cache.obtener(url, self.servidor)
+        self.assertEqual(len(self.servidor.peticiones), 1)
+
+        self.ahora += 60
+        self.assertEqual(cache.obtener(url, self.servidor), b"A" * 100)
+        self.assertEqual(self.servidor.peticiones[-1][1], {"If-None-Match": '"100-A"'})
+        self.assertEqual((cache.descargas_completas, cache.revalidaciones), (1, 1))
+
+        # Sin red se sirve la copia local aunque haya caducado.
+        self.ahora += 120
+        def sin_red(_url, _cabeceras):
+            raise OSError("sin red")
+        self.assertEqual(cache.obtener(url, sin_red), b"A" * 100)
+
+    def test_contenido_compartido_y_expulsion_lru(self) -> None:
+        cache = self._cache(tamano_maximo=250)
+        ruta_a = cache.obtener_ruta("http://srv/fotos/lote1/a.jpg", self.servidor)
+        ruta_copia = cache.obtener_ruta("http://srv/fotos/lote2/a_copia.jpg", self.servidor)
+        self.assertEqual(ruta_a, ruta_copia)
+        self.assertEqual(cache.tamano_total(), 100)
+
+        self.ahora += 1
+        cache.obtener("http://srv/fotos/lote1/b.jpg", self.servidor)
+        self.ahora += 1
+        cache.obtener("http://srv/fotos/lote1/a.jpg", self.servidor)
+        # Un tercer blob supera el límite: sale el menos usado (b.jpg).
+        self.servidor.fotos["/fotos/lote3/c.jpg"] = b"C" * 100
+        self.ahora += 1
+        cache.obtener("http://srv/fotos/lote3/c.jpg", self.servidor)
+        self.assertLessEqual(cache.tamano_total(), 250)
+        self.assertTrue(ruta_a.exists())
+        peticiones = len(self.servidor.peticiones)
+        cache.obtener("http://srv/fotos/lote1/b.jpg", self.servidor)
+        self.assertEqual(len(self.servidor.peticiones), peticiones + 1)
+
+    def test_fuera_del_servidor_de_fotos_la_clave_incluye_el_host(self) -> None:
+        self.assertEqual(clave_desde_url("http://a.local/img/x.jpg"), "a.local/img/x.jpg")
+        self.assertNotEqual(clave_desde_url("http://a.local/img/x.jpg"), clave_desde_url("http://b.local/img/x.jpg"))
+        self.assertNotEqual(clave_desde_url("http://a.local/img?id=1"), clave_desde_url("http://a.local/img?id=2"))
+
+    def test_expulsion_respeta_blobs_en_lectura(self) -> None:
+        cache = self._cache(tamano_maximo=150)
+        ruta_a = cache.obtener_ruta("http://srv/fotos/lote1/a.jpg", self.servidor)
+        self.ahora += 1
+        with cache._usando(ruta_a):
+            cache.obtener("http://srv/fotos/lote1/b.jpg", self.servidor)
+        self.assertTrue(ruta_a.exists())
+
+    def test_blob_expulsado_en_plena_lectura_se_vuelve_a_descargar(self) -> None:
+        cache = self._cache()
+        url = "http://srv/fotos/lote1/a.jpg"
+        ruta = cache.obtener_ruta(url, self.servidor)
+        leer = Path.read_bytes
+        expulsiones: list[Path] = []
+
+        def expulsado_por_otro_proceso(self_ruta: Path) -> bytes:
+            if self_ruta == ruta and not expulsiones:
+                expulsiones.append(self_ruta)
+                self_ruta.unlink()
+                raise FileNotFoundError(str(self_ruta))
+            return leer(self_ruta)
+
+        with mock.patch.object(Path, "read_bytes", expulsado_por_otro_proceso):
+            self.assertEqual(cache.obtener(url, self.servidor), b"A" * 100)
+        self.assertEqual(cache.descargas_completas, 2)
+
+    def test_inexistente_lanza_error(self) -> None:
+        with self.assertRaises(ErrorDescargaImagen) as ctx:
+            self._cache().obtener("http://srv/fotos/no/existe.jpg", self.servidor)
+        self.assertEqual(ctx.exception.status, 404)
+
+    def test_transporte_urllib_del_servicio_interno(self) -> None:
+        servidor = HTTPServer(("127.0.0.1", 0), _ManejadorFotos)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        base = f"http://127.0.0.1:{servidor.server_port}/fotos"
+        cache = self._cache(frescura_s=0)
+        descargar = descargador_urllib(5)
+
+        self.assertEqual(cache.obtener(f"{base}/a.jpg", descargar), b"JPG")
+        self.assertEqual(cache.obtener(f"{base}/a.jpg", descargar), b"JPG")
+        self.assertEqual((cache.descargas_completas, cache.revalidaciones), (1, 1))
+        with self.assertRaises(urllib.error.HTTPError):
+            cache.obtener(f"{base}/otra.jpg", descargar)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import unittest
+from unittest import mock
 
 try:
     import cv2
@@ -9,7 +10,9 @@ except Exception:  # pragma: no cover
     cv2 = None
     np = None
 
-from calibres_vision import CirclePatternDetector, FruitCaliberAnalyzer, medir_frutos_con_escala
+import calibres_vision
+from calibres_vision import CirclePatternDetector, DecodedFrame, FruitCaliberAnalyzer, jpeg_dimensions, medir_frutos_con_escala
+from tests.benchmark import mejor_tiempo, requiere_benchmark
 
 
 @unittest.skipIf(cv2 is None or np is None, "OpenCV/numpy no disponibles en este entorno")
@@ -125,6 +128,122 @@ class TestCalibresVision(unittest.TestCase):
         self.assertTrue(all(item.diameter_mm > 70 for item in mediciones))
         self.assertTrue(all(item.calibre_estimado in {"CAL 0", "CAL 3"} for item in mediciones))
 
+    def test_foto_decodificada_una_vez_para_todas_las_etapas(self) -> None:
+        frame = np.zeros((1800, 1800, 3), dtype=np.uint8)
+        cv2.circle(frame, (900, 900), 300, (255, 255, 255), thickness=20)
+        for cx, cy in ((400, 400), (1400, 400), (400, 1400)):
+            cv2.circle(frame, (cx, cy), 160, (0, 140, 255), thickness=-1)
+        raw = self._encode_png(frame)
+        detector = CirclePatternDetector(diametro_real_mm=94.0)
+        analyzer = FruitCaliberAnalyzer()
+        esperado = (detector.detect_from_bytes("f", raw), analyzer.analyze_photo("f", raw, 0.3, []))
+
+        foto = DecodedFrame(raw)
+        with mock.patch.object(calibres_vision.cv2, "imdecode", wraps=cv2.imdecode) as imdecode:
+            patron = detector.detect_from_bytes("f", foto)
+            self.assertIsNotNone(detector.build_overlay_bytes(foto, patron))
+            foto.release_full_resolution(analyzer.max_detection_size)
+            frutos = analyzer.analyze_photo("f", foto, 0.3, [])
+            self.assertIsNotNone(analyzer.build_overlay_bytes(foto, frutos))
+            mediciones = medir_frutos_con_escala(foto, 0.3, [])
+        self.assertEqual(imdecode.call_count, 1)
+        self.assertEqual(patron.to_dict(), esperado[0].to_dict())
+        self.assertEqual(frutos.caliber_count, esperado[1].caliber_count)
+        self.assertEqual([f.diameter_mm for f in frutos.fruits], [f.diameter_mm for f in esperado[1].fruits])
+        self.assertEqual(len(mediciones), len([f for f in frutos.fruits if f.valid]))
+
+    def test_jpeg_grande_se_decodifica_reducido_salvo_overlay_nativo(self) -> None:
+        frame = np.zeros((1800, 2600, 3), dtype=np.uint8)
+        cv2.circle(frame, (1300, 900), 300, (255, 255, 255), thickness=20)
+        ok, buf = cv2.imencode(".jpg", frame)
+        self.assertTrue(ok)
+        raw = buf.tobytes()
+        self.assertEqual(jpeg_dimensions(raw), (2600, 1800))
+        self.assertIsNone(jpeg_dimensions(self._encode_png(frame)))
+
+        foto = DecodedFrame(raw)
+        detector = CirclePatternDetector(diametro_real_mm=94.0, max_detection_size=1200)
+        with mock.patch.object(calibres_vision.cv2, "imdecode", wraps=cv2.imdecode) as imdecode:
+            result = detector.detect_from_bytes("f", foto)
+            self.assertEqual([c.args[1] for c in imdecode.call_args_list], [cv2.IMREAD_REDUCED_COLOR_2])
+            self.assertEqual(foto.shape[:2], (1800, 2600))
+            self.assertEqual(foto.scaled(1200)[0].shape[:2], (831, 1200))
+            detector.build_overlay_bytes(foto, result)
+            self.assertEqual(imdecode.call_args_list[-1].args[1], cv2.IMREAD_COLOR)
+        completa = detector.detect_from_bytes("f", DecodedFrame(image=cv2.imdecode(buf, cv2.IMREAD_COLOR)))
+        self.assertTrue(result.detected)
+        self.assertAlmostEqual(result.diameter_px, completa.diameter_px, delta=1.0)
+
+    def test_jpeg_truncado_no_es_valido(self) -> None:
+        frame = np.zeros((1800, 2600, 3), dtype=np.uint8)
+        ok, buf = cv2.imencode(".jpg", frame)
+        self.assertTrue(ok)
+        raw = buf.tobytes()
+        truncado = raw[: raw.index(b"\xff\xda")]
+        self.assertEqual(jpeg_dimensions(truncado), (2600, 1800))
+
+        self.assertFalse(DecodedFrame(truncado).valid)
+        self.assertFalse(DecodedFrame(truncado).decodes(1200))
+        result = CirclePatternDetector(diametro_real_mm=94.0).detect_from_bytes("f", DecodedFrame(truncado))
+        self.assertFalse(result.detected)
+        self.assertTrue(DecodedFrame(raw).valid)
+
+    def _mascara_con_ruido(self) -> np.ndarray:
+        rng = np.random.default_rng(7)
+        mask = np.zeros((1050, 1400), dtype=np.uint8)
+        for x, y in rng.integers(0, (1400, 1050), size=(1500, 2)):
+            cv2.circle(mask, (int(x), int(y)), int(rng.integers(2, 7)), 255, thickness=-1)
+        for i in range(10):
+            cv2.circle(mask, (150 + i * 120, 520), 45, 255, thickness=-1)
+        return mask
+
+    @staticmethod
+    def _limpiar_por_componente(mask: np.ndarray, min_area: int) -> np.ndarray:
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        cleaned = np.zeros_like(mask)
+        for idx in range(1, num_labels):
+            if int(stats[idx, cv2.CC_STAT_AREA]) >= min_area:
+                cleaned[labels == idx] = 255
+        return cleaned
+
+    def test_limpieza_de_componentes_vectorizada_equivale_al_bucle(self) -> None:
+        mask = self._mascara_con_ruido()
+        np.testing.assert_array_equal(
+            FruitCaliberAnalyzer._remove_small_components(mask, 118), self._limpiar_por_componente(mask, 118)
+        )
+
+    @requiere_benchmark
+    def test_limpieza_de_componentes_vectorizada_benchmark(self) -> None:
+        mask = self._mascara_con_ruido()
+        t_bucle, _ = mejor_tiempo(lambda: self._limpiar_por_componente(mask, 118))
+        t_tabla, _ = mejor_tiempo(lambda: FruitCaliberAnalyzer._remove_small_components(mask, 118))
+        self.assertLess(t_tabla * 3, t_bucle, f"tabla {t_tabla * 1000:.1f} ms vs bucle {t_bucle * 1000:.1f} ms")
+
+    def test_areas_y_cajas_por_etiqueta_en_una_pasada(self) -> None:
+        markers = np.ones((60, 80), dtype=np.int32)
+        markers[5:15, 10:30] = 2
+        markers[40:50, 70:75] = 2  # la etiqueta 2 aparece en dos trozos
+        markers[20:35, 0:8] = 4  # la 3 no existe
+        markers[:, 50] = -1
+        areas, cajas = FruitCaliberAnalyzer._label_areas_and_boxes(markers)
+        self.assertEqual(areas.tolist(), [0, 0, 250, 0, 120])
+        self.assertEqual(cajas[2], (10, 5, 75, 50))
+        self.assertEqual(cajas[4], (0, 20, 8, 35))
+
+    def test_watershed_separa_muchas_frutas_en_contacto(self) -> None:
+        frame = np.full((1050, 1400, 3), (60, 90, 70), dtype=np.uint8)
+        for fila in range(12):
+            for col in range(19):
+                cv2.circle(frame, (52 + col * 72, 52 + fila * 80), 32, (20, 120, 235), thickness=-1)
+        analyzer = FruitCaliberAnalyzer()
+        mask = analyzer._build_orange_mask(frame)
+        self.assertLess(cv2.connectedComponents(mask)[0] - 1, 20)  # las filas se tocan
+
+        contornos = analyzer._split_touching_regions_with_watershed(frame, mask)
+        self.assertGreaterEqual(len(contornos), 200)
+        diametros = [2 * cv2.minEnclosingCircle(c)[1] for c in contornos]
+        self.assertTrue(all(55 <= d <= 75 for d in diametros))
+
 
 if __name__ == '__main__':
     unittest.main()
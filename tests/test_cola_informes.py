@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+
+from cola_informes import CANCELADO, FALLIDO, GENERANDO, TERMINADO, ColaInformes
+
+
+class TestColaInformes(unittest.TestCase):
+    def setUp(self) -> None:
+        self.estados: list[tuple[int, str]] = []
+        self.cola = ColaInformes(hilos=1, al_cambio=lambda t: self.estados.append((t.id, t.estado)))
+        self.addCleanup(self.cola.cerrar)
+
+    def _esperar(self, trabajo, timeout: float = 5.0) -> None:
+        limite = time.monotonic() + timeout
+        while not trabajo.terminado:
+            self.assertLess(time.monotonic(), limite, "el trabajo no terminó")
+            time.sleep(0.01)
+
+    def test_ejecuta_en_segundo_plano_y_registra_errores(self) -> None:
+        bien = self.cola.encolar("A", lambda x: f"/tmp/{x}.pdf", "a")
+        mal = self.cola.encolar("B", lambda: 1 / 0)
+        self._esperar(bien)
+        self._esperar(mal)
+        self.assertEqual((bien.estado, bien.ruta), (TERMINADO, "/tmp/a.pdf"))
+        self.assertEqual(mal.estado, FALLIDO)
+        self.assertIn("division", mal.error)
+        self.assertIn((bien.id, GENERANDO), self.estados)
+        self.assertEqual(self.cola.pendientes(), 0)
+
+    def test_cancela_en_cola_y_descarta_el_resultado_en_marcha(self) -> None:
+        liberar = threading.Event()
+        empezado = threading.Event()
+
+        def lento():
+            empezado.set()
+            liberar.wait(5)
+            return "/tmp/lento.pdf"
+
+        ejecutando = self.cola.encolar("lento", lento)
+        en_cola = self.cola.encolar("nunca", lambda: self.fail("no debía ejecutarse"))
+        self.assertTrue(empezado.wait(5))
+
+        self.assertTrue(self.cola.cancelar(en_cola.id))
+        self.assertEqual(en_cola.estado, CANCELADO)
+        self.assertTrue(self.cola.cancelar(ejecutando.id))
+        liberar.set()
+        self._esperar(ejecutando)
+        self.assertEqual(ejecutando.estado, CANCELADO)
+        self.assertIsNone(ejecutando.ruta)
+        self.assertFalse(self.cola.cancelar(ejecutando.id))
+
+        self.cola.limpiar_terminados()
+        self.assertEqual(self.cola.trabajos(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
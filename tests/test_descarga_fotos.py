@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from cache_imagenes import CacheImagenes
+from descarga_fotos import descargar_fotos
+from informe_generator import _rutas_fotos_por_pantalla
+from tests.benchmark import mejor_tiempo, requiere_benchmark
+from tests.fake_firestore import FakeFirestore
+
+
+class _SesionFalsa:
+    def __init__(self, retardo: float = 0.05, lentas: tuple[str, ...] = ()) -> None:
+        self.retardo = retardo
+        self.lentas = lentas
+        self.activas = 0
+        self.max_activas = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, headers=None, timeout=None):
+        with self._lock:
+            self.activas += 1
+            self.max_activas = max(self.max_activas, self.activas)
+        try:
+            time.sleep(2.0 if url in self.lentas else self.retardo)
+            if url.endswith("404.jpg"):
+                return SimpleNamespace(status_code=404, content=b"", headers={})
+            return SimpleNamespace(status_code=200, content=url.encode(), headers={})
+        finally:
+            with self._lock:
+                self.activas -= 1
+
+
+class TestDescargaFotos(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.cache = CacheImagenes(self._tmp.name)
+
+    def test_descarga_en_paralelo_con_hilos_acotados(self) -> None:
+        sesion = _SesionFalsa()
+        urls = [f"http://fotos/{i}.jpg" for i in range(20)] + ["http://fotos/404.jpg"]
+
+        resultado = descargar_fotos(urls, hilos=5, sesion=sesion, cache=self.cache)
+
+        self.assertGreater(sesion.max_activas, 1)
+        self.assertLessEqual(sesion.max_activas, 5)
+        self.assertEqual(resultado["http://fotos/3.jpg"], b"http://fotos/3.jpg")
+        self.assertIsNone(resultado["http://fotos/404.jpg"])
+
+    @requiere_benchmark
+    def test_descarga_en_paralelo_tarda_menos_que_en_serie(self) -> None:
+        urls = [f"http://fotos/{i}.jpg" for i in range(20)]
+        # Una sola vuelta: la caché de disco serviría las siguientes sin descargar.
+        duracion, _ = mejor_tiempo(lambda: descargar_fotos(urls, hilos=5, sesion=_SesionFalsa(), cache=self.cache), repeticiones=1)
+        self.assertLess(duracion, 0.05 * 20 / 2)
+
+    def test_plazo_total_deja_sin_foto_las_pendientes(self) -> None:
+        sesion = _SesionFalsa(lentas=("http://fotos/lenta.jpg",))
+        inicio = time.perf_counter()
+        resultado = descargar_fotos(["http://fotos/1.jpg", "http://fotos/lenta.jpg"], sesion=sesion, plazo_total_s=0.5, cache=self.cache)
+        # La lenta tarda 2 s: terminar antes prueba que no se la esperó.
+        self.assertLess(time.perf_counter() - inicio, 2.0)
+        self.assertEqual(resultado["http://fotos/1.jpg"], b"http://fotos/1.jpg")
+        self.assertIsNone(resultado["http://fotos/lenta.jpg"])
+
+    def test_rutas_agrupadas_por_pantalla_y_ordenadas(self) -> None:
+        db = FakeFirestore()
+        t = lambda minuto: datetime(2024, 1, 1, 10, minuto, tzinfo=timezone.utc)
+        db.set("Fotos", "1", {"idMuestra": "M1", "pantalla": "Calibre", "ruta_local": "b.jpg", "timestamp": t(2)})
+        db.set("Fotos", "2", {"idMuestra": "M1", "pantalla": "Calibre", "ruta_local": "a.JPG", "timestamp": t(1)})
+        db.set("Fotos", "3", {"idMuestra": "M1", "pantalla": "Color", "ruta_local": "c.png", "timestamp": t(3)})
+        db.set("Fotos", "4", {"idMuestra": "M2", "pantalla": "Calibre", "ruta_local": "d.jpg", "timestamp": t(4)})
+
+        self.assertEqual(_rutas_fotos_por_pantalla(db, "M1"), {"Calibre": ["a.JPG", "b.jpg"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import unittest
+from unittest import mock
+
+import eepp_cache
+from eepp_cache import EEPPResolver
+from tests.fake_firestore import FakeFirestore
+
+
+class TestEEPPResolver(unittest.TestCase):
+    def setUp(self) -> None:
+        self.db = FakeFirestore()
+        for idx in range(650):
+            self.db.set("EEPP", str(1000 + idx), {"Variedad": f"VAR{idx % 3}", "Arbol": "120"})
+
+    def test_resuelve_en_lotes_get_all_y_cachea_inexistentes(self) -> None:
+        resolver = EEPPResolver(self.db)
+        boletas = [str(1000 + idx) for idx in range(650)] + ["9999", " 1000 ", ""]
+
+        datos = resolver.resolver(boletas)
+
+        self.assertEqual(self.db.llamadas_get_all, 3)
+        self.assertIsNone(datos["9999"])
+        self.assertEqual(datos["1000"]["Variedad"], "VAR0")
+
+        resolver.resolver(boletas)
+        self.assertEqual(self.db.llamadas_get_all, 3)
+        self.assertEqual(resolver.obtener_variedad("9999", defecto="-"), "-")
+
+    def test_caducidad_ttl_fuerza_nueva_lectura(self) -> None:
+        resolver = EEPPResolver(self.db, ttl_segundos=10)
+        with mock.patch.object(eepp_cache.time, "monotonic", return_value=100.0):
+            resolver.obtener_variedad("1001")
+        with mock.patch.object(eepp_cache.time, "monotonic", return_value=105.0):
+            resolver.obtener_variedad("1001")
+        self.assertEqual(self.db.llamadas_get_all, 1)
+        with mock.patch.object(eepp_cache.time, "monotonic", return_value=111.0):
+            resolver.obtener_variedad("1001")
+        self.assertEqual(self.db.llamadas_get_all, 2)
+
+    def test_resolver_compartido_por_cliente(self) -> None:
+        self.addCleanup(setattr, eepp_cache, "_resolver_global", None)
+        eepp_cache._resolver_global = None
+        compartido = eepp_cache.obtener_resolver_eepp(self.db)
+        self.assertIs(eepp_cache.obtener_resolver_eepp(self.db), compartido)
+
+        otra_db = FakeFirestore()
+        otra_db.set("EEPP", "1000", {"Variedad": "OTRA"})
+        self.assertEqual(eepp_cache.obtener_resolver_eepp(otra_db).obtener_variedad("1000"), "OTRA")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import io
+import unittest
+
+from reportlab.graphics.shapes import Rect
+from reportlab.platypus import SimpleDocTemplate
+
+from graficas_pdf import ALTO_FILA, es_distribucion, grafica_distribucion
+
+
+class TestGraficasPdf(unittest.TestCase):
+    def test_es_distribucion(self) -> None:
+        self.assertTrue(es_distribucion([("60-65", "40"), ("65-70", 59.8)]))
+        self.assertFalse(es_distribucion([("60-65", "40"), ("65-70", "-")]))
+        self.assertFalse(es_distribucion([("60-65", "40"), ("65-70", "50")]))
+        self.assertFalse(es_distribucion([]))
+
+    def test_una_barra_por_valor_en_un_solo_dibujo(self) -> None:
+        dibujo = grafica_distribucion([("A", "25"), ("B", "75.0"), ("C", "0"), ("Texto", "-")])
+        barras = [forma for forma in dibujo.contents if isinstance(forma, Rect)]
+        self.assertEqual(len(barras), 2)  # el 0 % no pinta barra y lo no numérico se omite
+        self.assertAlmostEqual(barras[1].width, 3 * barras[0].width)
+        self.assertEqual(dibujo.height, 3 * ALTO_FILA)
+
+        salida = io.BytesIO()
+        SimpleDocTemplate(salida).build([dibujo])
+        self.assertTrue(salida.getvalue().startswith(b"%PDF"))
+
+
+if __name__ == "__main__":
+    unittest.main()
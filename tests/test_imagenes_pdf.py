@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import io
+import unittest
+
+from PIL import Image
+
+from imagenes_pdf import pixeles_para, preparar_imagen
+
+CM = 72 / 2.54
+
+
+def _jpeg(ancho: int, alto: int, orientacion: int | None = None) -> bytes:
+    imagen = Image.new("RGB", (ancho, alto), (200, 120, 30))
+    imagen.paste((20, 40, 200), (0, 0, ancho // 2, alto // 4))
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientacion:
+        exif[0x0112] = orientacion
+    imagen.save(buffer, format="JPEG", quality=95, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class TestImagenesPdf(unittest.TestCase):
+    def test_reduce_al_tamano_impreso(self) -> None:
+        original = _jpeg(4000, 3000)
+        resultado = preparar_imagen(original, 4 * CM, 4 * CM, dpi=150)
+        with Image.open(resultado) as imagen:
+            self.assertEqual(imagen.size, pixeles_para(4 * CM, 4 * CM, 150))
+            self.assertEqual(imagen.size, (236, 236))
+        self.assertLess(len(resultado.getvalue()) * 10, len(original))
+
+    def test_endereza_antes_de_reducir(self) -> None:
+        # Orientación 6: la foto guardada en horizontal se ve en vertical.
+        resultado = preparar_imagen(_jpeg(4000, 2000, orientacion=6), 2 * CM, 4 * CM, dpi=150)
+        with Image.open(resultado) as imagen:
+            self.assertEqual(imagen.size, pixeles_para(2 * CM, 4 * CM, 150))
+            self.assertNotIn(0x0112, imagen.getexif())
+
+    def test_no_amplia_ni_falla_con_basura(self) -> None:
+        with Image.open(preparar_imagen(_jpeg(100, 80), 4 * CM, 4 * CM)) as imagen:
+            self.assertEqual(imagen.size, (100, 80))
+        self.assertEqual(preparar_imagen(b"no es una imagen", 4 * CM, 4 * CM).getvalue(), b"no es una imagen")
+
+
+if __name__ == "__main__":
+    unittest.main()
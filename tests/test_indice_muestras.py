@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import unittest
+
+import pandas as pd
+
+from indice_muestras import IndiceMuestras, normalizar_texto
+
+
+class TestIndiceMuestras(unittest.TestCase):
+    def setUp(self) -> None:
+        self.df = pd.DataFrame(
+            {
+                "IdMuestra": ["A", "B", "C", "D", "E"],
+                "Boleta": ["1001", "1002", "2001", None, "1001"],
+                "Nombre": ["José Pérez", "JOSEFA RUIZ", "Ana Núñez", "Pedro", "jose perez"],
+                "Nombre Usuario": ["Técnico 1", "Técnico 2", "Técnico 1", "Técnico 3", "Técnico 2"],
+                "CULTIVO": ["CITRICOS", "CITRICOS", "KAKI", "CITRICOS", "KAKI"],
+            }
+        )
+
+    def test_normaliza_acentos_y_mayusculas(self) -> None:
+        self.assertEqual(normalizar_texto("  Núñez PÉREZ "), "nunez perez")
+        self.assertEqual(normalizar_texto(float("nan")), "")
+
+    def test_filtra_por_subcadena_sin_acentos(self) -> None:
+        indice = IndiceMuestras(self.df)
+        resultado = indice.filtrar({"Nombre": "perez", "CULTIVO": "citr"})
+        self.assertEqual(resultado["IdMuestra"].tolist(), ["A"])
+
+        self.assertEqual(indice.filtrar({"Nombre": "jo"})["IdMuestra"].tolist(), ["A", "B", "E"])
+        self.assertEqual(indice.filtrar({"Boleta": "100"})["IdMuestra"].tolist(), ["A", "B", "E"])
+
+    def test_refinar_parte_del_resultado_anterior_y_ampliar_reinicia(self) -> None:
+        indice = IndiceMuestras(self.df)
+        indice.buscar({"Nombre": "jos"})
+        # Al estrechar no se vuelve a mirar el conjunto completo.
+        indice.datos.loc[3, "Nombre"] = "jose fantasma"
+        self.assertEqual(indice.filtrar({"Nombre": "jose"})["IdMuestra"].tolist(), ["A", "B", "E"])
+        self.assertEqual(
+            indice.filtrar({"Nombre": "jose", "Nombre Usuario": "2"})["IdMuestra"].tolist(),
+            ["B", "E"],
+        )
+        # Quitar un término amplía: se parte de nuevo de todas las filas.
+        self.assertEqual(len(indice.filtrar({})), 5)
+
+    def test_campo_agregado_a_posteriori(self) -> None:
+        indice = IndiceMuestras(self.df)
+        self.assertFalse(indice.tiene_campo("Variedad"))
+        indice.agregar_campo("Variedad", pd.Series(["Navelina", "Lane Late", "Rojo Brillante", "", "Navelate"]))
+        self.assertEqual(indice.filtrar({"Variedad": "navel"})["IdMuestra"].tolist(), ["A", "E"])
+
+    def test_actualizar_aplica_el_delta_como_una_reconstruccion(self) -> None:
+        from muestras_en_vivo import aplicar_cambios
+
+        indice = IndiceMuestras(self.df)
+        indice.agregar_campo("Variedad", pd.Series(["Navelina", "Lane Late", "Rojo Brillante", "", "Navelate"]))
+        nuevos = pd.DataFrame(
+            {
+                "IdMuestra": ["B", "F"],
+                "Boleta": ["1002", None],
+                "Nombre": ["Beatriz", "Josué Gil"],
+                "CULTIVO": ["KAKI", "CAQUI"],
+                "Variedad": ["Rojo Brillante", "Navel"],
+            }
+        )
+        esperado = IndiceMuestras(aplicar_cambios(indice.datos, nuevos, ["C"]))
+
+        indice.actualizar(nuevos, ["C"])
+
+        self.assertEqual(indice.datos["IdMuestra"].tolist(), ["F", "A", "B", "D", "E"])
+        for terminos in ({"Nombre": "jos"}, {"CULTIVO": "kaki"}, {"Variedad": "navel"}, {"Boleta": "100"}, {}):
+            self.assertEqual(
+                indice.filtrar(terminos)["IdMuestra"].tolist(),
+                esperado.filtrar(terminos)["IdMuestra"].tolist(),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
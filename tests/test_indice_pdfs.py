@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import indice_pdfs
+import informe_generator
+from eepp_cache import EEPPResolver
+from informe_generator_general import generar_pdf_general
+from pdf_utils import cleanup_old_pdfs
+from plantillas_cache import PlantillasCache
+from tests.fake_firestore import FakeFirestore
+from tests.test_informe_generator_general import _db_con_muestras
+
+
+class TestIndicePdfs(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        parche = mock.patch.object(tempfile, "tempdir", tmp.name)
+        parche.start()
+        self.addCleanup(parche.stop)
+        indice_pdfs._indice_global = None
+        self.addCleanup(setattr, indice_pdfs, "_indice_global", None)
+        self.carpeta = indice_pdfs.carpeta_pdfs()
+
+    def test_informe_sin_cambios_se_reutiliza(self) -> None:
+        db, lista = _db_con_muestras(12)
+
+        def generar():
+            return generar_pdf_general(
+                lista, db=db, abrir=False, resolver_eepp=EEPPResolver(db), plantillas=PlantillasCache(db)
+            )
+
+        primera = generar()
+        self.assertEqual(Path(primera).parent, self.carpeta)
+        with mock.patch("informe_generator_general.SimpleDocTemplate") as plantilla_doc:
+            self.assertEqual(generar(), primera)
+            plantilla_doc.assert_not_called()
+
+        db.set("Muestras", "M3", {"Tipo": "Campo", "CalibresA": 99})
+        tercera = generar()
+        self.assertNotEqual(tercera, primera)
+        self.assertEqual(len(list(self.carpeta.glob("*.pdf"))), 2)
+
+    def test_limpieza_cuenta_la_edad_desde_el_ultimo_uso(self) -> None:
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        viejo = time.time() - 48 * 3600
+        rutas = {}
+        for nombre in ("reusado", "olvidado", "suelto"):
+            ruta = self.carpeta / f"{nombre}.pdf"
+            ruta.write_bytes(b"%PDF")
+            os.utime(ruta, (viejo, viejo))
+            rutas[nombre] = ruta
+        indice = indice_pdfs.IndicePdfs(self.carpeta, reloj=lambda: viejo)
+        indice.registrar("h-olvidado", rutas["olvidado"], "muestra")
+        indice.registrar("h-reusado", rutas["reusado"], "muestra")
+        indice_pdfs.IndicePdfs(self.carpeta).buscar("h-reusado")
+
+        cleanup_old_pdfs(max_age_hours=24)
+
+        self.assertEqual(sorted(p.name for p in self.carpeta.glob("*.pdf")), ["reusado.pdf"])
+        self.assertEqual(list(indice.ultimos_usos()), [str(rutas["reusado"])])
+
+    def test_informe_con_fotos_fallidas_no_se_indexa(self) -> None:
+        db = FakeFirestore()
+        db.set("PlantillasInforme", "DATOS", {"CAMPO": ["Calibres"]})
+        db.set("Calibres", "NARANJA", {"Titulo": "Calibres", "CAMPO": ["CalibresA"]})
+        db.set("Muestras", "M1", {"Nombre": "Finca", "CalibresA": 3})
+        db.set("UsuariosAutorizados", "u1", {"Nombre": "Ana"})
+        db.set("ServidorFotos", "url_actual", {"url": "http://fotos"})
+        db.set("Fotos", "F1", {"idMuestra": "M1", "pantalla": "Calibres", "ruta_local": "a.jpg", "timestamp": 1})
+        descargas = []
+
+        def descargar(urls):
+            descargas.append(list(urls))
+            return {url: None for url in descargas[-1]}
+
+        with mock.patch.object(informe_generator, "obtener_db", return_value=db), \
+                mock.patch.object(informe_generator, "obtener_cache_plantillas", return_value=PlantillasCache(db)), \
+                mock.patch.object(informe_generator, "descargar_fotos", side_effect=descargar):
+            primera = informe_generator.generar_pdf("M1", "NARANJA", "u1", abrir=False)
+            segunda = informe_generator.generar_pdf("M1", "NARANJA", "u1", abrir=False)
+
+        self.assertEqual(descargas, [["http://fotos/fotos/a.jpg"]] * 2)
+        self.assertNotEqual(primera, segunda)
+        self.assertEqual(indice_pdfs.obtener_indice_pdfs().ultimos_usos(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from eepp_cache import EEPPResolver
+from informe_generator_general import filas_seccion, generar_pdf_general, precargar_datos_informe, tablas_por_bloques
+from plantillas_cache import PlantillasCache
+from tests.fake_firestore import FakeFirestore
+
+SECCIONES = ["Calibres", "Defectos", "Madurez"]
+
+
+def _db_con_muestras(n: int) -> tuple[FakeFirestore, list[dict]]:
+    db = FakeFirestore()
+    db.set("PlantillasInforme", "DATOS", {"CAMPO": SECCIONES + ["PlantillasMuestra"]})
+    for cultivo in ("NARANJA", "MANDARINA"):
+        for seccion in SECCIONES:
+            db.set(seccion, cultivo, {"Titulo": seccion, "CAMPO": [f"{seccion}A [%]", f"{seccion}B"]})
+    lista = []
+    for i in range(n):
+        cultivo = "NARANJA" if i % 2 else "MANDARINA"
+        boleta = str(1000 + i % 20)
+        db.set("EEPP", boleta, {"Variedad": "Navelina", "Arbol": 100})
+        db.set(
+            "Muestras",
+            f"M{i}",
+            {"Tipo": "Campo", "Albaran": f"A{i}", "FechaHora": datetime(2024, 1, 1, tzinfo=timezone.utc), "CalibresA": i, "DefectosB": "2,5"},
+        )
+        lista.append({"IdMuestra": f"M{i}", "CULTIVO": cultivo, "Boleta": boleta, "Nombre": f"Finca {i}"})
+    return db, lista
+
+
+class TestInformeGeneral(unittest.TestCase):
+    def test_precarga_lee_cada_documento_una_vez(self) -> None:
+        db, lista = _db_con_muestras(200)
+        datos = precargar_datos_informe(db, lista, EEPPResolver(db), PlantillasCache(db))
+        # 200 muestras + 20 EEPP + 6 plantillas de sección + DATOS
+        self.assertEqual(db.lecturas, 200 + 20 + 6 + 1)
+        self.assertEqual(datos.secciones, SECCIONES)
+        self.assertEqual(datos.muestras["M7"]["Albaran"], "A7")
+        self.assertEqual(datos.plantillas[("Defectos", "NARANJA")]["Titulo"], "Defectos")
+
+    def test_generar_sin_lecturas_por_seccion(self) -> None:
+        db, lista = _db_con_muestras(40)
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "general.pdf")
+            eepp, plantillas = EEPPResolver(db), PlantillasCache(db)
+            generar_pdf_general(lista, db=db, ruta_salida=ruta, abrir=False, resolver_eepp=eepp, plantillas=plantillas)
+            self.assertGreater(os.path.getsize(ruta), 0)
+            self.assertEqual(db.lecturas, 40 + 20 + 6 + 1)
+            # En caliente solo se leen las muestras.
+            generar_pdf_general(lista, db=db, ruta_salida=ruta, abrir=False, resolver_eepp=eepp, plantillas=plantillas)
+        self.assertEqual(db.lecturas, 2 * 40 + 20 + 6 + 1)
+
+    def test_filas_seccion_y_medias(self) -> None:
+        datos = {
+            "A": {"Peso": 10, "Color": "-", "Nota": None},
+            "B": {"Peso": "", "Color": "-", "Nota": None},  # sin valores: se omite
+            "C": {"Peso": "20", "Color": "verde"},
+        }
+        muestras = [{"IdMuestra": k, "Boleta": 1, "Nombre": k} for k in datos]
+        filas, total = filas_seccion(muestras, datos, ["Peso", "Color", "Nota"])
+        self.assertEqual(filas, [["1", "A", "10", "-", "-"], ["1", "C", "20", "verde", ""]])
+        self.assertEqual(total, ["TOTAL", "", "15.0", "-", "-"])
+
+    def test_tablas_por_bloques_repiten_encabezado(self) -> None:
+        filas = [[str(i), "x"] for i in range(250)]
+        tablas = tablas_por_bloques(["N", "X"], filas, fila_final=["TOTAL", ""], filas_por_tabla=100)
+        self.assertEqual([len(t._cellvalues) for t in tablas], [101, 101, 52])
+        self.assertTrue(all(t._cellvalues[0] == ["N", "X"] for t in tablas))
+        self.assertEqual(tablas[-1]._cellvalues[-1], ["TOTAL", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import eepp_cache
+import indice_pdfs
+import plantillas_cache
+from informes_cli import construir_parser, buscar_muestras, main
+from tests.fake_firestore import FakeFirestore
+
+
+def _db() -> FakeFirestore:
+    db = FakeFirestore()
+    db.set("PlantillasInforme", "DATOS", {"CAMPO": ["Calibres"]})
+    db.set("Calibres", "NARANJA", {"Titulo": "Calibres", "CAMPO": ["Peso [g]"]})
+    db.set("ServidorFotos", "url_actual", {"url": "http://fotos.local"})
+    db.set("UsuariosAutorizados", "u1", {"Nombre": "Técnico"})
+    for i in range(6):
+        db.set(
+            "Muestras",
+            f"M{i}",
+            {
+                "CULTIVO": "NARANJA" if i < 5 else "LIMON",
+                "Boleta": f"100{i % 3}",
+                "Nombre": f"Finca {i % 3}",
+                "Usuario": "u1",
+                "Peso": 100 + i,
+                "FechaHora": datetime(2024, 11, 1 + i, 9, tzinfo=timezone.utc),
+            },
+        )
+    return db
+
+
+class TestInformesCli(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        parche = mock.patch.object(tempfile, "tempdir", tmp.name)
+        parche.start()
+        self.addCleanup(parche.stop)
+        for modulo, atributo in ((eepp_cache, "_resolver_global"), (plantillas_cache, "_cache_global"), (indice_pdfs, "_indice_global")):
+            setattr(modulo, atributo, None)
+            self.addCleanup(setattr, modulo, atributo, None)
+        self.db = _db()
+
+    def test_filtros_de_cultivo_fechas_y_boletas(self) -> None:
+        args = construir_parser().parse_args(
+            ["general", "--cultivo", "NARANJA", "--desde", "2024-11-02", "--hasta", "2024-11-04", "--boleta", "1000,1002", "--salida", "x.pdf"]
+        )
+        self.assertEqual([m["IdMuestra"] for m in buscar_muestras(self.db, args)], ["M2", "M3"])
+
+    def test_lote_de_muestras_en_zip(self) -> None:
+        destino = self.dir / "noche" / "muestras.zip"
+        codigo = main(
+            ["muestras", "--cultivo", "NARANJA", "--formato", "zip", "--procesos", "3", "--salida", str(destino)], db=self.db
+        )
+        self.assertEqual(codigo, 0)
+        with zipfile.ZipFile(destino) as zf:
+            self.assertEqual(len(zf.namelist()), 5)
+
+    def test_general_y_comercial(self) -> None:
+        general = self.dir / "general.pdf"
+        comercial = self.dir / "comercial.pdf"
+        self.assertEqual(main(["general", "--cultivo", "NARANJA", "--ultima-por-boleta", "--salida", str(general)], db=self.db), 0)
+        self.assertEqual(main(["comercial", "--boleta", "1001", "--salida", str(comercial)], db=self.db), 0)
+        self.assertTrue(general.read_bytes().startswith(b"%PDF"))
+        self.assertTrue(comercial.read_bytes().startswith(b"%PDF"))
+
+
+if __name__ == "__main__":
+    unittest.main()
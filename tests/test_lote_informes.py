@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from lote_informes import TrabajoInforme, generar_lote
+
+
+def _generar_falso(trabajo: TrabajoInforme, ruta_salida: str) -> str:
+    """Se ejecuta en el proceso hijo: escribe un PDF mínimo con su pid."""
+    if trabajo.id_muestra == "roto":
+        raise ValueError("muestra sin datos")
+    from reportlab.pdfgen import canvas
+
+    lienzo = canvas.Canvas(ruta_salida)
+    lienzo.drawString(100, 750, f"{trabajo.id_muestra} pid={os.getpid()}")
+    lienzo.save()
+    return ruta_salida
+
+
+class TestLoteInformes(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.dir = Path(self._tmp.name)
+        self.trabajos = [TrabajoInforme(f"M{i}", titulo=f"B{i % 2} · Finca") for i in range(5)]
+
+    def test_carpeta_en_pool_de_procesos_con_fallos_aislados(self) -> None:
+        avances = []
+        trabajos = self.trabajos + [TrabajoInforme("roto")]
+        resultado = generar_lote(
+            trabajos, self.dir / "salida", procesos=2, generar=_generar_falso, progreso=lambda h, t: avances.append((h, t))
+        )
+        self.assertEqual([t.id_muestra for t, _ in resultado.generados], [f"M{i}" for i in range(5)])
+        self.assertEqual([t.id_muestra for t, _ in resultado.fallidos], ["roto"])
+        self.assertEqual(len({ruta.name for _, ruta in resultado.generados}), 5)
+        self.assertTrue(all(ruta.parent == self.dir / "salida" and ruta.exists() for _, ruta in resultado.generados))
+        self.assertEqual(avances[0], (0, 6))
+        self.assertEqual(avances[-1], (6, 6))
+
+    def test_zip_en_orden_de_seleccion(self) -> None:
+        destino = self.dir / "lote.zip"
+        resultado = generar_lote(self.trabajos, destino, modo="zip", procesos=2, generar=_generar_falso)
+        self.assertEqual(resultado.salida, destino)
+        with zipfile.ZipFile(destino) as zf:
+            nombres = zf.namelist()
+        self.assertEqual(nombres, [ruta.name for _, ruta in resultado.generados])
+        self.assertEqual(len(nombres), 5)
+
+    def test_pdf_unido_con_marcadores(self) -> None:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            self.skipTest("pypdf no instalado")
+        destino = self.dir / "lote.pdf"
+        generar_lote(self.trabajos, destino, modo="pdf", procesos=2, generar=_generar_falso)
+        lector = PdfReader(str(destino))
+        self.assertEqual(len(lector.pages), 5)
+        self.assertEqual([m.title for m in lector.outline], [t.titulo for t in self.trabajos])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from muestras_cache import RESINCRONIZACION_COMPLETA_HORAS, MuestrasCache
+from muestras_filtros import FiltroMuestras, construir_query_firestore
+from tests.fake_firestore import FakeFirestore
+
+
+class TestMuestrasCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = MuestrasCache(os.path.join(self._tmp.name, "cache.sqlite"))
+        self.db = FakeFirestore()
+        self.base = datetime(2025, 1, 10, 8, 0, tzinfo=timezone.utc)
+        for idx in range(5):
+            self.db.set(
+                "Muestras",
+                f"M{idx}",
+                {"Boleta": f"10{idx}", "CULTIVO": "CITRICOS", "FechaHora": self.base + timedelta(days=idx * 5), "Datos Calibre": {"CAL 1": 40}},
+            )
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_primera_sincronizacion_es_completa_y_conserva_tipos(self) -> None:
+        resultado = self.cache.sincronizar(self.db)
+        self.assertTrue(resultado.completa)
+        self.assertEqual(resultado.documentos_leidos, 5)
+
+        registros = {r["IdMuestra"]: r for r in self.cache.cargar_registros()}
+        self.assertEqual(set(registros), {"M0", "M1", "M2", "M3", "M4"})
+        self.assertEqual(registros["M2"]["FechaHora"], self.base + timedelta(days=10))
+        self.assertEqual(registros["M2"]["Datos Calibre"], {"CAL 1": 40})
+
+    def test_sincronizacion_incremental_solo_lee_el_delta(self) -> None:
+        self.cache.sincronizar(self.db)
+        self.db.set("Muestras", "M5", {"Boleta": "200", "FechaHora": self.base + timedelta(days=40)})
+        self.db.lecturas = 0
+
+        resultado = self.cache.sincronizar(self.db)
+
+        self.assertFalse(resultado.completa)
+        # La muestra nueva más la última ya cacheada, que cae dentro de la ventana de solape.
+        self.assertEqual(self.db.lecturas, 2)
+        self.assertEqual(resultado.cambios, 1)
+        self.assertEqual(len(self.cache.cargar_registros()), 6)
+        self.assertEqual(self.cache.sincronizar(self.db).cambios, 0)
+
+    def test_edicion_de_muestra_antigua_llega_con_la_pasada_completa(self) -> None:
+        self.cache.sincronizar(self.db)
+        self.db.set("Muestras", "M0", {"Boleta": "100", "CULTIVO": "KAKI", "FechaHora": self.base})
+
+        # El cursor es la FechaHora de creación: la incremental no ve la edición.
+        self.cache.sincronizar(self.db)
+        self.assertEqual(self.cache.consultar(FiltroMuestras(cultivo="kaki")), [])
+
+        vencida = datetime.now(timezone.utc) - timedelta(hours=RESINCRONIZACION_COMPLETA_HORAS + 1)
+        with sqlite3.connect(self.cache.db_path) as conn:
+            conn.execute("UPDATE sync_meta SET valor = ? WHERE clave = 'ultima_completa'", (vencida.isoformat(),))
+        self.assertTrue(self.cache.sincronizar(self.db).completa)
+        self.assertEqual([r["IdMuestra"] for r in self.cache.consultar(FiltroMuestras(cultivo="kaki"))], ["M0"])
+
+    def test_sincronizacion_completa_purga_borrados_remotos(self) -> None:
+        self.cache.sincronizar(self.db)
+        self.db.collection("Muestras").document("M1").delete()
+
+        self.cache.sincronizar(self.db, forzar_completa=True)
+
+        ids = {r["IdMuestra"] for r in self.cache.cargar_registros()}
+        self.assertNotIn("M1", ids)
+        with sqlite3.connect(self.cache.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM muestras").fetchone()[0], 4)
+
+    def test_filtros_de_texto_y_rango_coinciden_en_cache_y_firestore(self) -> None:
+        self.db.set("Muestras", "M9", {"Boleta": "102", "CULTIVO": "KAKI", "FechaHora": self.base + timedelta(days=10)})
+        self.db.set("Muestras", "M8", {"Boleta": 1023, "CULTIVO": "Cítricos", "FechaHora": self.base + timedelta(days=10)})
+        self.cache.sincronizar(self.db)
+        filtro = FiltroMuestras(
+            boleta=" 102 ",
+            cultivo="citri",
+            desde=self.base + timedelta(days=9),
+            hasta=self.base + timedelta(days=11),
+        )
+
+        ids_cache = {r["IdMuestra"] for r in self.cache.consultar(filtro)}
+        ids_firestore = {
+            doc.id for doc in construir_query_firestore(self.db, filtro).stream() if filtro.coincide(doc.to_dict())
+        }
+
+        # Subcadena sin distinguir mayúsculas ni tildes; la Boleta numérica se compara como texto.
+        self.assertEqual(ids_cache, {"M2", "M8"})
+        self.assertEqual(ids_cache, ids_firestore)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from muestras_en_vivo import EscuchaMuestras, aplicar_cambios, cambios_desde_snapshot
+from muestras_filtros import FiltroMuestras
+
+
+def _cambio(tipo: str, doc_id: str, data: dict | None = None) -> SimpleNamespace:
+    documento = SimpleNamespace(id=doc_id, to_dict=lambda: dict(data or {}))
+    return SimpleNamespace(type=SimpleNamespace(name=tipo), document=documento)
+
+
+class _WatchFalso:
+    def __init__(self) -> None:
+        self.cancelado = False
+
+    def unsubscribe(self) -> None:
+        self.cancelado = True
+
+
+class _QueryFalsa:
+    def __init__(self) -> None:
+        self.callback = None
+        self.watch = _WatchFalso()
+
+    def where(self, *_args) -> "_QueryFalsa":
+        return self
+
+    def order_by(self, *_args) -> "_QueryFalsa":
+        return self
+
+    def on_snapshot(self, callback):
+        self.callback = callback
+        return self.watch
+
+
+class TestMuestrasEnVivo(unittest.TestCase):
+    def test_aplica_altas_modificaciones_y_bajas_conservando_el_orden(self) -> None:
+        base = pd.DataFrame({"IdMuestra": ["A", "B", "C"], "Nombre": ["a", "b", "c"]})
+        cambios = cambios_desde_snapshot(
+            [
+                _cambio("MODIFIED", "B", {"Nombre": "b2"}),
+                _cambio("ADDED", "D", {"Nombre": "d"}),
+                _cambio("REMOVED", "A"),
+            ]
+        )
+
+        resultado = aplicar_cambios(base, pd.DataFrame(cambios.registros()), cambios.eliminadas)
+
+        self.assertEqual(resultado["IdMuestra"].tolist(), ["D", "B", "C"])
+        self.assertEqual(resultado["Nombre"].tolist(), ["d", "b2", "c"])
+
+    def test_escucha_entrega_snapshot_inicial_y_deltas_hasta_detenerse(self) -> None:
+        query = _QueryFalsa()
+        db = SimpleNamespace(collection=lambda _nombre: query)
+        recibidos = []
+        escucha = EscuchaMuestras(db, FiltroMuestras(cultivo="KAKI"), recibidos.append).iniciar()
+
+        query.callback([], [_cambio("ADDED", "A", {"CULTIVO": "Kaki"}), _cambio("ADDED", "B", {"CULTIVO": "KAKI"})], None)
+        query.callback([], [], None)
+        query.callback([], [_cambio("REMOVED", "A"), _cambio("MODIFIED", "B", {"CULTIVO": "CAQUI"})], None)
+        escucha.detener()
+        query.callback([], [_cambio("ADDED", "Z", {"CULTIVO": "KAKI"})], None)
+
+        self.assertEqual(
+            [(c.inicial, [d.id for d in c.documentos], c.fuera_de_vista()) for c in recibidos],
+            [(True, ["A", "B"], []), (False, [], ["A", "B"])],
+        )
+        self.assertEqual([d.id for d in recibidos[1].descartados], ["B"])
+        self.assertTrue(query.watch.cancelado)
+        self.assertFalse(escucha.activa)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+
+import plantillas_cache
+from plantillas_cache import PlantillasCache
+from tests.fake_firestore import FakeFirestore
+
+
+class _Watch:
+    def __init__(self) -> None:
+        self.cancelado = False
+
+    def unsubscribe(self) -> None:
+        self.cancelado = True
+
+
+class _FirestoreConListeners(FakeFirestore):
+    """``FakeFirestore`` que guarda los callbacks de ``on_snapshot`` por ruta."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.callbacks: dict[str, tuple] = {}
+
+    def collection(self, name: str):
+        coleccion = super().collection(name)
+        coleccion.on_snapshot = lambda cb: self._registrar(name, cb)
+        documento_original = coleccion.document
+
+        def document(doc_id: str):
+            ref = documento_original(doc_id)
+            ref.on_snapshot = lambda cb: self._registrar(ref.path, cb)
+            return ref
+
+        coleccion.document = document
+        return coleccion
+
+    def _registrar(self, ruta: str, callback):
+        watch = _Watch()
+        self.callbacks[ruta] = (callback, watch)
+        return watch
+
+
+def _cambio(tipo: str, doc_id: str, datos: dict | None = None) -> SimpleNamespace:
+    documento = SimpleNamespace(id=doc_id, exists=datos is not None, to_dict=lambda: dict(datos or {}))
+    return SimpleNamespace(type=SimpleNamespace(name=tipo), document=documento)
+
+
+class TestPlantillasCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ahora = 0.0
+        self.db = _FirestoreConListeners()
+        self.db.set("PlantillasInforme", "DATOS", {"CAMPO": ["Calibres", "Defectos"]})
+        self.db.set("Calibres", "NARANJA", {"Titulo": "Calibres"})
+
+    def _cache(self) -> PlantillasCache:
+        return PlantillasCache(self.db, ttl_segundos=60, reloj=lambda: self.ahora)
+
+    def test_ttl_e_invalidacion(self) -> None:
+        cache = self._cache()
+        claves = [("Calibres", "NARANJA"), ("Defectos", "NARANJA")]
+        self.assertEqual(cache.secciones(), ["Calibres", "Defectos"])
+        primera = cache.plantillas(claves)
+        self.assertEqual(primera[("Calibres", "NARANJA")], {"Titulo": "Calibres"})
+        self.assertIsNone(primera[("Defectos", "NARANJA")])
+        lecturas = self.db.lecturas
+
+        self.ahora = 30
+        cache.secciones()
+        cache.plantillas(claves)
+        self.assertEqual(self.db.lecturas, lecturas)
+
+        self.db.set("Calibres", "NARANJA", {"Titulo": "Calibres v2"})
+        cache.invalidar("Calibres", "NARANJA")
+        self.assertEqual(cache.plantilla("Calibres", "NARANJA"), {"Titulo": "Calibres v2"})
+        self.assertEqual(self.db.lecturas, lecturas + 1)
+
+        self.ahora = 100
+        cache.secciones()
+        self.assertEqual(self.db.lecturas, lecturas + 2)
+
+    def test_listeners_mantienen_la_cache_sin_lecturas(self) -> None:
+        cache = self._cache().escuchar()
+        callback_datos, watch_datos = self.db.callbacks["PlantillasInforme/DATOS"]
+        datos = SimpleNamespace(exists=True, to_dict=lambda: {"CAMPO": ["Calibres", "Defectos"]})
+        callback_datos([datos], [], None)
+        self.assertTrue(cache.escuchando)
+        callback_calibres, _ = self.db.callbacks["Calibres"]
+        callback_calibres([], [_cambio("ADDED", "NARANJA", {"Titulo": "Calibres"})], None)
+        cache.plantillas([("Defectos", "NARANJA")])  # fría: una lectura
+        lecturas = self.db.lecturas
+
+        self.ahora = 10_000  # muy pasado el TTL
+        callback_calibres([], [_cambio("MODIFIED", "NARANJA", {"Titulo": "Nuevo"})], None)
+        self.assertEqual(cache.secciones(), ["Calibres", "Defectos"])
+        self.assertEqual(cache.plantilla("Calibres", "NARANJA"), {"Titulo": "Nuevo"})
+        self.assertIsNone(cache.plantilla("Defectos", "NARANJA"))
+        self.assertEqual(self.db.lecturas, lecturas)
+
+        cache.detener()
+        self.assertTrue(watch_datos.cancelado)
+        self.assertFalse(cache.escuchando)
+
+    def test_seccion_con_error_vuelve_al_ttl_y_se_rearma(self) -> None:
+        cache = self._cache().escuchar()
+        callback_datos, _ = self.db.callbacks["PlantillasInforme/DATOS"]
+        datos = SimpleNamespace(exists=True, to_dict=lambda: {"CAMPO": ["Calibres", "Defectos"]})
+        callback_datos([datos], [], None)
+        callback_calibres, watch_calibres = self.db.callbacks["Calibres"]
+
+        roto = SimpleNamespace(type=SimpleNamespace(name="MODIFIED"), document=None)
+        callback_calibres([], [roto], None)
+
+        self.assertFalse(cache.escuchando)
+        self.assertTrue(watch_calibres.cancelado)
+        cache.escuchar()
+        self.assertTrue(cache.escuchando)
+        self.assertIsNot(self.db.callbacks["Calibres"][1], watch_calibres)
+
+    def test_fallo_al_armar_una_seccion_no_deja_la_cache_sin_caducar(self) -> None:
+        cache = self._cache().escuchar()
+        callback_datos, _ = self.db.callbacks["PlantillasInforme/DATOS"]
+        datos = SimpleNamespace(exists=True, to_dict=lambda: {"CAMPO": ["Calibres", "Defectos"]})
+        registrar = self.db._registrar
+
+        def falla_defectos(ruta, callback):
+            if ruta == "Defectos":
+                raise RuntimeError("sin permisos")
+            return registrar(ruta, callback)
+
+        self.db._registrar = falla_defectos
+        callback_datos([datos], [], None)
+        self.assertFalse(cache.escuchando)
+
+        self.db._registrar = registrar
+        callback_datos([datos], [], None)
+        self.assertTrue(cache.escuchando)
+        self.assertIn("Defectos", self.db.callbacks)
+
+
+    def test_seccion_retirada_con_error_al_soltar_no_rompe_el_listener(self) -> None:
+        cache = self._cache().escuchar()
+        callback_datos, _ = self.db.callbacks["PlantillasInforme/DATOS"]
+        callback_datos([SimpleNamespace(exists=True, to_dict=lambda: {"CAMPO": ["Calibres", "Defectos"]})], [], None)
+        _, watch_defectos = self.db.callbacks["Defectos"]
+
+        def falla_al_soltar():
+            raise RuntimeError("canal cerrado")
+
+        watch_defectos.unsubscribe = falla_al_soltar
+
+        callback_datos([SimpleNamespace(exists=True, to_dict=lambda: {"CAMPO": ["Calibres"]})], [], None)
+
+        self.assertTrue(cache.escuchando)
+        self.assertEqual(cache.secciones(), ["Calibres"])
+
+    def test_cache_compartida_por_cliente(self) -> None:
+        self.addCleanup(setattr, plantillas_cache, "_cache_global", None)
+        plantillas_cache._cache_global = None
+        compartida = plantillas_cache.obtener_cache_plantillas(self.db)
+        self.assertIs(plantillas_cache.obtener_cache_plantillas(self.db), compartida)
+
+        otra_db = FakeFirestore()
+        otra_db.set("Calibres", "NARANJA", {"Titulo": "Otra"})
+        self.assertEqual(plantillas_cache.obtener_cache_plantillas(otra_db).plantilla("Calibres", "NARANJA"), {"Titulo": "Otra"})
+
+
+if __name__ == "__main__":
+    unittest.main()
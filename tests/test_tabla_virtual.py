@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import tkinter as tk
+import unittest
+from types import SimpleNamespace
+
+import pandas as pd
+
+from tabla_virtual import TablaVirtual
+
+
+class TestTablaVirtual(unittest.TestCase):
+    def setUp(self) -> None:
+        try:
+            self.root = tk.Tk()
+        except tk.TclError:
+            self.skipTest("sin pantalla para Tk")
+        self.addCleanup(self.root.destroy)
+        self.tabla = TablaVirtual(self.root, ["IdMuestra"], clave="IdMuestra")
+        self.tabla._visibles = 5
+        self.tabla.cargar(pd.DataFrame({"IdMuestra": [f"M{i}" for i in range(50)]}))
+
+    def _seleccionar(self, posiciones: list[int], state: int = 0) -> None:
+        # Lo que hacen el clic del usuario y la clase Treeview, sin necesitar eventos reales.
+        self.tabla._registrar_modificadores(SimpleNamespace(state=state))
+        self.tabla.tree.selection_set([self.tabla._items[p] for p in posiciones])
+        self.tabla._pintando = False
+        self.tabla._on_select()
+
+    def test_clic_simple_tras_desplazar_sustituye_la_seleccion(self) -> None:
+        self._seleccionar([0, 1])
+        self.tabla.desplazar(20)
+        self._seleccionar([2])
+        self.assertEqual(self.tabla.claves_seleccionadas(), ["M22"])
+
+    def test_clic_con_control_tras_desplazar_amplia_la_seleccion(self) -> None:
+        self._seleccionar([0, 1])
+        self.tabla.desplazar(20)
+        self._seleccionar([2], state=0x0004)
+        self.assertEqual(self.tabla.claves_seleccionadas(), ["M0", "M1", "M22"])
+
+
+if __name__ == "__main__":
+    unittest.main()